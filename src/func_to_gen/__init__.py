@@ -1,5 +1,12 @@
 """Flask app that wraps a function into OpenAI/Ollama compatible API."""
 
 from func_to_gen.app import create_app
+from func_to_gen.cancellation import CancelToken
+from func_to_gen.contexts import GenerationContext
+from func_to_gen.deadlines import Deadline
+from func_to_gen.registry import LazyModel
+from func_to_gen.replicas import ReplicaPool
+from func_to_gen.tokens import Answer
+from func_to_gen.upstream import Upstream
 
-__all__ = ["create_app"]
+__all__ = ["create_app", "Answer", "CancelToken", "Deadline", "GenerationContext", "LazyModel", "ReplicaPool", "Upstream"]
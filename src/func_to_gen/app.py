@@ -1,17 +1,138 @@
 """Flask application factory."""
 
-from flask import Flask
-
-from func_to_gen.routes import api, ollama_api, set_answer_function
-
-
-def create_app(answer_func=None, config=None):
+from flask import Flask, Response
+
+from func_to_gen.batching import create_batcher
+from func_to_gen.cache import create_cache
+from func_to_gen.contexts import create_context_store
+from func_to_gen.embeddings import create_embedding_service
+from func_to_gen.executor import create_executor
+from func_to_gen.limiter import create_limiter
+from func_to_gen.metrics import create_metrics
+from func_to_gen.readiness import Readiness
+from func_to_gen.registry import DEFAULT_KEEP_ALIVE, ModelRegistry
+from func_to_gen.replicas import pool_replicas
+from func_to_gen.routes import (
+    api,
+    collect_component_metrics,
+    get_metrics,
+    get_readiness,
+    get_registry,
+    observe_queue_wait,
+    ollama_api,
+    set_answer_function,
+    set_cache,
+    set_context_store,
+    set_embedding_service,
+    set_executor,
+    set_limiter,
+    set_metrics,
+    set_priority_policy,
+    set_readiness,
+    set_registry,
+    set_request_timeout,
+    set_semantic_cache,
+    set_single_flight,
+    set_tokenizer,
+)
+from func_to_gen.scheduler import create_priority_policy
+from func_to_gen.semantic_cache import create_semantic_cache
+from func_to_gen.singleflight import create_single_flight
+
+
+def create_app(answer_func=None, config=None, answer_batch_func=None, models=None, embed_func=None, warmup=None):
     """Create and configure the Flask application.
 
     Args:
         answer_func: The function to use for generating responses.
                     Should have signature: answer(prompt: str) -> str
-        config: Optional configuration dictionary.
+                    May also be an import path such as ``"llm:answer"``,
+                    imported on a background thread so the app starts
+                    listening at once; ``/ready`` answers 503 until it is
+                    loaded.
+                    Declare a ``cancel`` parameter to receive a
+                    ``CancelToken`` that fires when the client disconnects,
+                    and a ``deadline`` parameter to receive the request's
+                    ``Deadline``.
+                    May also be a list (or ``{name: func}`` mapping) of
+                    replicas of the same model, see ``REPLICA_*`` below.
+                    ``Upstream(url)`` forwards prompts to an OpenAI- or
+                    Ollama-compatible server over keep-alive connections.
+        config: Optional configuration dictionary. Set ``MAX_CONCURRENCY``
+                (and optionally ``MAX_QUEUE_DEPTH``, ``EXECUTOR``,
+                ``RETRY_AFTER``) to run answers on a bounded worker pool.
+                Queued answers are served by priority class, highest
+                first, from ``PRIORITY_CLASSES`` (default ``interactive``,
+                ``default``, ``batch``), picked by ``PRIORITY_API_KEYS``
+                (bearer token -> class), ``PRIORITY_ROUTES`` (path ->
+                class) or, with ``PRIORITY_HEADER``, the client's
+                ``X-Priority`` header, and fairly between tenants (the
+                bearer token or, with ``TENANT_HEADER``, the ``X-Tenant``
+                header) by ``TENANT_WEIGHTS``. Set ``ADAPTIVE_CONCURRENCY`` (and
+                optionally ``ADAPTIVE_CONCURRENCY_INITIAL``, ``_MIN``,
+                ``_MAX``, ``_TOLERANCE``) to answer 503 to requests beyond
+                a limit adjusted from observed answer latency.
+                Set ``CACHE_MAX_ENTRIES`` (and optionally ``CACHE_TTL``,
+                ``CACHE_MAX_BYTES``) to cache identical requests. Set
+                ``CACHE_BACKEND`` to ``"sqlite"`` with ``CACHE_PATH`` to
+                share the cache between worker processes and restarts.
+                Set ``SINGLE_FLIGHT`` to let identical concurrent requests
+                share one answer. ``KEEP_ALIVE`` (idle seconds, default
+                300) and ``MAX_LOADED_MODELS`` control unloading of
+                ``LazyModel`` models. Set ``METRICS`` to False to disable
+                request metrics and the ``/metrics`` endpoint. Set
+                ``TOKENIZER`` to a ``count(text) -> int`` callable to
+                replace the built-in token count approximation. Set
+                ``REQUEST_TIMEOUT`` (seconds) to answer 504 to requests not
+                answered in time; requests may set their own ``timeout``
+                body field or ``X-Request-Timeout`` header.
+                ``/api/generate`` answers with a ``context`` handle to the
+                conversation so far, kept for up to ``CONTEXT_MAX_ENTRIES``
+                conversations (default 1024, 0 to answer an empty
+                ``context``; optionally ``CONTEXT_TTL``,
+                ``CONTEXT_MAX_BYTES``, default 64 MiB) in this process.
+                Handles unknown to the process, e.g. one served by another
+                worker, start a new conversation. Answer functions declaring a
+                ``context`` parameter then receive the earlier turns as a
+                ``GenerationContext`` and only the new prompt text.
+                Replicas given as a list go to the healthy replica with
+                the fewest requests in flight; ``REPLICA_MAX_FAILURES``
+                consecutive failures (default 3) eject a replica for
+                ``REPLICA_EJECT_SECONDS`` (default 30). Set
+                ``REPLICA_HEDGE`` to also send requests without output
+                after the ``REPLICA_HEDGE_QUANTILE`` latency (default
+                0.95) to a second replica, keeping whichever answers
+                first.
+        answer_batch_func: Alternative to ``answer_func`` for backends that
+                    answer many prompts at once. Should have signature:
+                    answer_batch(prompts: list[str]) -> list[str]
+                    Concurrent requests are collected for up to
+                    ``BATCH_MAX_WAIT_MS`` or ``BATCH_MAX_SIZE`` prompts.
+        models: Alternative to ``answer_func`` for serving several models.
+                Maps model name to an answer function, or to a
+                ``LazyModel(factory, unload=...)`` that is loaded on first
+                use and unloaded once idle.
+                Requests are routed by their ``model`` field and unknown
+                models get a 404. Import paths and lists of replicas are
+                accepted as for ``answer_func``.
+        embed_func: Optional embedding backend serving ``/v1/embeddings``,
+                ``/api/embeddings`` and ``/api/embed`` (requires NumPy).
+                Should have signature:
+                embed(texts: list[str]) -> 2D array-like, one row per text
+                Long inputs are split into calls of at most
+                ``EMBED_BATCH_SIZE`` texts (default 64). Set
+                ``EMBED_CACHE_DIR`` (and optionally
+                ``EMBED_CACHE_MAX_ENTRIES``, ``EMBED_CACHE_MAX_BYTES``,
+                ``EMBED_CACHE_READONLY``) to keep embeddings on disk and
+                skip texts embedded before. Set
+                ``SEMANTIC_CACHE_THRESHOLD`` (a cosine similarity, and
+                optionally ``SEMANTIC_CACHE_MAX_ENTRIES``,
+                ``SEMANTIC_CACHE_TTL``, ``SEMANTIC_CACHE_MAX_BYTES``) to
+                answer prompts similar to earlier ones from a cache.
+        warmup: Optional callable run on a background thread before
+                ``/ready`` reports ready. Receives the answer function of
+                every model served for the life of the app (not
+                ``LazyModel`` models), e.g. to run a short prompt through it.
 
     Returns:
         Configured Flask application.
@@ -30,7 +151,62 @@ def create_app(answer_func=None, config=None):
 
     # Set the answer function if provided
     if answer_func is not None:
-        set_answer_function(answer_func)
+        set_answer_function(pool_replicas(answer_func, app.config))
+    elif answer_batch_func is not None:
+        set_answer_function(create_batcher(answer_batch_func, app.config))
+    elif models is not None:
+        set_registry(ModelRegistry.from_mapping(
+            {name: pool_replicas(func, app.config) for name, func in models.items()},
+            keep_alive=app.config.get("KEEP_ALIVE", DEFAULT_KEEP_ALIVE),
+            max_loaded=app.config.get("MAX_LOADED_MODELS"),
+        ))
+
+    # Serve embeddings when an embed function is provided
+    set_embedding_service(create_embedding_service(embed_func, app.config))
+
+    # Run answers on a bounded worker pool when configured
+    executor = create_executor(app.config)
+    if executor is not None:
+        executor.wait_observer = observe_queue_wait
+    set_executor(executor)
+    set_priority_policy(create_priority_policy(app.config))
+
+    # Shed load beyond a latency-driven concurrency limit when configured
+    set_limiter(create_limiter(app.config))
+
+    # Serve repeated prompts from the response cache when configured
+    set_cache(create_cache(app.config))
+
+    # Serve near-duplicate prompts from the semantic cache when configured
+    semantic_cache = create_semantic_cache(app.config)
+    if semantic_cache is not None and embed_func is None:
+        raise ValueError("SEMANTIC_CACHE_THRESHOLD requires an embed_func to embed prompts")
+    set_semantic_cache(semantic_cache)
+
+    # Coalesce identical in-flight requests when configured
+    set_single_flight(create_single_flight(app.config))
+
+    # Keep the conversations behind Ollama context handles
+    set_context_store(create_context_store(app.config))
+
+    # Give up on answers that take too long when configured
+    set_request_timeout(app.config.get("REQUEST_TIMEOUT"))
+
+    # Count tokens for usage and timing statistics
+    set_tokenizer(app.config.get("TOKENIZER"))
+
+    # Record request metrics unless disabled
+    metrics = create_metrics(app.config)
+    if metrics is not None:
+        metrics.add_collector(collect_component_metrics)
+    set_metrics(metrics)
+
+    # Load answer functions given as import paths and warm up in the background
+    readiness = None
+    if answer_func is not None or answer_batch_func is not None or models is not None:
+        readiness = Readiness(get_registry(), warmup)
+        readiness.start()
+    set_readiness(readiness)
 
     # Register the API blueprints
     app.register_blueprint(api)          # OpenAI-compatible: /v1/*
@@ -41,19 +217,38 @@ def create_app(answer_func=None, config=None):
     def health():
         return {"status": "ok"}
 
+    # Readiness endpoint: 503 until answer functions are loaded and warmed up
+    @app.route("/ready")
+    def ready():
+        readiness = get_readiness()
+        if readiness is None:
+            return {"status": "ready"}
+        status = readiness.status()
+        return status, 200 if readiness.ready else 503
+
+    # Prometheus metrics endpoint
+    @app.route("/metrics")
+    def metrics_endpoint():
+        metrics = get_metrics()
+        if metrics is None:
+            return {"error": "Metrics are disabled"}, 404
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     return app
 
 
-# For running directly with `flask run` or `python -m func_to_gen.app`
+# For trying the app with `flask run` or `python -m func_to_gen.app`; in
+# production use `func-to-gen serve llm:answer`, which runs pre-forked workers
 if __name__ == "__main__":
-    # Import the real answer function when running directly
-    try:
-        from llm import answer
-        app = create_app(answer_func=answer)
-    except ImportError:
+    import importlib.util
+
+    # Serve the real answer function when the llm module is installed
+    if importlib.util.find_spec("llm") is not None:
+        app = create_app(answer_func="llm:answer")
+    else:
         # Fallback for testing without the llm module
         def mock_answer(prompt: str) -> str:
             return f"Mock response to: {prompt}"
         app = create_app(answer_func=mock_answer)
 
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,685 @@
+"""ASGI application serving the same API for coroutine answer functions.
+
+Unlike the Flask app, no OS thread is held while a request waits on its
+answer, so thousands of slow generations can be in flight in one process.
+Run it with any ASGI server, e.g. ``uvicorn module:app``.
+
+Answer functions may be:
+
+- ``async def answer(prompt) -> str``
+- ``async def answer(prompt)`` with ``yield`` (async generator) for streaming
+- plain synchronous functions or generators, which run on a thread pool
+"""
+
+import asyncio
+import inspect
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+from urllib.parse import unquote
+
+from func_to_gen.batching import create_batcher
+from func_to_gen.cache import create_cache, is_cache_bypassed
+from func_to_gen.cancellation import CancelToken, answer_kwargs
+from func_to_gen.contexts import create_context_store
+from func_to_gen.deadlines import Deadline, RequestTimeout, request_deadline
+from func_to_gen.embeddings import (
+    answer_ollama_embed,
+    answer_ollama_embeddings,
+    answer_openai_embeddings,
+    create_embedding_service,
+)
+from func_to_gen.executor import QueueFullError
+from func_to_gen.limiter import create_limiter
+from func_to_gen.pipeline import (
+    EMBEDDINGS_NOT_SUPPORTED,
+    MODEL_NAME,
+    REQUEST_ERRORS,
+    ChatCompletionEvents,
+    CompletionEvents,
+    OllamaEvents,
+    chat_prompt,
+    completion_prompt,
+    count_usage,
+    describe_error,
+    include_usage,
+    join_chunks,
+    lookup_cached,
+    ndjson_error,
+    ollama_error,
+    ollama_prompt,
+    ollama_timing,
+    openai_error,
+    require_body,
+    sse_error,
+    wants_ollama_stream,
+)
+from func_to_gen.readiness import Readiness
+from func_to_gen.registry import DEFAULT_KEEP_ALIVE, ModelRegistry
+from func_to_gen.replicas import pool_replicas
+from func_to_gen.scheduler import DEFAULT_PRIORITY_CLASSES, FairQueue, create_priority_policy
+from func_to_gen.semantic_cache import create_semantic_cache
+from func_to_gen.tokens import approximate_token_count
+from func_to_gen.utils import (
+    format_chat_completion_response,
+    format_completion_response,
+    format_models_response,
+    format_ollama_chat_chunk,
+    format_ollama_chat_response,
+    format_ollama_generate_chunk,
+    format_ollama_generate_response,
+    format_ollama_ps_response,
+    format_ollama_show_response,
+    format_ollama_tags_response,
+)
+
+# Config keys of the Flask app the ASGI app has no counterpart for
+UNSUPPORTED_CONFIG = ("EXECUTOR", "METRICS", "SINGLE_FLIGHT")
+
+_END = object()
+
+
+class Headers(dict):
+    """Request headers keyed by lower-case name, looked up case-insensitively."""
+
+    def get(self, key: str, default=None):
+        return super().get(key.lower(), default)
+
+
+class Request:
+    """A parsed HTTP request."""
+
+    def __init__(self, method: str, path: str, headers: dict, body: bytes, cancel: Optional[CancelToken] = None):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.cancel = cancel or CancelToken()
+        # X-Cache status, set once the response caches were consulted
+        self.cache_status = None
+
+    def json(self) -> Optional[dict]:
+        """Decode the body as a JSON object, or None if it is not one."""
+        try:
+            data = json.loads(self.body or b"null")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class Response:
+    """A complete or streaming HTTP response."""
+
+    def __init__(
+        self, body=b"", status: int = 200, content_type: str = "application/json", headers=None, format_error=None,
+    ):
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+        self.headers = dict(headers or {})
+        self.format_error = format_error
+
+    @classmethod
+    def json(cls, payload, status: int = 200, headers=None) -> "Response":
+        return cls(json.dumps(payload).encode("utf-8"), status=status, headers=headers)
+
+    async def send(self, send, cancel: Optional[CancelToken] = None):
+        """Send the response, stopping a stream early once ``cancel`` fires."""
+        headers = [(b"content-type", self.content_type.encode("latin-1"))]
+        headers.extend((k.lower().encode("latin-1"), str(v).encode("latin-1")) for k, v in self.headers.items())
+        await send({"type": "http.response.start", "status": self.status, "headers": headers})
+        if isinstance(self.body, (bytes, str)):
+            body = self.body.encode("utf-8") if isinstance(self.body, str) else self.body
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            async for part in self.body:
+                if cancel is not None and cancel.cancelled:
+                    return
+                await send({"type": "http.response.body", "body": part.encode("utf-8"), "more_body": True})
+        except RequestTimeout as exc:
+            if self.format_error is not None:
+                part = self.format_error(str(exc))
+                await send({"type": "http.response.body", "body": part.encode("utf-8"), "more_body": True})
+        finally:
+            await self.body.aclose()
+        await send({"type": "http.response.body", "body": b""})
+
+
+def _release_answer(registry, model: str, keep_alive, limiter, started, dropped: bool = False, sample: bool = True):
+    registry.release(model, keep_alive)
+    if limiter is not None:
+        limiter.release(started, dropped=dropped, sample=sample)
+
+
+class AsgiApp:
+    """ASGI callable serving the ``/v1/*``, ``/api/*``, ``/health`` and ``/ready`` routes.
+
+    Supports model routing, lazy models with keep_alive, the response and
+    semantic caches and token counting like the Flask app. Concurrency is
+    bounded by ``MAX_CONCURRENCY`` / ``MAX_QUEUE_DEPTH``, with waiting requests
+    admitted by priority class and tenant, and optionally by the adaptive
+    limit of ``ADAPTIVE_CONCURRENCY``;
+    synchronous answer functions run on a pool of ``SYNC_WORKERS`` threads.
+    Request coalescing (``SINGLE_FLIGHT``), request metrics (``METRICS``)
+    and the ``EXECUTOR`` worker pool are not available; configuring them
+    raises ValueError.
+    """
+
+    def __init__(self, registry: ModelRegistry, config: Optional[dict] = None, embed_func=None, warmup=None):
+        config = config or {}
+        unsupported = [key for key in UNSUPPORTED_CONFIG if config.get(key)]
+        if unsupported:
+            raise ValueError(f"The ASGI app does not support {', '.join(unsupported)}; use create_app instead")
+        self.registry = registry
+        self.readiness = Readiness(registry, warmup)
+        self.readiness.start()
+        self.embedding_service = create_embedding_service(embed_func, config)
+        self.config = config
+        self.cache = create_cache(config)
+        self.semantic_cache = create_semantic_cache(config)
+        self.context_store = create_context_store(config)
+        if self.semantic_cache is not None and self.embedding_service is None:
+            raise ValueError("SEMANTIC_CACHE_THRESHOLD requires an embed_func to embed prompts")
+        self.tokenizer = config.get("TOKENIZER") or approximate_token_count
+        self.request_timeout = config.get("REQUEST_TIMEOUT")
+        self.max_concurrency = config.get("MAX_CONCURRENCY")
+        self.max_queue = config.get("MAX_QUEUE_DEPTH", 16)
+        self.retry_after = config.get("RETRY_AFTER", 1)
+        self.pending = 0
+        self.priority_policy = create_priority_policy(config)
+        self.limiter = create_limiter(config)
+        self._running = 0
+        self._waiting = FairQueue(
+            config.get("PRIORITY_CLASSES", DEFAULT_PRIORITY_CLASSES),
+            config.get("TENANT_WEIGHTS"),
+            config.get("DEFAULT_PRIORITY"),
+        )
+        self._pool = ThreadPoolExecutor(max_workers=config.get("SYNC_WORKERS", 32), thread_name_prefix="func-to-gen")
+        self._routes = {
+            ("POST", "/v1/chat/completions"): self.chat_completions,
+            ("POST", "/v1/completions"): self.completions,
+            ("GET", "/v1/models"): self.list_models,
+            ("POST", "/v1/embeddings"): self.embeddings,
+            ("POST", "/api/generate"): self.ollama_generate,
+            ("POST", "/api/chat"): self.ollama_chat,
+            ("GET", "/api/tags"): self.ollama_tags,
+            ("GET", "/api/ps"): self.ollama_ps,
+            ("POST", "/api/show"): self.ollama_show,
+            ("POST", "/api/embeddings"): self.ollama_embeddings,
+            ("POST", "/api/embed"): self.ollama_embed,
+            ("GET", "/health"): self.health,
+            ("GET", "/ready"): self.ready,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        headers = Headers((k.decode("latin-1").lower(), v.decode("latin-1")) for k, v in scope.get("headers", []))
+        request = Request(scope["method"], unquote(scope["path"]), headers, body)
+        loop = asyncio.get_running_loop()
+        handler = asyncio.ensure_future(self.dispatch(request))
+        request.cancel.add_callback(partial(loop.call_soon_threadsafe, handler.cancel))
+        watcher = asyncio.ensure_future(_watch_disconnect(receive, request.cancel))
+        try:
+            try:
+                response = await handler
+            except asyncio.CancelledError:
+                if not request.cancel.cancelled:
+                    raise
+                # The client is gone; there is nobody to respond to
+                return
+            await response.send(send, request.cancel)
+        finally:
+            watcher.cancel()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self._pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def dispatch(self, request: Request) -> Response:
+        """Route a request to its handler, answering failures like the Flask app."""
+        path = request.path.rstrip("/") or "/"
+        handler = self._routes.get((request.method, path))
+        if handler is None and request.method == "GET" and path.startswith("/v1/models/"):
+            handler = partial(self.get_model, model_id=path[len("/v1/models/"):])
+        if handler is None:
+            if any(route_path == path for _, route_path in self._routes):
+                return Response.json({"error": "Method not allowed"}, status=405)
+            return Response.json({"error": "Not found"}, status=404)
+        try:
+            response = await handler(request)
+        except REQUEST_ERRORS as exc:
+            status, body, headers = describe_error(exc, ollama=path.startswith("/api/"))
+            response = Response.json(body, status=status, headers=headers)
+        if request.cache_status is not None:
+            response.headers["X-Cache"] = request.cache_status
+        return response
+
+    # -------------------------------------------------------------------------
+    # Running answer functions
+    # -------------------------------------------------------------------------
+
+    async def _run_sync(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, func, *args)
+
+    async def _enter(self, priority=None, tenant=None):
+        """Take a concurrency slot, or raise QueueFullError if the queue is full.
+
+        Requests waiting for a slot get one by priority class, then fairly
+        between tenants, like :class:`func_to_gen.executor.AnswerExecutor`.
+        """
+        if not self.max_concurrency:
+            return
+        if self.pending >= self.max_concurrency + self.max_queue:
+            raise QueueFullError(self.retry_after)
+        self.pending += 1
+        if self._running < self.max_concurrency and not len(self._waiting):
+            self._running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.push(waiter, priority, tenant)
+        try:
+            await waiter
+        except BaseException:
+            self.pending -= 1
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as this request was cancelled; pass it on
+                self._next_waiter()
+            raise
+
+    def _exit(self):
+        if not self.max_concurrency:
+            return
+        self.pending -= 1
+        self._next_waiter()
+
+    def _next_waiter(self):
+        """Hand the slot being freed to the next live waiter, if any."""
+        while len(self._waiting):
+            waiter, _, _ = self._waiting.pop()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+    async def _run_answer(
+        self,
+        model: str,
+        prompt: str,
+        keep_alive: Optional[float] = None,
+        cancel=None,
+        deadline: Optional[Deadline] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None,
+        context=None,
+    ):
+        """Run a model's answer function; returns a string or an async chunk iterator.
+
+        Answer functions declaring a ``cancel`` parameter receive the
+        request's :class:`CancelToken`, and those declaring a ``deadline``
+        parameter its :class:`Deadline`. Those declaring a ``context``
+        parameter receive a continued conversation's ``GenerationContext``;
+        others get its history before the prompt. Coroutine answers are cancelled
+        outright when the client disconnects or the deadline passes, and
+        requests still waiting for a slot are dropped at their deadline.
+        """
+        if deadline is None:
+            return await self._start_answer(model, prompt, keep_alive, cancel, None, priority, tenant, context)
+        try:
+            return await asyncio.wait_for(
+                self._start_answer(model, prompt, keep_alive, cancel, deadline, priority, tenant, context),
+                deadline.remaining(),
+            )
+        except asyncio.TimeoutError:
+            raise RequestTimeout(deadline.timeout) from None
+
+    async def _start_answer(self, model: str, prompt: str, keep_alive, cancel, deadline, priority, tenant, context):
+        await self._enter(priority, tenant)
+        release_model = None
+        try:
+            # Shed load before loading a model for an answer that would be rejected
+            started = self.limiter.acquire() if self.limiter is not None else None
+            try:
+                func = await self._run_sync(self.registry.acquire, model)
+            except BaseException:
+                if self.limiter is not None:
+                    self.limiter.release(started, sample=False)
+                raise
+            release_model = partial(_release_answer, self.registry, model, keep_alive, self.limiter, started)
+            kwargs = answer_kwargs(func, cancel=cancel, deadline=deadline, context=context)
+            if context is not None and "context" not in kwargs:
+                prompt = context.full_prompt(prompt)
+            if inspect.isasyncgenfunction(func) or inspect.iscoroutinefunction(func):
+                result = func(prompt, **kwargs)
+            else:
+                result = await self._run_sync(partial(func, **kwargs), prompt)
+            if inspect.isawaitable(result):
+                result = await result
+        except BaseException:
+            if release_model is not None:
+                release_model(dropped=deadline is not None and deadline.expired, sample=False)
+            self._exit()
+            raise
+
+        def finish(sample=True):
+            release_model(sample=sample)
+            self._exit()
+
+        if isinstance(result, str):
+            finish()
+            return result
+        if hasattr(result, "__aiter__"):
+            return self._finish_after(result, finish, deadline)
+        return self._finish_after(self._iterate_sync(result, cancel), finish, deadline)
+
+    async def _iterate_sync(self, result, cancel=None):
+        """Iterate a synchronous chunk iterator on the thread pool."""
+        iterator = iter(result)
+        try:
+            while cancel is None or not cancel.cancelled:
+                chunk = await self._run_sync(next, iterator, _END)
+                if chunk is _END:
+                    return
+                yield chunk
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    await self._run_sync(close)
+                except ValueError:
+                    # Still running on a worker after its request was cancelled
+                    pass
+
+    @staticmethod
+    async def _finish_after(chunks, finish, deadline: Optional[Deadline] = None):
+        """Yield chunks, waiting for each at most until ``deadline``, then call ``finish``."""
+        finished = False
+        try:
+            while True:
+                try:
+                    if deadline is None:
+                        chunk = await chunks.__anext__()
+                    else:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline.remaining())
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise RequestTimeout(deadline.timeout) from None
+                if chunk:
+                    yield chunk
+            finished = True
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            finish(sample=finished)
+
+    async def _generate(self, request: Request, data: dict, prompt: str, model: str, keep_alive=None, context=None):
+        """Produce the answer for a request, consulting the response caches first."""
+        deadline = request_deadline(data, request.headers, self.request_timeout)
+        priority, tenant = self.priority_policy.classify(request.path, request.headers)
+        run_answer = partial(
+            self._run_answer, model, prompt, keep_alive, request.cancel, deadline,
+            priority=priority, tenant=tenant, context=context,
+        )
+        if (self.cache is None and self.semantic_cache is None) or is_cache_bypassed(data, request.headers):
+            return await run_answer()
+
+        lookup = partial(lookup_cached, self.cache, self.semantic_cache, self._embed_prompt, model, prompt, data)
+        if self.semantic_cache is None:
+            cached, request.cache_status, store = lookup()
+        else:
+            # Embedding the prompt blocks, so look it up off the event loop
+            cached, request.cache_status, store = await self._run_sync(lookup)
+        if cached is not None:
+            return cached
+
+        result = await run_answer()
+        if isinstance(result, str):
+            store(result)
+            return result
+        return _record_async_stream(result, store)
+
+    def _embed_prompt(self, prompt: str):
+        return self.embedding_service.embed([prompt])[0]
+
+    def _resolve_model(self, data: dict) -> str:
+        model = data.get("model") or self.registry.default_model
+        self.registry.entry(model)
+        return model
+
+    # -------------------------------------------------------------------------
+    # OpenAI-compatible routes
+    # -------------------------------------------------------------------------
+
+    async def _openai_generation(self, request: Request, data: dict, prompt: str, events_class, make_response):
+        model = self._resolve_model(data)
+        started_ns = time.perf_counter_ns()
+        result = await self._generate(request, data, prompt, model)
+
+        if data.get("stream"):
+            events = events_class(model, prompt, self.tokenizer, include_usage(data))
+            return Response(
+                _stream_events(result, events), content_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"}, format_error=sse_error,
+            )
+
+        content = await _collect(result)
+        answer_ns = time.perf_counter_ns() - started_ns
+        usage = count_usage(self.tokenizer, prompt, content)
+        return Response.json(make_response(content, model=model, usage=usage), headers={
+            "X-Answer-Duration-Ns": answer_ns,
+        })
+
+    async def chat_completions(self, request: Request) -> Response:
+        data = request.json()
+        return await self._openai_generation(
+            request, data, chat_prompt(data), ChatCompletionEvents, format_chat_completion_response,
+        )
+
+    async def completions(self, request: Request) -> Response:
+        data = request.json()
+        return await self._openai_generation(
+            request, data, completion_prompt(data), CompletionEvents, format_completion_response,
+        )
+
+    async def list_models(self, request: Request) -> Response:
+        return Response.json(format_models_response(self.registry.names()))
+
+    async def get_model(self, request: Request, model_id: str) -> Response:
+        if not self.registry.has(model_id):
+            return Response.json(openai_error(f"Model {model_id} not found"), status=404)
+        return Response.json({"id": model_id, "object": "model", "owned_by": "local"})
+
+    async def embeddings(self, request: Request) -> Response:
+        if self.embedding_service is None:
+            return Response.json(openai_error(EMBEDDINGS_NOT_SUPPORTED, "not_implemented_error"), status=501)
+        data = require_body(request.json())
+        model = data.get("model") or MODEL_NAME
+        return Response.json(await self._run_sync(
+            answer_openai_embeddings, self.embedding_service, data, model, self.tokenizer,
+        ))
+
+    # -------------------------------------------------------------------------
+    # Ollama native routes
+    # -------------------------------------------------------------------------
+
+    async def _ollama_generation(
+        self, request: Request, data: dict, field: str, make_chunk, make_final, continues: bool = False,
+    ):
+        """Answer an Ollama request; with ``continues``, resume and store its ``context``."""
+        prompt, keep_alive = ollama_prompt(data, field)
+        model = self._resolve_model(data)
+        if not prompt:
+            # A bare keep_alive request loads or unloads the model
+            await self._run_sync(self.registry.acquire, model)
+            self.registry.release(model, keep_alive)
+            done_reason = "unload" if keep_alive == 0 else "load"
+            return Response.json(make_final("", model=model, done_reason=done_reason))
+        context = self.context_store.resume(data.get("context"), model) if continues else None
+        started_ns = time.perf_counter_ns()
+        result = await self._generate(request, data, prompt, model, keep_alive, context)
+
+        if context is not None:
+            handle = self.context_store.new_handle()
+            make_final = partial(make_final, context=[handle])
+            save_context = partial(self.context_store.save, handle, model, context, prompt)
+
+        if wants_ollama_stream(data, result):
+            if context is not None:
+                result = _record_async_stream(_aiter_chunks(result), save_context)
+            events = OllamaEvents(model, prompt, self.tokenizer, started_ns, make_chunk, make_final)
+            return Response(
+                _stream_events(result, events), content_type="application/x-ndjson", format_error=ndjson_error,
+            )
+
+        content = await _collect(result)
+        finished_ns = time.perf_counter_ns()
+        if context is not None:
+            save_context(content)
+        stats = ollama_timing(self.tokenizer, prompt, content, started_ns, started_ns, finished_ns)
+        return Response.json(make_final(content, model=model, stats=stats))
+
+    async def ollama_generate(self, request: Request) -> Response:
+        return await self._ollama_generation(
+            request, request.json(), "prompt", format_ollama_generate_chunk, format_ollama_generate_response,
+            continues=self.context_store is not None,
+        )
+
+    async def ollama_chat(self, request: Request) -> Response:
+        return await self._ollama_generation(
+            request, request.json(), "messages", format_ollama_chat_chunk, format_ollama_chat_response,
+        )
+
+    async def ollama_tags(self, request: Request) -> Response:
+        return Response.json(format_ollama_tags_response(self.registry.names()))
+
+    async def ollama_ps(self, request: Request) -> Response:
+        return Response.json(format_ollama_ps_response(self.registry.describe_loaded()))
+
+    async def ollama_show(self, request: Request) -> Response:
+        model = self._resolve_model(require_body(request.json()))
+        return Response.json(format_ollama_show_response(model))
+
+    async def ollama_embeddings(self, request: Request) -> Response:
+        if self.embedding_service is None:
+            return Response.json(ollama_error(EMBEDDINGS_NOT_SUPPORTED), status=501)
+        data = require_body(request.json())
+        return Response.json(await self._run_sync(
+            answer_ollama_embeddings, self.embedding_service, data, data.get("model") or MODEL_NAME,
+        ))
+
+    async def ollama_embed(self, request: Request) -> Response:
+        if self.embedding_service is None:
+            return Response.json(ollama_error(EMBEDDINGS_NOT_SUPPORTED), status=501)
+        data = require_body(request.json())
+        model = data.get("model") or MODEL_NAME
+        return Response.json(await self._run_sync(
+            answer_ollama_embed, self.embedding_service, data, model, self.tokenizer,
+        ))
+
+    async def health(self, request: Request) -> Response:
+        return Response.json({"status": "ok"})
+
+    async def ready(self, request: Request) -> Response:
+        return Response.json(self.readiness.status(), status=200 if self.readiness.ready else 503)
+
+
+async def _watch_disconnect(receive, cancel: CancelToken):
+    """Cancel the request once the server reports that the client disconnected."""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            cancel.cancel()
+            return
+
+
+async def _aiter_chunks(result):
+    """Yield non-empty chunks from a string or async chunk iterator."""
+    if isinstance(result, str):
+        if result:
+            yield result
+        return
+    async for chunk in result:
+        if chunk:
+            yield chunk
+
+
+async def _collect(result) -> str:
+    """Join a string or async chunk iterator into one string."""
+    if isinstance(result, str):
+        return result
+    return join_chunks([chunk async for chunk in _aiter_chunks(result)])
+
+
+async def _stream_events(result, events):
+    """Yield the events (see :class:`func_to_gen.pipeline.ChatCompletionEvents`) for an answer result."""
+    for event in events.start():
+        yield event
+    async for chunk in _aiter_chunks(result):
+        yield events.chunk(chunk)
+    for event in events.finish():
+        yield event
+
+
+async def _record_async_stream(chunks, on_complete):
+    seen = []
+    async for chunk in chunks:
+        seen.append(chunk)
+        yield chunk
+    on_complete("".join(seen))
+
+
+def create_asgi_app(
+    answer_func=None, config=None, answer_batch_func=None, models=None, embed_func=None, warmup=None,
+) -> AsgiApp:
+    """Create the ASGI application.
+
+    Takes the same arguments as :func:`func_to_gen.create_app`; answer
+    functions may also be coroutine functions or async generators
+    (except as replicas, which must be plain functions). Config keys of
+    features the ASGI app lacks (see :class:`AsgiApp`) raise ValueError.
+
+    Example:
+        from llm import answer
+        from func_to_gen.asgi import create_asgi_app
+
+        app = create_asgi_app(answer_func=answer)
+        # uvicorn module:app
+    """
+    config = dict(config or {})
+    if answer_func is not None:
+        registry = ModelRegistry(default_model=MODEL_NAME, strict=False)
+        registry.register(MODEL_NAME, pool_replicas(answer_func, config))
+    elif answer_batch_func is not None:
+        registry = ModelRegistry(default_model=MODEL_NAME, strict=False)
+        registry.register(MODEL_NAME, create_batcher(answer_batch_func, config))
+    elif models is not None:
+        registry = ModelRegistry.from_mapping(
+            {name: pool_replicas(func, config) for name, func in models.items()},
+            keep_alive=config.get("KEEP_ALIVE", DEFAULT_KEEP_ALIVE),
+            max_loaded=config.get("MAX_LOADED_MODELS"),
+        )
+    else:
+        raise ValueError("create_asgi_app needs answer_func, answer_batch_func or models")
+    return AsgiApp(registry, config, embed_func=embed_func, warmup=warmup)
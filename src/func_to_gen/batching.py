@@ -0,0 +1,86 @@
+"""Dynamic micro-batching for batch-capable answer functions."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Collect concurrent prompts and answer them with one batch call.
+
+    Wraps ``answer_batch(prompts: list[str]) -> list[str]`` as a regular
+    ``answer(prompt) -> str`` callable. Prompts submitted from any thread
+    are gathered for up to ``max_wait_ms`` milliseconds or until
+    ``max_batch_size`` prompts are waiting, then dispatched together and
+    the results are handed back to the waiting callers.
+    """
+
+    def __init__(self, batch_func, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.batch_func = batch_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> str:
+        return self.submit(prompt).result()
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt for the next batch and return a future for its answer."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="func-to-gen-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        """Block for the first prompt, then gather more until the batch closes."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = [(prompt, future) for prompt, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            prompts = [prompt for prompt, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                results = list(self.batch_func(prompts))
+                if len(results) != len(prompts):
+                    raise RuntimeError(
+                        f"Batch answer function returned {len(results)} results for {len(prompts)} prompts"
+                    )
+            except Exception as exc:
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+def create_batcher(batch_func, config) -> MicroBatcher:
+    """Build a batcher from app config (``BATCH_MAX_SIZE``, ``BATCH_MAX_WAIT_MS``)."""
+    return MicroBatcher(
+        batch_func,
+        max_batch_size=config.get("BATCH_MAX_SIZE", 16),
+        max_wait_ms=config.get("BATCH_MAX_WAIT_MS", 5.0),
+    )
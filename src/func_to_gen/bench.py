@@ -0,0 +1,341 @@
+"""Load-testing benchmark for the generation endpoints.
+
+Starts ``create_app`` on a local HTTP server with a synthetic answer
+function, drives the endpoints at a fixed concurrency and reports
+throughput, latency percentiles and time to first chunk as JSON.
+With ``--startup-runs``, also times how soon freshly started processes
+listen, report ready and answer their first request.
+
+Example:
+    python -m func_to_gen.bench --answer stream --chunks 20 --chunk-delay-ms 5 \\
+        --concurrency 16 --requests 400 --config MAX_CONCURRENCY=8
+"""
+
+import argparse
+import http.client
+import json
+import math
+import subprocess
+import sys
+import threading
+import time
+from typing import Optional
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from func_to_gen.app import create_app
+from func_to_gen.cli import parse_config
+
+# Request bodies for every benchmarked endpoint
+ENDPOINTS = {
+    "/v1/chat/completions": {"model": "local-llm", "messages": [{"role": "user", "content": "Benchmark prompt"}]},
+    "/v1/completions": {"model": "local-llm", "prompt": "Benchmark prompt"},
+    "/api/generate": {"model": "local-llm", "prompt": "Benchmark prompt"},
+    "/api/chat": {"model": "local-llm", "messages": [{"role": "user", "content": "Benchmark prompt"}]},
+}
+
+
+def fixed_latency_answer(latency_ms: float = 0.0, text: str = "benchmark response"):
+    """Answer function that sleeps for a fixed time, like a remote model call."""
+    def answer(prompt: str) -> str:
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        return text
+    return answer
+
+
+def cpu_bound_answer(iterations: int = 100_000, text: str = "benchmark response"):
+    """Answer function that burns CPU while holding the GIL."""
+    def answer(prompt: str) -> str:
+        total = 0
+        for i in range(iterations):
+            total += i * i
+        return text
+    return answer
+
+
+def streaming_answer(chunks: int = 10, chunk_delay_ms: float = 0.0, chunk: str = "token "):
+    """Answer function that yields ``chunks`` pieces with a delay before each."""
+    def answer(prompt: str):
+        for _ in range(chunks):
+            if chunk_delay_ms:
+                time.sleep(chunk_delay_ms / 1000.0)
+            yield chunk
+    return answer
+
+
+# Answer function started by the startup measurement unless another is named
+benchmark_answer = fixed_latency_answer()
+
+# Run in a fresh interpreter: serve create_app(answer_func=<import path>) and print the port
+_STARTUP_SCRIPT = """
+import json, sys
+from werkzeug.serving import WSGIRequestHandler, make_server
+from func_to_gen.app import create_app
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+app = create_app(answer_func=sys.argv[1], config=json.loads(sys.argv[2]))
+server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+print(server.server_port, flush=True)
+server.serve_forever()
+"""
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100.0 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def summarize(samples_ms: list) -> dict:
+    """Mean and p50/p95/p99 of a list of millisecond samples."""
+    return {
+        "mean": sum(samples_ms) / len(samples_ms) if samples_ms else 0.0,
+        "p50": percentile(samples_ms, 50),
+        "p95": percentile(samples_ms, 95),
+        "p99": percentile(samples_ms, 99),
+        "max": max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that skips per-request access logging."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class BenchServer:
+    """Serve a WSGI app on a background thread for the duration of a benchmark."""
+
+    def __init__(self, app, host: str = "127.0.0.1"):
+        self._server = make_server(host, 0, app, threaded=True, request_handler=_QuietRequestHandler)
+        self.host = host
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "BenchServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._thread.join()
+
+
+def _timed_request(conn: http.client.HTTPConnection, path: str, body: bytes):
+    """Send one POST and return (status, latency_ms, time_to_first_chunk_ms)."""
+    started = time.perf_counter()
+    conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    first_chunk = None
+    while True:
+        data = response.read1(65536)
+        if not data:
+            break
+        if first_chunk is None:
+            first_chunk = time.perf_counter()
+    finished = time.perf_counter()
+    if first_chunk is None:
+        first_chunk = finished
+    return response.status, (finished - started) * 1000.0, (first_chunk - started) * 1000.0
+
+
+def _time_startup(target: str, config: dict, timeout: float) -> dict:
+    """Start one server process; return milliseconds until it listens, is ready and answers."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", _STARTUP_SCRIPT, target, json.dumps(config)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(process.stdout.readline())
+        listening = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        while True:
+            conn.request("GET", "/ready")
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                break
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"{target} not ready after {timeout:g}s")
+            time.sleep(0.005)
+        ready = time.perf_counter()
+        status, _, _ = _timed_request(conn, "/api/generate", json.dumps(
+            dict(ENDPOINTS["/api/generate"], stream=False),
+        ).encode("utf-8"))
+        answered = time.perf_counter()
+        conn.close()
+    finally:
+        process.kill()
+        process.wait()
+    if status != 200:
+        raise RuntimeError(f"First request failed with status {status}")
+    return {
+        "listening_ms": (listening - started) * 1000.0,
+        "ready_ms": (ready - started) * 1000.0,
+        "first_response_ms": (answered - started) * 1000.0,
+    }
+
+
+def measure_startup(
+    target: str = "func_to_gen.bench:benchmark_answer",
+    runs: int = 5,
+    config: Optional[dict] = None,
+    timeout: float = 60.0,
+) -> dict:
+    """Time cold starts of ``create_app(answer_func=target)`` in fresh processes.
+
+    Reports, from process start, when the server listens, when ``/ready``
+    succeeds and when the first generation request is answered.
+    """
+    config = {key: value for key, value in (config or {}).items() if _is_json_value(value)}
+    samples = [_time_startup(target, config, timeout) for _ in range(runs)]
+    return {
+        "target": target,
+        "runs": runs,
+        **{name: summarize([sample[name] for sample in samples]) for name in samples[0]},
+    }
+
+
+def run_endpoint(host: str, port: int, path: str, body: dict, concurrency: int, total: int) -> dict:
+    """Drive one endpoint with ``concurrency`` workers until ``total`` requests finish."""
+    payload = json.dumps(body).encode("utf-8")
+    latencies = []
+    first_chunks = []
+    errors = {}
+    remaining = [total]
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            try:
+                status, latency, first_chunk = _timed_request(conn, path, payload)
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=60)
+                with lock:
+                    errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+                continue
+            with lock:
+                if status == 200:
+                    latencies.append(latency)
+                    first_chunks.append(first_chunk)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "duration_s": duration,
+        "throughput_rps": len(latencies) / duration if duration else 0.0,
+        "latency_ms": summarize(latencies),
+        "time_to_first_chunk_ms": summarize(first_chunks),
+    }
+
+
+def run_benchmark(
+    answer_func,
+    endpoints: Optional[list] = None,
+    concurrency: int = 8,
+    requests: int = 200,
+    stream: bool = False,
+    config: Optional[dict] = None,
+) -> dict:
+    """Benchmark ``create_app(answer_func)`` and return a JSON-serializable report."""
+    endpoints = endpoints or list(ENDPOINTS)
+    app = create_app(answer_func=answer_func, config=config)
+    report = {
+        "concurrency": concurrency,
+        "requests_per_endpoint": requests,
+        "stream": stream,
+        "config": {key: value for key, value in (config or {}).items() if _is_json_value(value)},
+        "endpoints": {},
+    }
+    with BenchServer(app) as server:
+        for path in endpoints:
+            body = dict(ENDPOINTS[path], stream=stream)
+            report["endpoints"][path] = run_endpoint(server.host, server.port, path, body, concurrency, requests)
+    return report
+
+
+def _is_json_value(value) -> bool:
+    return isinstance(value, (str, int, float, bool)) or value is None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark func-to-gen endpoints with a synthetic answer function.")
+    parser.add_argument("--answer", choices=("fixed", "cpu", "stream"), default="fixed",
+                        help="synthetic answer function (default: fixed)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay of the fixed answer function")
+    parser.add_argument("--iterations", type=int, default=100_000, help="work done by the cpu answer function")
+    parser.add_argument("--chunks", type=int, default=10, help="chunks yielded by the stream answer function")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0, help="delay before each streamed chunk")
+    parser.add_argument("--endpoint", action="append", choices=sorted(ENDPOINTS), dest="endpoints",
+                        help="endpoint to benchmark (repeatable, default: all)")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client connections")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--stream", action="store_true", help="request streamed responses")
+    parser.add_argument("--config", action="append", default=[], metavar="KEY=VALUE",
+                        help="app config override, e.g. MAX_CONCURRENCY=4 (repeatable)")
+    parser.add_argument("--startup-runs", type=int, default=0,
+                        help="also time this many cold starts in fresh processes (default: 0)")
+    parser.add_argument("--startup-target", default="func_to_gen.bench:benchmark_answer",
+                        help="answer function import path started by the startup measurement")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.answer == "cpu":
+        answer_func = cpu_bound_answer(args.iterations)
+    elif args.answer == "stream":
+        answer_func = streaming_answer(args.chunks, args.chunk_delay_ms)
+    else:
+        answer_func = fixed_latency_answer(args.latency_ms)
+
+    config = parse_config(args.config)
+    report = run_benchmark(
+        answer_func,
+        endpoints=args.endpoints,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        stream=args.stream,
+        config=config,
+    )
+    report["answer"] = {key: value for key, value in vars(args).items() if key not in ("config", "output")}
+    if args.startup_runs:
+        report["startup"] = measure_startup(args.startup_target, args.startup_runs, config)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Exact-match response cache for generated answers."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Request fields that never change what the answer function produces
+_UNKEYED_FIELDS = frozenset({"model", "messages", "prompt", "stream", "cache", "keep_alive", "user", "timeout"})
+
+# Rough per-entry bookkeeping overhead, in bytes
+_ENTRY_OVERHEAD = 128
+
+
+def make_cache_key(model: str, prompt: str, data: Optional[dict] = None) -> str:
+    """Build a cache key from the model, rendered prompt and generation parameters."""
+    params = {key: value for key, value in (data or {}).items() if key not in _UNKEYED_FIELDS}
+    raw = json.dumps({"model": model, "prompt": prompt, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend:
+    """Storage interface of the response cache.
+
+    Subclass it and pass an instance as the ``CACHE_BACKEND`` config value
+    to store answers elsewhere. Keys come from :func:`make_cache_key` and
+    values are complete answer strings. Implementations must be safe to
+    call from several threads and keep ``hits`` / ``misses`` counters.
+    """
+
+    hits = 0
+    misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, or None on a miss."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: str):
+        """Store an answer."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop all cached entries."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Return ``hits``, ``misses``, ``entries`` and ``bytes``."""
+        raise NotImplementedError
+
+
+class ResponseCache(CacheBackend):
+    """In-process LRU cache of answer text with TTL and a memory budget.
+
+    Only the generated text is stored; response ids and timestamps are
+    produced fresh by the formatters on every hit.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory held by cached entries."""
+        return self._bytes
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str):
+        """Store an answer, evicting least recently used entries as needed."""
+        size = len(key) + len(value.encode("utf-8")) + _ENTRY_OVERHEAD
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+def create_cache(config) -> Optional[CacheBackend]:
+    """Build a response cache from app config, or None when caching is off.
+
+    Recognised keys: ``CACHE_MAX_ENTRIES`` (enables the in-process cache),
+    ``CACHE_TTL`` (seconds) and ``CACHE_MAX_BYTES``. ``CACHE_BACKEND`` set
+    to ``"sqlite"`` stores answers in the SQLite database at ``CACHE_PATH``
+    instead, shared by every worker process using that file, with up to
+    ``CACHE_POOL_SIZE`` idle connections per process; set it to a
+    :class:`CacheBackend` instance to use custom storage.
+    """
+    backend = config.get("CACHE_BACKEND", "memory")
+    if isinstance(backend, CacheBackend):
+        return backend
+    if backend == "sqlite":
+        from func_to_gen.sqlite_cache import SQLiteCache
+
+        path = config.get("CACHE_PATH")
+        if not path:
+            raise ValueError("CACHE_BACKEND 'sqlite' requires CACHE_PATH")
+        return SQLiteCache(
+            path,
+            max_entries=config.get("CACHE_MAX_ENTRIES"),
+            ttl=config.get("CACHE_TTL"),
+            max_bytes=config.get("CACHE_MAX_BYTES"),
+            evict_interval=config.get("CACHE_EVICT_INTERVAL", 1.0),
+            pool_size=config.get("CACHE_POOL_SIZE", 4),
+        )
+    if backend != "memory":
+        raise ValueError(f"Unknown CACHE_BACKEND: {backend!r}")
+    max_entries = config.get("CACHE_MAX_ENTRIES")
+    if not max_entries:
+        return None
+    return ResponseCache(
+        max_entries=max_entries,
+        ttl=config.get("CACHE_TTL"),
+        max_bytes=config.get("CACHE_MAX_BYTES"),
+    )
+
+
+def is_cache_bypassed(data: dict, headers) -> bool:
+    """Whether a request opted out of the cache via ``cache: false`` or Cache-Control."""
+    if data.get("cache") is False:
+        return True
+    cache_control = headers.get("Cache-Control", "").lower()
+    return "no-cache" in cache_control or "no-store" in cache_control
+
+
+def record_stream(chunks, on_complete):
+    """Yield chunks unchanged and pass the joined text to ``on_complete`` at the end."""
+    seen = []
+    for chunk in chunks:
+        seen.append(chunk)
+        yield chunk
+    on_complete("".join(seen))
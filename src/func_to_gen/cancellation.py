@@ -0,0 +1,129 @@
+"""Cancellation of answers whose client has disconnected."""
+
+import inspect
+import select
+import socket
+import threading
+import weakref
+
+# How often a request waiting on a worker checks whether its client left, in seconds
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class ClientDisconnected(Exception):
+    """Raised when a request is abandoned because its client went away."""
+
+    def __init__(self):
+        super().__init__("Client closed the connection")
+
+
+class CancelToken:
+    """Signals that the client of a request has disconnected.
+
+    Answer functions opt in by accepting a ``cancel`` keyword argument and
+    either polling it between steps or registering a callback:
+
+        def answer(prompt, cancel=None):
+            cancel.add_callback(model.abort)
+            for token in model.generate(prompt):
+                if cancel.cancelled:
+                    break
+                yield token
+
+    ``probe`` is an optional callable checking the connection itself, so
+    ``cancelled`` notices a disconnect even while no response is written.
+    Callbacks run once something checks ``cancelled``; the app does so
+    while an answer runs, so they fire while a blocking answer is still
+    working.
+    """
+
+    def __init__(self, probe=None):
+        self._probe = probe
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the request was cancelled (probing the connection if possible)."""
+        if not self._event.is_set() and self._probe is not None and self._probe():
+            self.cancel()
+        return self._event.is_set()
+
+    @property
+    def probing(self) -> bool:
+        """Whether the token can notice a disconnect by itself, through its probe."""
+        return self._probe is not None
+
+    def cancel(self):
+        """Cancel the request and run the registered callbacks once."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Call ``callback()`` on cancellation (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout=None) -> bool:
+        """Block until :meth:`cancel` is called or ``timeout`` passes."""
+        return self._event.wait(timeout)
+
+
+def socket_probe(sock):
+    """Build a probe reporting whether the peer of ``sock`` has closed it."""
+    def probe() -> bool:
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return False
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except ValueError:
+            # Closed socket object or a TLS socket that cannot peek
+            return False
+        except OSError:
+            return True
+    return probe
+
+
+# Named parameters per answer function; weak so unloaded models can be freed
+_keyword_cache = weakref.WeakKeyDictionary()
+
+
+def _keyword_names(func) -> frozenset:
+    try:
+        return _keyword_cache[func]
+    except (KeyError, TypeError):
+        pass
+    try:
+        parameters = inspect.signature(func).parameters.values()
+    except (TypeError, ValueError):
+        names = frozenset()
+    else:
+        names = frozenset(
+            p.name for p in parameters
+            if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+        )
+    try:
+        _keyword_cache[func] = names
+    except TypeError:
+        pass
+    return names
+
+
+def answer_kwargs(func, **values) -> dict:
+    """The non-None ``values`` that ``func`` declares as named parameters.
+
+    A bare ``**kwargs`` does not opt in, since such functions often forward
+    their keyword arguments to a model client.
+    """
+    names = _keyword_names(func)
+    return {name: value for name, value in values.items() if value is not None and name in names}
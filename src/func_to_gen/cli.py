@@ -0,0 +1,112 @@
+"""Command line interface.
+
+Example:
+    func-to-gen serve llm:answer --workers 4 --port 5000 --config MAX_CONCURRENCY=8
+"""
+
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from typing import Optional
+
+
+def parse_config(items: list) -> dict:
+    """Parse ``KEY=VALUE`` pairs, decoding values as JSON where possible."""
+    config = {}
+    for item in items:
+        key, _, raw = item.partition("=")
+        try:
+            config[key] = json.loads(raw)
+        except ValueError:
+            config[key] = raw
+    return config
+
+
+def answer_loader(target: str, config: dict, warmup: Optional[str] = None):
+    """Build the master's loader for ``func-to-gen serve``.
+
+    Each call imports the answer function named by ``target`` (re-importing
+    its module on reloads) and returns a factory building the app around it.
+    The ``warmup`` callable, if named, runs in every worker before it
+    reports ready.
+    """
+    from func_to_gen.app import create_app
+    from func_to_gen.registry import import_object
+
+    loads = []
+
+    def load():
+        answer_func = import_object(target, reload=bool(loads))
+        warmup_func = import_object(warmup) if warmup else None
+        loads.append(target)
+        return partial(create_app, answer_func=answer_func, config=config, warmup=warmup_func)
+
+    return load
+
+
+def serve(args) -> int:
+    from func_to_gen.server import PreforkServer
+
+    # Resolve targets like llm:answer from the working directory, as `python -m` would
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+
+    server = PreforkServer(
+        answer_loader(args.target, parse_config(args.config), args.warmup),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=not args.no_threads,
+        graceful_timeout=args.graceful_timeout,
+    )
+    server.serve()
+    return 0
+
+
+def bench(args) -> int:
+    from func_to_gen.bench import main as bench_main
+
+    return bench_main(args.bench_args)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="func-to-gen", description="Serve a Python function as an OpenAI/Ollama API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser(
+        "serve",
+        help="serve an answer function with pre-forked worker processes",
+        description="Load the answer function once, then fork worker processes sharing it copy-on-write. "
+                    "Send SIGHUP to reload it and replace the workers gracefully.",
+    )
+    serve_parser.add_argument("target", help="answer function as module:attribute, e.g. llm:answer")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=5000, help="port to listen on (default: 5000)")
+    serve_parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    serve_parser.add_argument("--no-threads", action="store_true",
+                              help="serve one request at a time per worker")
+    serve_parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                              help="seconds stopping workers may spend on in-flight requests (default: 30)")
+    serve_parser.add_argument("--warmup", metavar="MODULE:ATTRIBUTE",
+                              help="callable run with the answer function in each worker before /ready succeeds")
+    serve_parser.add_argument("--config", action="append", default=[], metavar="KEY=VALUE",
+                              help="app config override, e.g. MAX_CONCURRENCY=4 (repeatable)")
+    serve_parser.set_defaults(handler=serve)
+
+    bench_parser = commands.add_parser(
+        "bench", help="benchmark the endpoints (see python -m func_to_gen.bench --help)", add_help=False,
+    )
+    bench_parser.add_argument("bench_args", nargs=argparse.REMAINDER)
+    bench_parser.set_defaults(handler=bench)
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Server-side state behind Ollama's ``context`` field.
+
+Ollama's ``/api/generate`` returns a ``context`` that clients send back to
+continue where the previous answer left off. Here it is a compact handle,
+``[id]``, to a :class:`GenerationContext` kept in a bounded store, so a
+continued conversation does not resend (or reprocess) its history.
+
+The store lives in the memory of one process. Behind several worker
+processes or servers, a handle only continues its conversation when the
+follow-up reaches the same process; elsewhere, as after a restart or once
+the context is evicted, it starts a new conversation, as it does when
+sent with another model.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from func_to_gen.utils import messages_to_prompt
+
+# Rough per-entry bookkeeping overhead, in bytes
+_ENTRY_OVERHEAD = 256
+
+# Default budget for stored histories, in bytes
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class InvalidContextError(ValueError):
+    """A request's ``context`` is not a list of integers."""
+
+
+class GenerationContext:
+    """A conversation continued through Ollama's ``context`` field.
+
+    Answer functions opt in by accepting a ``context`` keyword argument;
+    they are then called with only the new prompt text, and may keep
+    backend state such as a session or KV-cache id for the next turn:
+
+        def answer(prompt, context=None):
+            session = context.state or model.new_session(context.history)
+            context.state = session
+            return session.continue_with(prompt)
+
+    Answer functions without a ``context`` parameter are called with
+    :meth:`full_prompt` instead.
+
+    Attributes:
+        history: The earlier turns, one ``user: <prompt>`` and one
+            ``assistant: <answer>`` line each, as written by
+            :func:`func_to_gen.utils.messages_to_prompt`.
+        state: What the answer function kept on the previous turn, or None.
+    """
+
+    def __init__(self, history: str = "", state: Any = None):
+        self.history = history
+        self.state = state
+
+    def full_prompt(self, prompt: str) -> str:
+        """The earlier turns followed by ``prompt`` as the next user turn."""
+        if not self.history:
+            return prompt
+        return self.history + "\n" + messages_to_prompt([{"role": "user", "content": prompt}])
+
+    def add_turn(self, prompt: str, answer: str):
+        """Append a finished turn to the history."""
+        turn = messages_to_prompt([{"role": "user", "content": prompt}, {"role": "assistant", "content": answer}])
+        self.history = self.history + "\n" + turn if self.history else turn
+
+
+class ContextStore:
+    """Bounded LRU store of generation contexts with TTL and a memory budget.
+
+    Handles are random, so one client cannot guess another's context, and
+    belong to the model that answered them. Only the history counts
+    towards ``max_bytes``; backend state is opaque.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl: Optional[float] = None, max_bytes: Optional[int] = DEFAULT_MAX_BYTES,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def resume(self, value, model: str) -> GenerationContext:
+        """Start a turn of ``model`` from a request's ``context`` field.
+
+        A missing or empty ``context``, or one that is not a handle to a
+        stored conversation with ``model`` (such as token ids from an Ollama
+        server, or an evicted handle), starts a new conversation. Returns a
+        copy, so a handle can be continued more than once.
+        """
+        if value is None:
+            return GenerationContext()
+        if not isinstance(value, list) or not all(isinstance(item, int) for item in value):
+            raise InvalidContextError("context must be a list of integers")
+        if len(value) != 1:
+            return GenerationContext()
+        with self._lock:
+            entry = self._entries.get(value[0])
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(value[0])
+                entry = None
+            if entry is None or entry[3] != model:
+                return GenerationContext()
+            self._entries.move_to_end(value[0])
+        context = entry[0]
+        return GenerationContext(context.history, context.state)
+
+    def new_handle(self) -> int:
+        """A fresh handle, safe as a JSON number in any client."""
+        while True:
+            handle = secrets.randbits(53)
+            if handle and handle not in self._entries:
+                return handle
+
+    def save(self, handle: int, model: str, context: GenerationContext, prompt: str, answer: str):
+        """Store ``context`` extended by a finished turn of ``model`` under ``handle``."""
+        context.add_turn(prompt, answer)
+        size = len(context.history.encode("utf-8")) + _ENTRY_OVERHEAD
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[handle] = (context, expires, size, model)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        """Return the number of stored contexts and their size."""
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, handle: int):
+        size = self._entries.pop(handle)[2]
+        self._bytes -= size
+
+
+def create_context_store(config) -> Optional[ContextStore]:
+    """Build the context store from app config, or None when contexts are off.
+
+    Recognised keys: ``CONTEXT_MAX_ENTRIES`` (default 1024, 0 turns
+    contexts off), ``CONTEXT_TTL`` (seconds) and ``CONTEXT_MAX_BYTES``
+    (default 64 MiB).
+    """
+    max_entries = config.get("CONTEXT_MAX_ENTRIES", 1024)
+    if not max_entries:
+        return None
+    return ContextStore(
+        max_entries=max_entries,
+        ttl=config.get("CONTEXT_TTL"),
+        max_bytes=config.get("CONTEXT_MAX_BYTES", DEFAULT_MAX_BYTES),
+    )
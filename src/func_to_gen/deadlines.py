@@ -0,0 +1,68 @@
+"""Per-request deadlines."""
+
+import time
+from typing import Optional, Union
+
+# Header carrying a per-request timeout in seconds
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+class RequestTimeout(Exception):
+    """Raised when a request is not answered before its deadline."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"Request timed out after {timeout:g}s")
+        self.timeout = timeout
+
+
+class InvalidTimeoutError(ValueError):
+    """Raised for a malformed per-request timeout."""
+
+
+class Deadline:
+    """The time by which a request must be answered.
+
+    Answer functions declaring a ``deadline`` parameter receive it and can
+    cap their work accordingly:
+
+        def answer(prompt, deadline=None):
+            max_tokens = int(deadline.remaining() * TOKENS_PER_SECOND)
+            ...
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (0 once it has passed)."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def parse_timeout(value: Union[str, int, float, None]) -> Optional[float]:
+    """Parse a timeout in seconds; None when no value was given."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise InvalidTimeoutError(f"Invalid timeout: {value}")
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise InvalidTimeoutError(f"Invalid timeout: {value}") from None
+    if not seconds > 0:
+        raise InvalidTimeoutError(f"Invalid timeout: {value}")
+    return seconds
+
+
+def request_deadline(data: dict, headers, default: Optional[float] = None) -> Optional[Deadline]:
+    """Deadline from the ``timeout`` body field, the timeout header or the server default."""
+    timeout = parse_timeout(data.get("timeout"))
+    if timeout is None:
+        timeout = parse_timeout(headers.get(TIMEOUT_HEADER))
+    if timeout is None:
+        timeout = default
+    return Deadline(timeout) if timeout else None
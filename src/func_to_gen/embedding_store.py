@@ -0,0 +1,284 @@
+"""Persistent on-disk cache of embedding vectors.
+
+Vectors are appended to a raw float32 file that readers memory-map, and
+each vector's key (a hash of model and text) is appended to a compact
+binary index of fixed-size records. Both files only grow, so several
+worker processes can share one directory: writers serialize appends with
+a file lock and readers pick up new records by reading the index tail.
+
+When the store exceeds its size cap, compaction rewrites the newest
+entries into a new generation of files and switches ``meta.json`` over
+to it atomically; readers notice the new generation and reload.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from func_to_gen.embeddings import _numpy
+
+# Index record: 16-byte key digest and the vector's row number
+_RECORD = struct.Struct("<16sQ")
+
+# Fraction of the size cap kept when compacting
+COMPACT_KEEP = 0.75
+
+
+def make_embedding_key(model: str, text: str) -> bytes:
+    """Content hash identifying the embedding of ``text`` by ``model``."""
+    return hashlib.blake2b(f"{model}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingStore:
+    """Content-addressed embedding vectors stored in ``path``.
+
+    Args:
+        path: Directory holding the store (created unless ``readonly``).
+        max_entries: Compact down to the newest entries beyond this many.
+        max_bytes: Compact when the vector file would exceed this size.
+        readonly: Only serve vectors written by other processes.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        readonly: bool = False,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self._generation = None
+        self._meta_stat = None
+        self._rows = {}
+        self._index_offset = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+        if not readonly:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def size_bytes(self) -> int:
+        """Bytes of vector data referenced by the index."""
+        return len(self._rows) * self.dim * 4 if self.dim else 0
+
+    def get_many(self, model: str, texts: list[str]):
+        """Look up stored embeddings of ``texts``.
+
+        Returns ``(positions, vectors)``: the positions in ``texts`` that were
+        found and a float32 matrix holding their vectors in the same order.
+        """
+        np = _numpy()
+        keys = [make_embedding_key(model, text) for text in texts]
+        with self._lock:
+            self._refresh()
+            positions = [i for i, key in enumerate(keys) if key in self._rows]
+            vectors = None
+            if positions:
+                rows = [self._rows[keys[i]] for i in positions]
+                try:
+                    vectors = np.array(self._map_vectors(max(rows) + 1)[rows], dtype=np.float32)
+                except FileNotFoundError:
+                    # Another process compacted the store after our refresh
+                    positions = []
+            self.hits += len(positions)
+            self.misses += len(keys) - len(positions)
+        return positions, vectors
+
+    def put_many(self, model: str, texts: list[str], vectors):
+        """Append embeddings of texts not stored yet (a no-op when read-only)."""
+        if self.readonly or not texts:
+            return
+        np = _numpy()
+        keys = [make_embedding_key(model, text) for text in texts]
+        vectors = np.asarray(vectors, dtype="<f4")
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self._start_generation(0, vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding cache at {self.path} holds {self.dim}-dimensional vectors, "
+                    f"got {vectors.shape[1]}; use a separate EMBED_CACHE_DIR per embed function"
+                )
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows and key not in new:
+                    new[key] = vector
+            if not new:
+                return
+            with open(self._file("vectors"), "ab") as vector_file:
+                first_row = vector_file.tell() // (self.dim * 4)
+                vector_file.write(np.stack(list(new.values())).tobytes())
+            records = b"".join(_RECORD.pack(key, first_row + i) for i, key in enumerate(new))
+            with open(self._file("index"), "ab") as index_file:
+                index_file.write(records)
+            self._read_index()
+            if self._over_capacity():
+                self._compact()
+
+    def compact(self):
+        """Rewrite the store keeping only the entries within the size cap."""
+        if self.readonly:
+            return
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is not None:
+                self._compact()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit ratio and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._rows),
+            "bytes": self.size_bytes,
+        }
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        generation = self._generation if generation is None else generation
+        suffix = "f32" if kind == "vectors" else "bin"
+        return os.path.join(self.path, f"{kind}-{generation}.{suffix}")
+
+    def _file_lock(self):
+        return _FileLock(os.path.join(self.path, "lock"))
+
+    def _refresh(self):
+        """Pick up records appended, or a compaction done, by other processes."""
+        meta_path = os.path.join(self.path, "meta.json")
+        try:
+            stat = os.stat(meta_path)
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_mtime_ns) != self._meta_stat:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            self._meta_stat = (stat.st_ino, stat.st_mtime_ns)
+            if meta["generation"] != self._generation:
+                self._generation = meta["generation"]
+                self.dim = meta["dim"]
+                self._rows = {}
+                self._index_offset = 0
+                self._vectors = None
+        self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self._file("index"), "rb") as index_file:
+                index_file.seek(self._index_offset)
+                data = index_file.read()
+        except FileNotFoundError:
+            return
+        usable = len(data) - len(data) % _RECORD.size
+        for key, row in _RECORD.iter_unpack(data[:usable]):
+            self._rows[key] = row
+        self._index_offset += usable
+
+    def _map_vectors(self, rows: int):
+        """Memory-map at least ``rows`` vectors of the current generation."""
+        if self._vectors is None or len(self._vectors) < rows:
+            np = _numpy()
+            size = os.path.getsize(self._file("vectors"))
+            self._vectors = np.memmap(
+                self._file("vectors"), dtype="<f4", mode="r", shape=(size // (self.dim * 4), self.dim),
+            )
+        return self._vectors
+
+    def _start_generation(self, generation: int, dim: int):
+        """Point ``meta.json`` at a new generation of (already written) files."""
+        for kind in ("vectors", "index"):
+            open(self._file(kind, generation), "ab").close()
+        meta_path = os.path.join(self.path, "meta.json")
+        tmp_path = meta_path + ".tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump({"generation": generation, "dim": dim}, meta_file)
+        os.replace(tmp_path, meta_path)
+        self._refresh()
+
+    def _capacity(self) -> Optional[int]:
+        limits = []
+        if self.max_entries:
+            limits.append(self.max_entries)
+        if self.max_bytes and self.dim:
+            limits.append(self.max_bytes // (self.dim * 4))
+        return min(limits) if limits else None
+
+    def _over_capacity(self) -> bool:
+        capacity = self._capacity()
+        return capacity is not None and len(self._rows) > capacity
+
+    def _compact(self):
+        """Copy the newest entries within the size cap into a new generation."""
+        np = _numpy()
+        capacity = self._capacity()
+        keep = len(self._rows) if capacity is None else int(capacity * COMPACT_KEEP)
+        newest = sorted(self._rows.items(), key=lambda item: item[1])[max(len(self._rows) - keep, 0):]
+        old_generation = self._generation
+        new_generation = old_generation + 1
+        vectors = self._map_vectors(max((row for _, row in newest), default=-1) + 1)
+        with open(self._file("vectors", new_generation), "wb") as vector_file:
+            if newest:
+                vector_file.write(np.ascontiguousarray(vectors[[row for _, row in newest]]).tobytes())
+        with open(self._file("index", new_generation), "wb") as index_file:
+            index_file.write(b"".join(_RECORD.pack(key, i) for i, (key, _) in enumerate(newest)))
+        self._start_generation(new_generation, self.dim)
+        for kind in ("vectors", "index"):
+            try:
+                os.remove(self._file(kind, old_generation))
+            except FileNotFoundError:
+                pass
+
+
+class _FileLock:
+    """Exclusive lock on a file shared by the processes writing one store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+def create_embedding_store(config) -> Optional[EmbeddingStore]:
+    """Build an embedding cache from app config, or None when it is off.
+
+    Recognised keys: ``EMBED_CACHE_DIR`` (enables the cache),
+    ``EMBED_CACHE_MAX_ENTRIES``, ``EMBED_CACHE_MAX_BYTES`` and
+    ``EMBED_CACHE_READONLY``.
+    """
+    path = config.get("EMBED_CACHE_DIR")
+    if not path:
+        return None
+    return EmbeddingStore(
+        path,
+        max_entries=config.get("EMBED_CACHE_MAX_ENTRIES"),
+        max_bytes=config.get("EMBED_CACHE_MAX_BYTES"),
+        readonly=config.get("EMBED_CACHE_READONLY", False),
+    )
@@ -0,0 +1,175 @@
+"""Embedding support for the /v1/embeddings and /api/embeddings routes.
+
+Requires NumPy (``pip install func-to-gen[embeddings]``).
+"""
+
+import base64
+import time
+from typing import Optional
+
+from func_to_gen.utils import (
+    format_embeddings_response,
+    format_ollama_embed_response,
+    format_ollama_embeddings_response,
+)
+
+
+class EmbeddingRequestError(ValueError):
+    """Raised for malformed embedding requests (reported as HTTP 400)."""
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - depends on the environment
+        raise RuntimeError("Embeddings require NumPy: pip install func-to-gen[embeddings]") from exc
+    return numpy
+
+
+class EmbeddingService:
+    """Run a batch embed function in backend-sized chunks.
+
+    ``embed_func(texts: list[str])`` must return a 2D array-like with one
+    row per text. Inputs longer than ``batch_size`` are split into several
+    calls and the results stacked into one float32 matrix. With a ``store``
+    (:class:`func_to_gen.embedding_store.EmbeddingStore`), texts embedded
+    before are served from it and only the rest reach ``embed_func``.
+    """
+
+    def __init__(self, embed_func, batch_size: int = 64, store=None):
+        self.embed_func = embed_func
+        self.batch_size = batch_size
+        self.store = store
+
+    def embed(self, texts: list[str], model: str = ""):
+        """Embed ``texts`` and return an ``(len(texts), dim)`` float32 array."""
+        if self.store is None:
+            return self._embed_batches(texts)
+        np = _numpy()
+        positions, cached = self.store.get_many(model, texts)
+        if len(positions) == len(texts):
+            return cached
+        found = set(positions)
+        missing = [i for i in range(len(texts)) if i not in found]
+        computed = self._embed_batches([texts[i] for i in missing])
+        self.store.put_many(model, [texts[i] for i in missing], computed)
+        if not positions:
+            return computed
+        vectors = np.empty((len(texts), computed.shape[1]), dtype=np.float32)
+        vectors[positions] = cached
+        vectors[missing] = computed
+        return vectors
+
+    def _embed_batches(self, texts: list[str]):
+        np = _numpy()
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors = np.asarray(self.embed_func(batch), dtype=np.float32)
+            if vectors.ndim != 2 or vectors.shape[0] != len(batch):
+                raise RuntimeError(
+                    f"Embed function returned shape {vectors.shape} for {len(batch)} inputs"
+                )
+            batches.append(vectors)
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32)
+        return batches[0] if len(batches) == 1 else np.concatenate(batches)
+
+
+def truncate_dimensions(vectors, dimensions: int):
+    """Keep the first ``dimensions`` components of each row and re-normalize to unit length."""
+    np = _numpy()
+    truncated = vectors[:, :dimensions]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.where(norms == 0, 1, norms)
+
+
+def encode_base64(vector) -> str:
+    """Pack a vector as little-endian float32 and base64-encode it."""
+    np = _numpy()
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def parse_openai_input(data: dict) -> list[str]:
+    """Validate the OpenAI ``input`` field (a string or list of strings)."""
+    texts = data.get("input")
+    if isinstance(texts, str):
+        texts = [texts]
+    if not texts or not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        raise EmbeddingRequestError("input must be a non-empty string or list of strings")
+    return texts
+
+
+def parse_dimensions(data: dict) -> Optional[int]:
+    """Validate the optional OpenAI ``dimensions`` field."""
+    dimensions = data.get("dimensions")
+    if dimensions is None:
+        return None
+    if not isinstance(dimensions, int) or isinstance(dimensions, bool) or dimensions < 1:
+        raise EmbeddingRequestError("dimensions must be a positive integer")
+    return dimensions
+
+
+def parse_encoding_format(data: dict) -> str:
+    """Validate the OpenAI ``encoding_format`` field."""
+    encoding_format = data.get("encoding_format") or "float"
+    if encoding_format not in ("float", "base64"):
+        raise EmbeddingRequestError("encoding_format must be 'float' or 'base64'")
+    return encoding_format
+
+
+def encode_embeddings(vectors, encoding_format: str = "float") -> list:
+    """Convert an embedding matrix to JSON-ready float lists or base64 strings."""
+    if encoding_format == "base64":
+        return [encode_base64(vector) for vector in vectors]
+    return vectors.tolist()
+
+
+def answer_openai_embeddings(service: EmbeddingService, data: dict, model: str, tokenizer) -> dict:
+    """Answer an OpenAI /v1/embeddings request body."""
+    texts = parse_openai_input(data)
+    dimensions = parse_dimensions(data)
+    encoding_format = parse_encoding_format(data)
+    vectors = service.embed(texts, model)
+    if dimensions is not None:
+        vectors = truncate_dimensions(vectors, dimensions)
+    prompt_tokens = sum(tokenizer(text) for text in texts)
+    return format_embeddings_response(encode_embeddings(vectors, encoding_format), model, prompt_tokens)
+
+
+def answer_ollama_embeddings(service: EmbeddingService, data: dict, model: str) -> dict:
+    """Answer a legacy Ollama /api/embeddings request body (single ``prompt``)."""
+    prompt = data.get("prompt")
+    if not prompt or not isinstance(prompt, str):
+        raise EmbeddingRequestError("prompt is required")
+    return format_ollama_embeddings_response(service.embed([prompt], model)[0].tolist())
+
+
+def answer_ollama_embed(service: EmbeddingService, data: dict, model: str, tokenizer) -> dict:
+    """Answer an Ollama /api/embed request body (``input`` string or list)."""
+    texts = parse_openai_input(data)
+    dimensions = parse_dimensions(data)
+    started_ns = time.perf_counter_ns()
+    vectors = service.embed(texts, model)
+    # /api/embed returns unit-length vectors
+    vectors = truncate_dimensions(vectors, dimensions or vectors.shape[1])
+    total_duration = time.perf_counter_ns() - started_ns
+    return format_ollama_embed_response(
+        vectors.tolist(),
+        model,
+        prompt_eval_count=sum(tokenizer(text) for text in texts),
+        total_duration=total_duration,
+    )
+
+
+def create_embedding_service(embed_func, config) -> Optional[EmbeddingService]:
+    """Wrap an embed function using ``EMBED_BATCH_SIZE`` and the ``EMBED_CACHE_*`` app config."""
+    if embed_func is None:
+        return None
+    from func_to_gen.embedding_store import create_embedding_store
+
+    return EmbeddingService(
+        embed_func,
+        batch_size=config.get("EMBED_BATCH_SIZE", 64),
+        store=create_embedding_store(config),
+    )
@@ -0,0 +1,296 @@
+"""Bounded worker pool for running answer functions."""
+
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Optional
+
+from func_to_gen.cancellation import CANCEL_POLL_INTERVAL, CancelToken, ClientDisconnected
+from func_to_gen.deadlines import RequestTimeout
+from func_to_gen.scheduler import DEFAULT_PRIORITY_CLASSES, FairQueue
+from func_to_gen.utils import collect_answer
+
+_VALUE = "value"
+_STREAM = "stream"
+_CHUNK = "chunk"
+_END = "end"
+_ERROR = "error"
+
+
+class QueueFullError(Exception):
+    """Raised when the worker pool cannot accept more requests."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Server is overloaded, please retry later")
+        self.retry_after = retry_after
+
+
+def _call_collected(func, prompt: str) -> str:
+    """Call an answer function and join its result (runs in worker processes)."""
+    return collect_answer(func(prompt))
+
+
+class AnswerExecutor:
+    """Run answer functions on a bounded pool with a bounded wait queue.
+
+    At most ``max_workers`` answers are generated at once and at most
+    ``max_queue`` more wait for a free worker. Anything beyond that is
+    rejected immediately with :class:`QueueFullError`.
+
+    Waiting answers are handed to free workers by priority class, highest
+    first, and fairly between tenants within a class
+    (:class:`func_to_gen.scheduler.FairQueue`), so a tenant flooding the
+    queue cannot starve others. ``wait_observer``, when set, is called with
+    ``(priority class, seconds queued)`` as each answer starts.
+
+    With ``kind="thread"`` chunked answers are streamed back to the caller
+    while the worker keeps its slot. With ``kind="process"`` the answer
+    function must be picklable and its result is joined in the worker.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue: int = 16,
+        kind: str = "thread",
+        retry_after: int = 1,
+        priority_classes=DEFAULT_PRIORITY_CLASSES,
+        tenant_weights: Optional[dict] = None,
+        default_priority: Optional[str] = None,
+    ):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.wait_observer = None
+        self._capacity = max_workers + max_queue
+        self._pending = 0
+        self._running = 0
+        self._queue = FairQueue(priority_classes, tenant_weights, default_priority)
+        self._lock = threading.Lock()
+        if kind == "process":
+            # Imported here as multiprocessing adds noticeably to startup time
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="func-to-gen")
+
+    @property
+    def pending(self) -> int:
+        """Number of answers currently running or waiting for a worker."""
+        return self._pending
+
+    def queue_depths(self) -> dict:
+        """Number of answers waiting for a worker, per priority class."""
+        with self._lock:
+            return self._queue.depths()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self._capacity:
+                raise QueueFullError(self.retry_after)
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self, func, prompt: str, cancel=None, deadline=None, priority=None, tenant=None):
+        """Run ``func(prompt)`` on the pool and return its result.
+
+        Returns a string, or an iterator of chunks when the answer function
+        streams (thread pools only). ``priority`` names the class the
+        answer queues in (the default class when unknown or None) and
+        ``tenant`` who it is accounted to for fair queuing.
+
+        With a ``cancel`` token
+        (:class:`func_to_gen.cancellation.CancelToken`), an answer still
+        waiting for a worker is dropped once the client disconnects, a
+        streaming worker stops pulling chunks, and the caller gets
+        :class:`ClientDisconnected` instead of waiting for the result.
+
+        With a ``deadline`` (:class:`func_to_gen.deadlines.Deadline`), an
+        answer that has not started by then is dropped and the caller gets
+        :class:`RequestTimeout` once it passes; the ``cancel`` token is
+        cancelled so cooperative answer functions give up their worker.
+        """
+        self._acquire()
+        future = Future()
+        future.add_done_callback(self._release)
+        if self.kind == "process":
+            job = partial(_call_collected, func, prompt)
+        else:
+            channel = queue.Queue()
+            job = partial(_produce, func, prompt, channel, cancel, deadline)
+        with self._lock:
+            self._queue.push((job, future), priority, tenant)
+        self._dispatch()
+
+        if self.kind == "process":
+            return _wait(future.result, future, cancel, deadline)
+
+        kind, payload = _wait(partial(channel.get, True), future, cancel, deadline)
+        if kind == _ERROR:
+            raise payload
+        if kind == _VALUE:
+            return payload
+        return _drain(channel, future, cancel, deadline)
+
+    def _dispatch(self):
+        """Start queued answers while workers are free."""
+        started = []
+        with self._lock:
+            while self._running < self.max_workers and len(self._queue):
+                (job, future), priority, waited = self._queue.pop()
+                if not future.set_running_or_notify_cancel():
+                    # Abandoned while queued; its slot was released on cancel
+                    continue
+                self._running += 1
+                started.append((job, future, priority, waited))
+        for job, future, priority, waited in started:
+            if self.wait_observer is not None:
+                self.wait_observer(priority, waited)
+            try:
+                work = self._pool.submit(job)
+            except BaseException as exc:
+                self._finish(future, exc=exc)
+                continue
+            work.add_done_callback(partial(self._complete, future))
+
+    def _complete(self, future: Future, work: Future):
+        try:
+            result = work.result()
+        except BaseException as exc:
+            self._finish(future, exc=exc)
+        else:
+            self._finish(future, result=result)
+
+    def _finish(self, future: Future, result=None, exc=None):
+        with self._lock:
+            self._running -= 1
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+        self._dispatch()
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the underlying pool."""
+        self._pool.shutdown(wait=wait)
+
+
+def _produce(func, prompt: str, channel: queue.Queue, cancel=None, deadline=None):
+    """Worker body: call the answer function and forward its output."""
+    try:
+        if deadline is not None and deadline.expired:
+            raise RequestTimeout(deadline.timeout)
+        if cancel is not None and cancel.cancelled:
+            raise ClientDisconnected()
+        result = func(prompt)
+        if isinstance(result, str):
+            channel.put((_VALUE, result))
+            return
+        channel.put((_STREAM, None))
+        for chunk in result:
+            if cancel is not None and cancel.cancelled:
+                close = getattr(result, "close", None)
+                if close is not None:
+                    close()
+                raise ClientDisconnected()
+            channel.put((_CHUNK, chunk))
+        channel.put((_END, None))
+    except BaseException as exc:
+        channel.put((_ERROR, exc))
+
+
+def _wait(get, future, cancel=None, deadline=None):
+    """Return ``get(timeout)``, giving up when the client disconnects or the deadline passes."""
+    if cancel is None and deadline is None:
+        return get(None)
+    while True:
+        timeout = CANCEL_POLL_INTERVAL if cancel is not None else None
+        if deadline is not None:
+            remaining = deadline.remaining()
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            return get(timeout)
+        except (queue.Empty, FutureTimeoutError):
+            pass
+        if deadline is not None and deadline.expired:
+            if future is not None:
+                future.cancel()
+            if cancel is not None:
+                cancel.cancel()
+            raise RequestTimeout(deadline.timeout)
+        if cancel is not None and cancel.cancelled:
+            if future is not None:
+                future.cancel()
+            raise ClientDisconnected()
+
+
+def _drain(channel: queue.Queue, future=None, cancel=None, deadline=None):
+    """Yield streamed chunks forwarded by a worker."""
+    get = partial(channel.get, True)
+    try:
+        while True:
+            kind, payload = _wait(get, future, cancel, deadline)
+            if kind == _END:
+                return
+            if kind == _ERROR:
+                raise payload
+            yield payload
+    except GeneratorExit:
+        # Closed early by the caller: the worker stops pulling chunks
+        if cancel is not None:
+            cancel.cancel()
+        raise
+
+
+def run_on_thread(func, prompt: str, cancel=None, deadline=None):
+    """Run ``func(prompt)`` on a thread of its own, waiting for it as :meth:`AnswerExecutor.run` does.
+
+    Without a worker pool this still bounds the whole answer, each
+    streamed chunk included, by ``deadline``. Once it passes (or the
+    client disconnects) the caller gets :class:`RequestTimeout` (or
+    :class:`ClientDisconnected`) and the thread stops pulling chunks.
+    """
+    # The thread stops streaming once the token is cancelled
+    cancel = cancel if cancel is not None else CancelToken()
+    channel = queue.Queue()
+    thread = threading.Thread(
+        target=_produce, args=(func, prompt, channel, cancel, deadline), name="func-to-gen-answer", daemon=True,
+    )
+    thread.start()
+    kind, payload = _wait(partial(channel.get, True), None, cancel, deadline)
+    if kind == _ERROR:
+        raise payload
+    if kind == _VALUE:
+        return payload
+    return _drain(channel, None, cancel, deadline)
+
+
+def create_executor(config) -> Optional[AnswerExecutor]:
+    """Build an executor from app config, or None when no pool is configured.
+
+    Recognised keys: ``MAX_CONCURRENCY`` (enables the pool),
+    ``MAX_QUEUE_DEPTH``, ``EXECUTOR`` (``"thread"`` or ``"process"``),
+    ``RETRY_AFTER`` (seconds), ``PRIORITY_CLASSES`` (names, highest
+    first), ``DEFAULT_PRIORITY`` and ``TENANT_WEIGHTS`` (tenant ->
+    relative share of its class).
+    """
+    max_workers = config.get("MAX_CONCURRENCY")
+    if not max_workers:
+        return None
+    return AnswerExecutor(
+        max_workers=max_workers,
+        max_queue=config.get("MAX_QUEUE_DEPTH", 16),
+        kind=config.get("EXECUTOR", "thread"),
+        retry_after=config.get("RETRY_AFTER", 1),
+        priority_classes=config.get("PRIORITY_CLASSES", DEFAULT_PRIORITY_CLASSES),
+        tenant_weights=config.get("TENANT_WEIGHTS"),
+        default_priority=config.get("DEFAULT_PRIORITY"),
+    )
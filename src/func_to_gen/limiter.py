@@ -0,0 +1,142 @@
+"""Adaptive limit on the number of answers generated at once."""
+
+import math
+import threading
+import time
+from typing import Optional
+
+from func_to_gen.executor import QueueFullError
+
+
+class ConcurrencyLimitError(QueueFullError):
+    """Raised when a request is shed because the adaptive limit is reached."""
+
+
+class _Average:
+    """Exponential moving average over roughly ``window`` samples."""
+
+    def __init__(self, window: int):
+        self.alpha = 2.0 / (window + 1)
+        self.value = None
+
+    def add(self, sample: float) -> float:
+        if self.value is None:
+            self.value = sample
+        else:
+            self.value += self.alpha * (sample - self.value)
+        return self.value
+
+
+class AdaptiveLimiter:
+    """Limit answers in flight, adjusting the limit from observed latency.
+
+    Follows the gradient approach of Netflix's concurrency-limits: a
+    long-term latency average stands in for the unloaded latency and a
+    short-term average for the current one. While current latency stays
+    within ``tolerance`` times the long-term average, the limit grows by
+    about its square root per sample; as requests queue up inside the
+    backend and latency rises, the limit shrinks in proportion (by at most
+    half per sample). Timed-out answers shrink it by 10%. Requests beyond
+    the limit are rejected at once with :class:`ConcurrencyLimitError`
+    rather than queued.
+
+    Args:
+        initial_limit: Limit before any latency has been observed.
+        min_limit: The limit never drops below this.
+        max_limit: The limit never grows beyond this.
+        tolerance: Latency increase over the long-term average tolerated
+            before the limit is reduced.
+        smoothing: Fraction of each new estimate applied to the limit.
+        retry_after: Seconds suggested to rejected clients.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        retry_after: int = 1,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rejected = 0
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._short_latency = _Average(10)
+        self._long_latency = _Average(600)
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current number of answers allowed in flight."""
+        return int(self._limit)
+
+    def acquire(self) -> float:
+        """Take a slot; returns the start time to pass to :meth:`release`."""
+        with self._lock:
+            if self.in_flight >= int(self._limit):
+                self.rejected += 1
+                raise ConcurrencyLimitError(self.retry_after)
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, dropped: bool = False, sample: bool = True):
+        """Return a slot, updating the limit from the answer's latency.
+
+        ``dropped`` marks an answer abandoned for taking too long; with
+        ``sample`` False (e.g. the answer failed) latency is not recorded.
+        """
+        latency = time.monotonic() - started
+        with self._lock:
+            in_flight = self.in_flight
+            self.in_flight -= 1
+            if dropped:
+                self._limit = max(self._limit * 0.9, self.min_limit)
+            elif sample:
+                self._update(latency, in_flight)
+
+    def stats(self) -> dict:
+        """Return the current limit, answers in flight and rejection count."""
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def _update(self, latency: float, in_flight: int):
+        short = self._short_latency.add(latency)
+        long = self._long_latency.add(latency)
+        if long > 2 * short:
+            # Load dropped off for good; let the baseline follow it down
+            long = self._long_latency.value = long * 0.95
+        if in_flight < self._limit / 2:
+            # Too few answers in flight to tell whether the limit is too low
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * long / short)) if short > 0 else 1.0
+        estimate = self._limit * gradient + math.sqrt(self._limit)
+        limit = self._limit * (1 - self.smoothing) + estimate * self.smoothing
+        self._limit = min(max(limit, self.min_limit), self.max_limit)
+
+
+def create_limiter(config) -> Optional[AdaptiveLimiter]:
+    """Build an adaptive limiter from app config, or None when it is off.
+
+    Recognised keys: ``ADAPTIVE_CONCURRENCY`` (enables the limiter),
+    ``ADAPTIVE_CONCURRENCY_INITIAL``, ``ADAPTIVE_CONCURRENCY_MIN``,
+    ``ADAPTIVE_CONCURRENCY_MAX``, ``ADAPTIVE_CONCURRENCY_TOLERANCE`` and
+    ``RETRY_AFTER`` (seconds).
+    """
+    if not config.get("ADAPTIVE_CONCURRENCY"):
+        return None
+    return AdaptiveLimiter(
+        initial_limit=config.get("ADAPTIVE_CONCURRENCY_INITIAL", 20),
+        min_limit=config.get("ADAPTIVE_CONCURRENCY_MIN", 1),
+        max_limit=config.get("ADAPTIVE_CONCURRENCY_MAX", 200),
+        tolerance=config.get("ADAPTIVE_CONCURRENCY_TOLERANCE", 1.5),
+        retry_after=config.get("RETRY_AFTER", 1),
+    )
@@ -0,0 +1,174 @@
+"""Prometheus-style request metrics."""
+
+import collections
+import itertools
+import math
+import threading
+import weakref
+from bisect import bisect_left
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Shard:
+    """Per-thread metric storage, written without locks by its owning thread."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+def _merge(counters: dict, histograms: dict, shard_counters: dict, shard_histograms: dict):
+    """Add one shard's counters and histograms into running totals."""
+    for key, value in shard_counters.copy().items():
+        counters[key] = counters.get(key, 0) + value
+    for key, values in shard_histograms.copy().items():
+        merged = histograms.setdefault(key, [0] * len(values))
+        for index, value in enumerate(values):
+            merged[index] += value
+
+
+class Metrics:
+    """Request counters, an in-flight gauge and per-phase latency histograms.
+
+    Generation requests are split into ``parse``, ``render``
+    (``messages_to_prompt``), ``answer`` and ``serialize`` phases.
+
+    Each thread records into its own shard so the hot path takes no lock;
+    shards are only summed when the metrics are rendered. When a thread
+    exits, its shard is folded into a base total, so a thread-per-request
+    server does not accumulate shards.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        # Shard number -> (counters, histograms) of shards of live threads
+        self._shards = {}
+        self._shard_ids = itertools.count()
+        self._base_counters = {}
+        self._base_histograms = {}
+        # Shards of exited threads, folded into the base under the lock
+        self._retired = collections.deque()
+        self._lock = threading.Lock()
+        self._collectors = []
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            shard_id = next(self._shard_ids)
+            with self._lock:
+                self._fold_retired()
+                self._shards[shard_id] = (shard.counters, shard.histograms)
+            # The thread-local shard is dropped when its thread exits
+            weakref.finalize(shard, self._retire, shard_id)
+        return shard
+
+    def _retire(self, shard_id: int):
+        # May run in garbage collection at any point, so take no lock here
+        self._retired.append(shard_id)
+
+    def _fold_retired(self):
+        """Move shards of exited threads into the base totals; call with the lock held."""
+        while self._retired:
+            counters, histograms = self._shards.pop(self._retired.popleft())
+            _merge(self._base_counters, self._base_histograms, counters, histograms)
+
+    def _totals(self) -> tuple:
+        """Sum the base totals and the shards of live threads."""
+        counters = {}
+        histograms = {}
+        with self._lock:
+            self._fold_retired()
+            _merge(counters, histograms, self._base_counters, self._base_histograms)
+            for shard_counters, shard_histograms in self._shards.values():
+                _merge(counters, histograms, shard_counters, shard_histograms)
+        return counters, histograms
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1):
+        """Add to a counter (or gauge, with a negative value)."""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: tuple, seconds: float):
+        """Record one observation in a histogram."""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    def add_collector(self, collector):
+        """Register a callable returning extra ``(name, labels, value)`` gauge samples."""
+        self._collectors.append(collector)
+
+    def counter_value(self, name: str, labels: tuple = ()) -> float:
+        """Current total of a counter across all threads."""
+        key = (name, labels)
+        with self._lock:
+            self._fold_retired()
+            total = self._base_counters.get(key, 0)
+            return total + sum(counters.get(key, 0) for counters, _ in self._shards.values())
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        counters, histograms = self._totals()
+
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            for (sample_name, labels), value in sorted(counters.items()):
+                if sample_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (sample_name, labels), values in sorted(histograms.items()):
+                if sample_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), values):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        for collector in self._collectors:
+            samples = list(collector())
+            for name in sorted({name for name, _, _ in samples}):
+                lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+                for sample_name, labels, value in samples:
+                    if sample_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def create_metrics(config):
+    """Build the metrics recorder unless ``METRICS`` is disabled in app config."""
+    if not config.get("METRICS", True):
+        return None
+    return Metrics()
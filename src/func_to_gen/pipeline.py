@@ -0,0 +1,311 @@
+"""Request handling shared by the Flask app and the ASGI app.
+
+Both apps parse request bodies, consult the response caches, count usage
+and report failures through these helpers, so they answer alike.
+"""
+
+import os
+import time
+from functools import partial
+from typing import Optional
+
+from func_to_gen.cache import make_cache_key
+from func_to_gen.cancellation import ClientDisconnected
+from func_to_gen.contexts import InvalidContextError
+from func_to_gen.deadlines import InvalidTimeoutError, RequestTimeout
+from func_to_gen.embeddings import EmbeddingRequestError
+from func_to_gen.executor import QueueFullError
+from func_to_gen.registry import ModelNotFoundError, parse_keep_alive
+from func_to_gen.upstream import UpstreamError
+from func_to_gen.utils import (
+    SSE_DONE,
+    format_chat_completion_chunk,
+    format_completion_chunk,
+    format_ndjson,
+    format_sse,
+    format_usage,
+    format_usage_chunk,
+    generate_id,
+    get_timestamp,
+    messages_to_prompt,
+)
+
+# Model name can be configured via environment variable
+MODEL_NAME = os.environ.get("MODEL_NAME", "local-llm")
+
+EMBEDDINGS_NOT_SUPPORTED = "Embeddings are not supported. This API only wraps a text generation function."
+
+
+class RequestError(ValueError):
+    """Raised for a malformed request body (reported as HTTP 400)."""
+
+
+# HTTP status and OpenAI error type of each failure a request can end with
+ERROR_STATUSES = (
+    (RequestError, 400, "invalid_request_error"),
+    (EmbeddingRequestError, 400, "invalid_request_error"),
+    (InvalidTimeoutError, 400, "invalid_request_error"),
+    (InvalidContextError, 400, "invalid_request_error"),
+    (ModelNotFoundError, 404, "invalid_request_error"),
+    (ClientDisconnected, 499, "client_closed_request"),
+    (UpstreamError, 502, "upstream_error"),
+    (QueueFullError, 503, "server_overloaded_error"),
+    (RequestTimeout, 504, "timeout_error"),
+)
+
+REQUEST_ERRORS = tuple(error for error, _, _ in ERROR_STATUSES)
+
+
+# -----------------------------------------------------------------------------
+# Parsing requests
+# -----------------------------------------------------------------------------
+
+def require_body(data: Optional[dict]) -> dict:
+    """Return the decoded JSON body, or raise RequestError if there is none."""
+    if not data:
+        raise RequestError("Request body is required")
+    return data
+
+
+def chat_prompt(data: Optional[dict]) -> str:
+    """Render the prompt of an OpenAI chat completion request."""
+    messages = require_body(data).get("messages", [])
+    if not messages:
+        raise RequestError("messages is required")
+    return messages_to_prompt(messages)
+
+
+def completion_prompt(data: Optional[dict]) -> str:
+    """Return the prompt of an OpenAI completion request."""
+    prompt = require_body(data).get("prompt", "")
+    if not prompt:
+        raise RequestError("prompt is required")
+    return prompt
+
+
+def ollama_prompt(data: Optional[dict], field: str = "prompt") -> tuple:
+    """Return ``(prompt, keep_alive)`` of an Ollama generate request.
+
+    With ``field="messages"``, renders the prompt of a chat request. The
+    prompt is empty for a bare ``keep_alive`` request, which loads or
+    unloads the model without generating.
+    """
+    data = require_body(data)
+    try:
+        keep_alive = parse_keep_alive(data.get("keep_alive"))
+    except ValueError as exc:
+        raise RequestError(str(exc)) from None
+    value = data.get(field)
+    if not value:
+        if "keep_alive" in data:
+            return "", keep_alive
+        raise RequestError(f"{field} is required")
+    prompt = messages_to_prompt(value) if field == "messages" else value
+    return prompt, keep_alive
+
+
+def include_usage(data: dict) -> bool:
+    """Whether a streaming OpenAI request asked for a final usage chunk."""
+    stream_options = data.get("stream_options") or {}
+    return bool(stream_options.get("include_usage"))
+
+
+def wants_ollama_stream(data: dict, result) -> bool:
+    """Decide whether an Ollama request should be answered as NDJSON.
+
+    Ollama streams by default, so chunked answers are streamed unless the
+    client sends ``"stream": false``. Plain string answers keep returning a
+    single object unless streaming is requested explicitly.
+    """
+    stream = data.get("stream")
+    if stream is None:
+        return not isinstance(result, str)
+    return bool(stream)
+
+
+# -----------------------------------------------------------------------------
+# Caching answers
+# -----------------------------------------------------------------------------
+
+def lookup_cached(cache, semantic_cache, embed, model: str, prompt: str, data: dict) -> tuple:
+    """Look a request up in the response cache, then the semantic cache.
+
+    ``embed(prompt)`` returns the prompt's vector for the semantic cache.
+    Returns ``(answer, status, store)``: the cached answer or None, the
+    ``X-Cache`` status (``"HIT"``, ``"SEMANTIC"`` or ``"MISS"``) and, on a
+    miss, a function saving the fresh answer to the caches.
+    """
+    key = make_cache_key(model, prompt, data)
+    store = None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, "HIT", None
+        store = partial(cache.set, key)
+    if semantic_cache is not None:
+        namespace = make_cache_key(model, "", data)
+        vector = embed(prompt)
+        cached = semantic_cache.get(namespace, vector)
+        if cached is not None:
+            return cached, "SEMANTIC", None
+        store = partial(_store_answer, store, partial(semantic_cache.set, namespace, vector))
+    return None, "MISS", store
+
+
+def _store_answer(store, semantic_store, answer: str):
+    """Save an answer to the exact cache (if any) and the semantic cache."""
+    if store is not None:
+        store(answer)
+    semantic_store(answer)
+
+
+# -----------------------------------------------------------------------------
+# Formatting responses
+# -----------------------------------------------------------------------------
+
+def count_usage(tokenizer, prompt: str, content: str) -> dict:
+    """Count prompt and completion tokens, preferring counts reported by the answer function."""
+    prompt_tokens = getattr(content, "prompt_tokens", None)
+    if prompt_tokens is None:
+        prompt_tokens = tokenizer(prompt)
+    completion_tokens = getattr(content, "completion_tokens", None)
+    if completion_tokens is None:
+        completion_tokens = tokenizer(content)
+    return format_usage(prompt_tokens, completion_tokens)
+
+
+def join_chunks(chunks: list) -> str:
+    """Join streamed chunks, keeping a lone chunk as-is so reported counts survive."""
+    if len(chunks) == 1:
+        return chunks[0]
+    return "".join(chunks)
+
+
+def ollama_timing(
+    tokenizer, prompt: str, content: str, started_ns: int, first_chunk_ns: int, finished_ns: int,
+) -> dict:
+    """Build Ollama duration and count fields for a finished answer."""
+    usage = count_usage(tokenizer, prompt, content)
+    return {
+        "total_duration": time.perf_counter_ns() - started_ns,
+        "prompt_eval_count": usage["prompt_tokens"],
+        "prompt_eval_duration": first_chunk_ns - started_ns,
+        "eval_count": usage["completion_tokens"],
+        "eval_duration": finished_ns - first_chunk_ns,
+    }
+
+
+def openai_error(message: str, error_type: str = "invalid_request_error") -> dict:
+    return {"error": {"message": message, "type": error_type}}
+
+
+def ollama_error(message: str) -> dict:
+    return {"error": message}
+
+
+def sse_error(message: str) -> str:
+    """The SSE event ending a stream that timed out."""
+    return format_sse(openai_error(message, "timeout_error"))
+
+
+def ndjson_error(message: str) -> str:
+    """The NDJSON line ending a stream that timed out."""
+    return format_ndjson(ollama_error(message))
+
+
+def describe_error(exc: Exception, ollama: bool = False) -> tuple:
+    """Return ``(status, body, headers)`` answering a request that failed with one of :data:`REQUEST_ERRORS`."""
+    status, error_type = next(
+        (status, error_type) for error, status, error_type in ERROR_STATUSES if isinstance(exc, error)
+    )
+    body = ollama_error(str(exc)) if ollama else openai_error(str(exc), error_type)
+    headers = {"Retry-After": str(exc.retry_after)} if isinstance(exc, QueueFullError) else {}
+    return status, body, headers
+
+
+class ChatCompletionEvents:
+    """SSE events of a streamed chat completion, built one chunk at a time."""
+
+    def __init__(self, model: str, prompt: str, tokenizer, include_usage: bool = False):
+        self.model = model
+        self.prompt = prompt
+        self.tokenizer = tokenizer
+        self.include_usage = include_usage
+        self.id = generate_id("chatcmpl")
+        self.created = get_timestamp()
+        self.chunks = []
+
+    def start(self) -> list:
+        return [format_sse(format_chat_completion_chunk("", self.id, self.created, model=self.model, role="assistant"))]
+
+    def chunk(self, chunk: str) -> str:
+        self.chunks.append(chunk)
+        return format_sse(format_chat_completion_chunk(chunk, self.id, self.created, model=self.model))
+
+    def finish(self) -> list:
+        events = [format_sse(format_chat_completion_chunk(
+            None, self.id, self.created, model=self.model, finish_reason="stop",
+        ))]
+        if self.include_usage:
+            usage = count_usage(self.tokenizer, self.prompt, join_chunks(self.chunks))
+            events.append(format_sse(format_usage_chunk(usage, self.id, self.created, model=self.model)))
+        events.append(SSE_DONE)
+        return events
+
+
+class CompletionEvents(ChatCompletionEvents):
+    """SSE events of a streamed text completion, built one chunk at a time."""
+
+    def __init__(self, model: str, prompt: str, tokenizer, include_usage: bool = False):
+        super().__init__(model, prompt, tokenizer, include_usage)
+        self.id = generate_id("cmpl")
+
+    def start(self) -> list:
+        return []
+
+    def chunk(self, chunk: str) -> str:
+        self.chunks.append(chunk)
+        return format_sse(format_completion_chunk(chunk, self.id, self.created, model=self.model))
+
+    def finish(self) -> list:
+        events = [format_sse(format_completion_chunk(
+            "", self.id, self.created, model=self.model, finish_reason="stop",
+        ))]
+        if self.include_usage:
+            usage = count_usage(self.tokenizer, self.prompt, join_chunks(self.chunks))
+            events.append(format_sse(format_usage_chunk(
+                usage, self.id, self.created, model=self.model, object_type="text_completion",
+            )))
+        events.append(SSE_DONE)
+        return events
+
+
+class OllamaEvents:
+    """NDJSON lines of a streamed Ollama answer, ending with timing stats."""
+
+    def __init__(self, model: str, prompt: str, tokenizer, started_ns: int, make_chunk, make_final):
+        self.model = model
+        self.prompt = prompt
+        self.tokenizer = tokenizer
+        self.started_ns = started_ns
+        self.make_chunk = make_chunk
+        self.make_final = make_final
+        self.first_chunk_ns = None
+        self.chunks = []
+
+    def start(self) -> list:
+        return []
+
+    def chunk(self, chunk: str) -> str:
+        if self.first_chunk_ns is None:
+            self.first_chunk_ns = time.perf_counter_ns()
+        self.chunks.append(chunk)
+        return format_ndjson(self.make_chunk(chunk, model=self.model))
+
+    def finish(self) -> list:
+        finished_ns = time.perf_counter_ns()
+        first_chunk_ns = self.first_chunk_ns if self.first_chunk_ns is not None else finished_ns
+        stats = ollama_timing(
+            self.tokenizer, self.prompt, join_chunks(self.chunks), self.started_ns, first_chunk_ns, finished_ns,
+        )
+        return [format_ndjson(self.make_final("", model=self.model, stats=stats))]
@@ -0,0 +1,75 @@
+"""Readiness of the app to serve requests.
+
+The app starts listening right away; answer functions given as import
+paths are imported and the warmup hook is run on a background thread,
+and ``/ready`` answers 503 until both are done.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Load the startup models in the background, then run the warmup hook.
+
+    Args:
+        registry: The served models; entries given as import paths are
+            imported, other startup entries are already loaded.
+        warmup: Optional callable receiving each startup model's answer
+            function, e.g. to run a short prompt through it.
+    """
+
+    def __init__(self, registry, warmup=None):
+        self.registry = registry
+        self.warmup = warmup
+        self.error: Optional[BaseException] = None
+        self.duration: Optional[float] = None
+        self._started = time.monotonic()
+        self._done = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether startup finished successfully."""
+        return self._done.is_set() and self.error is None
+
+    def start(self):
+        """Begin loading; finishes at once when there is nothing to load or warm up."""
+        pending = [entry for entry in self.registry.startup_entries() if not entry.loaded]
+        if not pending and self.warmup is None:
+            self._finish()
+            return
+        self._thread = threading.Thread(target=self._run, name="func-to-gen-startup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until startup finished (or failed); returns whether it is ready."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> dict:
+        """Describe the startup state for the ``/ready`` endpoint."""
+        if not self._done.is_set():
+            return {"status": "loading", "elapsed": time.monotonic() - self._started}
+        if self.error is not None:
+            return {"status": "failed", "error": f"{type(self.error).__name__}: {self.error}"}
+        return {"status": "ready", "startup_seconds": self.duration}
+
+    def _run(self):
+        try:
+            for entry in self.registry.startup_entries():
+                func = entry.get()
+                if self.warmup is not None:
+                    self.warmup(func)
+        except Exception as exc:
+            logger.exception("Startup failed")
+            self.error = exc
+        self._finish()
+
+    def _finish(self):
+        self.duration = time.monotonic() - self._started
+        self._done.set()
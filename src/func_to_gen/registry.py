@@ -0,0 +1,338 @@
+"""Registry of served models and their answer functions."""
+
+import importlib
+import os
+import re
+import threading
+import time
+from functools import partial
+from typing import Optional, Union
+
+# Ollama's default keep_alive: unload a model after five idle minutes
+DEFAULT_KEEP_ALIVE = 300.0
+
+# How often idle models are checked for expiry, in seconds
+REAP_INTERVAL = 1.0
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+_DURATION_RE = re.compile(r"(-?\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+class ModelNotFoundError(Exception):
+    """Raised when a request names a model that is not served."""
+
+    def __init__(self, model: str):
+        super().__init__(f"Model {model} not found")
+        self.model = model
+
+
+def parse_keep_alive(value: Union[str, int, float, None]) -> Optional[float]:
+    """Parse an Ollama ``keep_alive`` value into seconds.
+
+    Accepts numbers (seconds) and Go-style durations such as ``"5m"`` or
+    ``"1h30m"``. Negative values keep the model loaded indefinitely and
+    are returned as ``-1``. Returns None when no value was given.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        try:
+            seconds = float(text)
+        except ValueError:
+            parts = _DURATION_RE.findall(text)
+            if not parts or "".join(number + unit for number, unit in parts) != text.lstrip("+"):
+                raise ValueError(f"Invalid keep_alive duration: {value}") from None
+            seconds = sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    return -1.0 if seconds < 0 else seconds
+
+
+def import_object(path: str, reload: bool = False):
+    """Import ``"package.module:attribute"`` (or ``"package.module.attribute"``).
+
+    With ``reload``, an already imported module is re-executed first.
+    """
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        module_name, _, attribute = path.rpartition(".")
+    if not module_name or not attribute:
+        raise ValueError(f"Expected an import path like 'module:attribute', got {path!r}")
+    module = importlib.import_module(module_name)
+    if reload:
+        module = importlib.reload(module)
+    target = module
+    for name in attribute.split("."):
+        target = getattr(target, name)
+    return target
+
+
+def _rss_bytes() -> int:
+    """Resident set size of this process, or 0 where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class LazyModel:
+    """Mark a zero-argument factory that builds an answer function on first use.
+
+    Args:
+        factory: Loads the model and returns its answer function.
+        unload: Optional callable receiving the answer function when the
+                model is unloaded, to release its resources.
+        keep_alive: Idle seconds before unloading (negative: never).
+                    Defaults to the app's ``KEEP_ALIVE`` setting.
+        size: Approximate memory in bytes reported by ``/api/ps``. When
+              omitted, the growth in resident memory during loading is used.
+
+    Example:
+        create_app(models={"small": answer, "big": LazyModel(load_big_model)})
+    """
+
+    def __init__(self, factory, unload=None, keep_alive: Optional[float] = None, size: Optional[int] = None):
+        self.factory = factory
+        self.unload = unload
+        self.keep_alive = keep_alive
+        self.size = size
+
+
+class ModelEntry:
+    """A served model and its (possibly not yet loaded) answer function.
+
+    Models given as plain functions stay loaded for the life of the app.
+    Lazy models are loaded on first use and unloaded once they have been
+    idle past their keep-alive. Pinned lazy models (answer functions given
+    as import paths) are loaded once and never unloaded.
+    """
+
+    def __init__(self, name: str, func=None, lazy_model: Optional[LazyModel] = None, pinned: bool = False):
+        self.name = name
+        self.lazy_model = lazy_model
+        self.pinned = pinned
+        self.size = lazy_model.size if lazy_model is not None and lazy_model.size is not None else 0
+        self.expires_at = None
+        self.last_used = 0.0
+        self.load_duration_ns = 0
+        self._func = func
+        self._active = 0
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    @property
+    def unloadable(self) -> bool:
+        return self.lazy_model is not None and not self.pinned
+
+    @property
+    def active(self) -> int:
+        """Number of requests currently using the model."""
+        return self._active
+
+    def get(self):
+        """Return the answer function, building it first if needed."""
+        func = self._func
+        if func is not None:
+            return func
+        with self._lock:
+            if self._func is None:
+                self._load()
+            return self._func
+
+    def acquire(self):
+        """Mark the model in use and return its answer function."""
+        with self._lock:
+            if self._func is None:
+                self._load()
+            self._active += 1
+            self.expires_at = None
+            return self._func
+
+    def release(self, keep_alive: Optional[float]):
+        """Mark one use finished and schedule the model's expiry."""
+        with self._lock:
+            self._active -= 1
+            self.last_used = time.monotonic()
+            if not self.unloadable or self._active:
+                return
+            if keep_alive < 0:
+                self.expires_at = None
+            else:
+                self.expires_at = self.last_used + keep_alive
+            if keep_alive == 0:
+                self.unload()
+
+    def keep_alive(self, default: float) -> float:
+        """Keep-alive of the model when a request does not specify one."""
+        if self.lazy_model is not None and self.lazy_model.keep_alive is not None:
+            return self.lazy_model.keep_alive
+        return default
+
+    def unload(self) -> bool:
+        """Unload the model if it is lazy, loaded and idle."""
+        with self._lock:
+            if not self.unloadable or self._func is None or self._active:
+                return False
+            func, self._func = self._func, None
+            self.expires_at = None
+        if self.lazy_model.unload is not None:
+            self.lazy_model.unload(func)
+        return True
+
+    def _load(self):
+        rss_before = _rss_bytes()
+        started_ns = time.perf_counter_ns()
+        self._func = self.lazy_model.factory()
+        self.load_duration_ns = time.perf_counter_ns() - started_ns
+        if self.lazy_model.size is None:
+            self.size = max(_rss_bytes() - rss_before, 0)
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """Map model names to answer functions.
+
+    A registry built from a single answer function is lenient: any
+    requested model name is answered by that function and echoed back. A
+    registry built from a mapping only serves the models it contains.
+
+    Lazy models are unloaded after ``keep_alive`` idle seconds, and when
+    ``max_loaded`` is set the least recently used idle lazy model is
+    unloaded to make room for another.
+    """
+
+    def __init__(
+        self,
+        default_model: Optional[str] = None,
+        strict: bool = True,
+        keep_alive: float = DEFAULT_KEEP_ALIVE,
+        max_loaded: Optional[int] = None,
+    ):
+        self.default_model = default_model
+        self.strict = strict
+        self.keep_alive = keep_alive
+        self.max_loaded = max_loaded
+        self._entries = {}
+        self._reaper = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_mapping(cls, models: dict, **kwargs) -> "ModelRegistry":
+        """Build a strict registry from ``{name: answer_func or LazyModel(factory)}``."""
+        registry = cls(**kwargs)
+        for name, func in models.items():
+            registry.register(name, func)
+        return registry
+
+    def register(self, name: str, func):
+        """Serve ``func`` (a :class:`LazyModel` factory, or an import path) under ``name``.
+
+        An import path such as ``"llm:answer"`` is only imported on first
+        use (or by :class:`func_to_gen.readiness.Readiness` at startup).
+        """
+        if isinstance(func, LazyModel):
+            self._entries[name] = ModelEntry(name, lazy_model=func)
+        elif isinstance(func, str):
+            self._entries[name] = ModelEntry(name, lazy_model=LazyModel(partial(import_object, func)), pinned=True)
+        else:
+            self._entries[name] = ModelEntry(name, func=func)
+        if self.default_model is None:
+            self.default_model = name
+
+    def names(self) -> list[str]:
+        """Names of all served models, in registration order."""
+        return list(self._entries)
+
+    def has(self, name: str) -> bool:
+        return name in self._entries
+
+    def entry(self, name: Optional[str]) -> ModelEntry:
+        """Look up the entry serving ``name`` (the default model if None)."""
+        if name is None:
+            name = self.default_model
+        entry = self._entries.get(name)
+        if entry is None and not self.strict:
+            entry = self._entries.get(self.default_model)
+        if entry is None:
+            raise ModelNotFoundError(name)
+        return entry
+
+    def get(self, name: Optional[str] = None):
+        """Return the answer function serving ``name``."""
+        return self.entry(name).get()
+
+    def acquire(self, name: Optional[str]):
+        """Load ``name`` if needed and mark it in use; pair with :meth:`release`."""
+        entry = self.entry(name)
+        if entry.loaded or not entry.unloadable:
+            return entry.acquire()
+        # Make room first, so at most max_loaded models are ever in memory
+        self._evict_for(entry)
+        func = entry.acquire()
+        self._start_reaper()
+        return func
+
+    def release(self, name: Optional[str], keep_alive: Optional[float] = None):
+        """Mark a use of ``name`` finished; ``keep_alive`` overrides the default idle time."""
+        entry = self.entry(name)
+        if keep_alive is None:
+            keep_alive = entry.keep_alive(self.keep_alive)
+        entry.release(keep_alive)
+
+    def startup_entries(self) -> list[ModelEntry]:
+        """Entries served for the life of the app: functions and import paths, not lazy models."""
+        return [entry for entry in self._entries.values() if not entry.unloadable]
+
+    def loaded_entries(self) -> list[ModelEntry]:
+        """Entries whose answer function is currently loaded."""
+        return [entry for entry in self._entries.values() if entry.loaded]
+
+    def describe_loaded(self) -> list[dict]:
+        """Name, size and wall-clock expiry (or None) of every loaded model."""
+        wall_offset = time.time() - time.monotonic()
+        return [
+            {
+                "name": entry.name,
+                "size": entry.size,
+                "expires_at": entry.expires_at + wall_offset if entry.expires_at is not None else None,
+            }
+            for entry in self.loaded_entries()
+        ]
+
+    def unload_expired(self):
+        """Unload idle lazy models whose keep-alive has passed."""
+        now = time.monotonic()
+        for entry in self.loaded_entries():
+            if entry.expires_at is not None and entry.expires_at <= now:
+                entry.unload()
+
+    def _evict_for(self, incoming: ModelEntry):
+        """Unload least recently used idle lazy models so ``incoming`` fits under ``max_loaded``.
+
+        Only lazy models count towards the limit; plain and pinned models
+        can never be unloaded.
+        """
+        if not self.max_loaded:
+            return
+        loaded = [e for e in self.loaded_entries() if e is not incoming and e.unloadable]
+        candidates = sorted((e for e in loaded if not e.active), key=lambda e: e.last_used)
+        excess = len(loaded) + 1 - self.max_loaded
+        for entry in candidates[:max(excess, 0)]:
+            entry.unload()
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="func-to-gen-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(REAP_INTERVAL)
+            self.unload_expired()
@@ -0,0 +1,331 @@
+"""Load balancing and hedging across replicas of one model."""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional, Union
+
+from func_to_gen.cancellation import CancelToken, answer_kwargs
+from func_to_gen.deadlines import RequestTimeout
+
+_END = object()
+
+
+class Replica:
+    """One backend of a :class:`ReplicaPool` and its health."""
+
+    def __init__(self, name: str, func):
+        self.name = name
+        self.func = func
+        self.outstanding = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.last_picked = 0
+
+    def healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class _Race:
+    """Hedged legs of one request; the first to produce output wins."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.winner = None
+        self.errors = []
+        self.running = 0
+        self.tokens = []
+        # Set when the request gave up at its deadline; late legs only clean up
+        self.abandoned = False
+
+
+class ReplicaPool:
+    """Answer function spreading requests over replicas of the same model.
+
+    Each request goes to the healthy replica with the fewest outstanding
+    requests. A replica failing ``max_failures`` times in a row is ejected
+    for ``eject_seconds``; afterwards a single failure ejects it again,
+    while a success restores it fully. When every replica is ejected, the
+    one due back first is used anyway.
+
+    With ``hedge``, a request that has produced no output (its answer, or
+    its first chunk when streaming) after the ``hedge_quantile`` latency
+    of recent requests is sent to a second replica too. Whichever produces
+    output first is used, and the other is cancelled through its
+    ``cancel`` token (see :class:`func_to_gen.cancellation.CancelToken`)
+    and, if it streams, closed. A request whose first replica fails
+    before then goes to the second one at once. Both replicas run on
+    threads of their own, so the request returns as soon as either has
+    output, even if the other ignores its ``cancel`` token. A hedged
+    request gives up at its deadline with :class:`RequestTimeout`.
+
+    Replicas receive the ``cancel``, ``deadline`` and ``context`` keyword
+    arguments they declare, like any answer function; those without a
+    ``context`` parameter get the conversation history before the prompt.
+
+    Args:
+        replicas: Answer functions, as a list or a ``{name: func}`` mapping.
+        hedge: Whether to hedge slow requests.
+        hedge_quantile: Latency quantile after which a request is hedged.
+        hedge_min_samples: Latencies observed before hedging starts.
+        max_failures: Consecutive failures that eject a replica.
+        eject_seconds: How long an ejected replica gets no requests.
+        latency_window: Recent latencies the hedging delay is taken from.
+    """
+
+    def __init__(
+        self,
+        replicas: Union[list, dict],
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        latency_window: int = 1000,
+    ):
+        if isinstance(replicas, dict):
+            self.replicas = [Replica(name, func) for name, func in replicas.items()]
+        else:
+            self.replicas = [Replica(str(index), func) for index, func in enumerate(replicas)]
+        if not self.replicas:
+            raise ValueError("A replica pool needs at least one replica")
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._hedge_delay = None
+        self._samples_since_delay = 0
+        self._picks = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, cancel: Optional[CancelToken] = None, deadline=None, context=None):
+        primary = self._pick()
+        delay = self.hedge_delay() if self.hedge and len(self.replicas) > 1 else None
+        if delay is None:
+            return self._call(primary, prompt, cancel, deadline, context)
+        return self._hedged(primary, delay, prompt, cancel, deadline, context)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds without output after which a request is hedged, or None until enough samples."""
+        with self._lock:
+            if not self._latencies or len(self._latencies) < self.hedge_min_samples:
+                return None
+            if self._hedge_delay is None or self._samples_since_delay >= 16:
+                ordered = sorted(self._latencies)
+                rank = math.ceil(self.hedge_quantile * len(ordered))
+                self._hedge_delay = ordered[min(max(rank, 1), len(ordered)) - 1]
+                self._samples_since_delay = 0
+            return self._hedge_delay
+
+    def stats(self) -> list:
+        """Outstanding requests and health of every replica."""
+        now = time.monotonic()
+        return [
+            {"name": replica.name, "outstanding": replica.outstanding, "healthy": replica.healthy(now)}
+            for replica in self.replicas
+        ]
+
+    # -------------------------------------------------------------------------
+    # Balancing and health
+    # -------------------------------------------------------------------------
+
+    def _pick(self, exclude: Optional[Replica] = None) -> Optional[Replica]:
+        """Take the healthy replica with the fewest outstanding requests."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r is not exclude]
+            if not candidates:
+                return None
+            healthy = [r for r in candidates if r.healthy(now)]
+            if healthy:
+                replica = min(healthy, key=lambda r: (r.outstanding, r.last_picked))
+            elif exclude is not None:
+                # Do not hedge onto a replica known to be failing
+                return None
+            else:
+                replica = min(candidates, key=lambda r: r.ejected_until)
+            self._picks += 1
+            replica.last_picked = self._picks
+            replica.outstanding += 1
+        return replica
+
+    def _observe(self, started: float):
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+            self._samples_since_delay += 1
+
+    def _finish(self, replica: Replica, failed: bool = False):
+        with self._lock:
+            replica.outstanding -= 1
+            if not failed:
+                replica.failures = 0
+                return
+            replica.failures += 1
+            if replica.failures >= self.max_failures:
+                replica.ejected_until = time.monotonic() + self.eject_seconds
+                replica.failures = self.max_failures - 1
+
+    # -------------------------------------------------------------------------
+    # Calling replicas
+    # -------------------------------------------------------------------------
+
+    def _call(self, replica: Replica, prompt: str, cancel, deadline, context):
+        started = time.monotonic()
+        try:
+            result = _invoke(replica.func, prompt, cancel, deadline, context)
+            if isinstance(result, str):
+                self._observe(started)
+                self._finish(replica)
+                return result
+            chunks = iter(result)
+        except Exception:
+            self._finish(replica, failed=True)
+            raise
+        return self._stream(replica, chunks, started=started)
+
+    def _stream(self, replica: Replica, chunks, first=_END, started: Optional[float] = None):
+        """Yield a replica's chunks, observing the first and finishing the replica at the end."""
+        failed = False
+        try:
+            if first is not _END:
+                yield first
+            for chunk in chunks:
+                if started is not None:
+                    self._observe(started)
+                    started = None
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _close(chunks)
+            self._finish(replica, failed)
+
+    def _hedged(self, primary: Replica, delay: float, prompt: str, cancel, deadline, context):
+        race = _Race()
+        self._start_leg(race, primary, prompt, cancel, deadline, context)
+        with race.condition:
+            _wait(race, deadline, delay)
+        # Hedge after the delay, or at once if the primary failed sooner
+        secondary = None
+        if race.winner is None and (deadline is None or not deadline.expired):
+            secondary = self._pick(exclude=primary)
+        if secondary is not None:
+            with self._lock:
+                self.hedged += 1
+            self._start_leg(race, secondary, prompt, cancel, deadline, context)
+        with race.condition:
+            if not _wait(race, deadline):
+                race.abandoned = True
+            winner = race.winner
+            tokens = list(race.tokens)
+        if winner is None and race.abandoned:
+            for token in tokens:
+                token.cancel()
+            raise RequestTimeout(deadline.timeout)
+        if winner is None:
+            raise race.errors[0]
+        replica, _, payload = winner
+        if replica is not primary:
+            with self._lock:
+                self.hedge_wins += 1
+        if isinstance(payload, str):
+            return payload
+        first, chunks = payload
+        return self._stream(replica, chunks, first)
+
+    def _start_leg(self, race: _Race, replica: Replica, prompt: str, cancel, deadline, context):
+        token = CancelToken()
+        if cancel is not None:
+            cancel.add_callback(token.cancel)
+        with race.condition:
+            if race.winner is not None:
+                # Answered meanwhile: the leg only cleans up
+                token.cancel()
+            race.running += 1
+            race.tokens.append(token)
+        thread = threading.Thread(
+            target=self._run_leg,
+            args=(race, replica, token, prompt, deadline, context),
+            name="func-to-gen-hedge",
+            daemon=True,
+        )
+        thread.start()
+
+    def _run_leg(self, race: _Race, replica: Replica, token: CancelToken, prompt: str, deadline, context):
+        """Run one hedged leg up to its first output and enter it in the race."""
+        started = time.monotonic()
+        payload = error = None
+        try:
+            result = _invoke(replica.func, prompt, token, deadline, context)
+            if isinstance(result, str):
+                payload = result
+            else:
+                chunks = iter(result)
+                payload = (next(chunks, _END), chunks)
+        except Exception as exc:
+            error = exc
+        if error is None:
+            self._observe(started)
+        if error is not None or isinstance(payload, str):
+            self._finish(replica, failed=error is not None and not token.cancelled)
+
+        with race.condition:
+            won = error is None and race.winner is None and not race.abandoned
+            if won:
+                race.winner = (replica, token, payload)
+            elif error is not None:
+                race.errors.append(error)
+            race.running -= 1
+            race.condition.notify_all()
+            others = [other for other in race.tokens if other is not token] if won else []
+        for other in others:
+            other.cancel()
+        if not won and error is None and not isinstance(payload, str):
+            # Lost the race while streaming: stop generating and free the replica
+            _close(payload[1])
+            self._finish(replica)
+
+
+def _wait(race: _Race, deadline, timeout: Optional[float] = None) -> bool:
+    """Wait, with the race's condition held, for a winner or every leg to finish, at most until ``deadline``."""
+    if deadline is not None:
+        timeout = deadline.remaining() if timeout is None else min(timeout, deadline.remaining())
+    return race.condition.wait_for(lambda: race.winner or not race.running, timeout=timeout)
+
+
+def _invoke(func, prompt: str, cancel, deadline, context):
+    """Call a replica with the keyword arguments it declares."""
+    kwargs = answer_kwargs(func, cancel=cancel, deadline=deadline, context=context)
+    if context is not None and "context" not in kwargs:
+        prompt = context.full_prompt(prompt)
+    return func(prompt, **kwargs)
+
+
+def _close(chunks):
+    close = getattr(chunks, "close", None)
+    if close is not None:
+        close()
+
+
+def pool_replicas(func, config):
+    """Wrap a list or ``{name: func}`` mapping of replicas in a :class:`ReplicaPool`.
+
+    Other answer functions are returned unchanged. Recognised config keys:
+    ``REPLICA_HEDGE`` (enables hedging), ``REPLICA_HEDGE_QUANTILE``,
+    ``REPLICA_MAX_FAILURES`` and ``REPLICA_EJECT_SECONDS``.
+    """
+    if not isinstance(func, (list, tuple, dict)):
+        return func
+    return ReplicaPool(
+        func,
+        hedge=config.get("REPLICA_HEDGE", False),
+        hedge_quantile=config.get("REPLICA_HEDGE_QUANTILE", 0.95),
+        max_failures=config.get("REPLICA_MAX_FAILURES", 3),
+        eject_seconds=config.get("REPLICA_EJECT_SECONDS", 30.0),
+    )
@@ -1,17 +1,56 @@
 """API routes for OpenAI/Ollama compatible endpoints."""
 
-import os
-
-from flask import Blueprint, jsonify, request
-
+import time
+from functools import partial
+from typing import Optional
+
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+
+from func_to_gen.cache import is_cache_bypassed, make_cache_key, record_stream
+from func_to_gen.cancellation import CancelToken, ClientDisconnected, answer_kwargs, socket_probe
+from func_to_gen.contexts import GenerationContext
+from func_to_gen.deadlines import Deadline, RequestTimeout, request_deadline
+from func_to_gen.embeddings import answer_ollama_embed, answer_ollama_embeddings, answer_openai_embeddings
+from func_to_gen.executor import run_on_thread
+from func_to_gen.pipeline import (
+    EMBEDDINGS_NOT_SUPPORTED,
+    MODEL_NAME,
+    REQUEST_ERRORS,
+    ChatCompletionEvents,
+    CompletionEvents,
+    OllamaEvents,
+    chat_prompt,
+    completion_prompt,
+    count_usage,
+    describe_error,
+    include_usage,
+    lookup_cached,
+    ndjson_error,
+    ollama_error,
+    ollama_prompt,
+    ollama_timing,
+    openai_error,
+    require_body,
+    sse_error,
+    wants_ollama_stream,
+)
+from func_to_gen.registry import ModelRegistry
+from func_to_gen.replicas import ReplicaPool
+from func_to_gen.scheduler import PriorityPolicy
+from func_to_gen.tokens import approximate_token_count
 from func_to_gen.utils import (
+    collect_answer,
     format_chat_completion_response,
     format_completion_response,
     format_models_response,
+    format_ollama_chat_chunk,
     format_ollama_chat_response,
+    format_ollama_generate_chunk,
     format_ollama_generate_response,
+    format_ollama_ps_response,
+    format_ollama_show_response,
     format_ollama_tags_response,
-    messages_to_prompt,
+    iter_answer_chunks,
 )
 
 # OpenAI-compatible API blueprint
@@ -20,87 +59,670 @@ api = Blueprint("api", __name__, url_prefix="/v1")
 # Ollama native API blueprint
 ollama_api = Blueprint("ollama_api", __name__, url_prefix="/api")
 
-# Model name can be configured via environment variable
-MODEL_NAME = os.environ.get("MODEL_NAME", "local-llm")
+# The served models (func_to_gen.registry.ModelRegistry), set by the app factory
+_registry = None
+
+# Optional worker pool (func_to_gen.executor.AnswerExecutor), set by the app factory
+_executor = None
+
+# Optional response cache (func_to_gen.cache.ResponseCache), set by the app factory
+_cache = None
+
+# Optional in-flight request coalescing (func_to_gen.singleflight.SingleFlight)
+_single_flight = None
+
+# Optional request metrics (func_to_gen.metrics.Metrics), set by the app factory
+_metrics = None
+
+# Counts tokens for usage statistics: tokenizer(text: str) -> int
+_tokenizer = approximate_token_count
 
-# The answer function will be set by the app factory
-_answer_func = None
+# Optional embedding backend (func_to_gen.embeddings.EmbeddingService), set by the app factory
+_embedding_service = None
+
+# Server-wide answer timeout in seconds (None for no limit), set by the app factory
+_request_timeout = None
+
+# Optional similarity cache (func_to_gen.semantic_cache.SemanticCache), set by the app factory
+_semantic_cache = None
+
+# Optional adaptive concurrency limit (func_to_gen.limiter.AdaptiveLimiter), set by the app factory
+_limiter = None
+
+# Assigns requests a priority class and tenant for the worker pool queue, set by the app factory
+_priority_policy = PriorityPolicy()
+
+# Startup progress (func_to_gen.readiness.Readiness) reported by /ready, set by the app factory
+_readiness = None
+
+# Optional store behind Ollama context handles (func_to_gen.contexts.ContextStore), set by the app factory
+_context_store = None
 
 
 def set_answer_function(func):
-    """Set the answer function to use for generating responses."""
-    global _answer_func
-    _answer_func = func
+    """Set the answer function to use for generating responses.
+
+    The function answers every request, whatever model it names.
+    """
+    registry = ModelRegistry(default_model=MODEL_NAME, strict=False)
+    registry.register(MODEL_NAME, func)
+    set_registry(registry)
 
 
 def get_answer_function():
-    """Get the configured answer function."""
-    if _answer_func is None:
+    """Get the answer function of the default model."""
+    return get_registry().get()
+
+
+def set_registry(registry):
+    """Set the registry of served models."""
+    global _registry
+    _registry = registry
+
+
+def get_registry():
+    """Get the registry of served models."""
+    if _registry is None:
         raise RuntimeError("Answer function not configured. Call set_answer_function first.")
-    return _answer_func
+    return _registry
+
+
+def _resolve_model(data: dict) -> str:
+    """Return the model a request targets, raising ModelNotFoundError if it is not served."""
+    registry = get_registry()
+    model = data.get("model") or registry.default_model
+    registry.entry(model)
+    return model
+
+
+def set_executor(executor):
+    """Set the worker pool used to run the answer function (None to run inline)."""
+    global _executor
+    _executor = executor
+
+
+def get_executor():
+    """Get the configured worker pool, if any."""
+    return _executor
+
+
+def set_cache(cache):
+    """Set the response cache consulted by the generation routes (None to disable)."""
+    global _cache
+    _cache = cache
+
+
+def get_cache():
+    """Get the configured response cache, if any."""
+    return _cache
+
+
+def set_single_flight(single_flight):
+    """Set the coalescer shared by identical in-flight requests (None to disable)."""
+    global _single_flight
+    _single_flight = single_flight
+
+
+def get_single_flight():
+    """Get the configured in-flight request coalescer, if any."""
+    return _single_flight
+
+
+def set_tokenizer(tokenizer):
+    """Set the token counter used for usage statistics (None for the built-in approximation)."""
+    global _tokenizer
+    _tokenizer = tokenizer if tokenizer is not None else approximate_token_count
+
+
+def get_tokenizer():
+    """Get the token counter used for usage statistics."""
+    return _tokenizer
+
+
+def set_embedding_service(service):
+    """Set the embedding backend for the embeddings routes (None to answer 501)."""
+    global _embedding_service
+    _embedding_service = service
+
+
+def get_embedding_service():
+    """Get the configured embedding backend, if any."""
+    return _embedding_service
+
+
+def set_request_timeout(timeout: Optional[float]):
+    """Set the default seconds a request may take to be answered (None for no limit)."""
+    global _request_timeout
+    _request_timeout = timeout
+
+
+def get_request_timeout() -> Optional[float]:
+    """Get the default request timeout."""
+    return _request_timeout
+
+
+def set_semantic_cache(semantic_cache):
+    """Set the similarity cache consulted after exact cache misses (None to disable).
+
+    Prompts are embedded with the embedding backend, which must be set.
+    """
+    global _semantic_cache
+    _semantic_cache = semantic_cache
+
+
+def get_semantic_cache():
+    """Get the configured similarity cache, if any."""
+    return _semantic_cache
+
+
+def set_limiter(limiter):
+    """Set the adaptive limit on answers in flight (None to disable)."""
+    global _limiter
+    _limiter = limiter
+
+
+def get_limiter():
+    """Get the configured adaptive limiter, if any."""
+    return _limiter
+
+
+def set_readiness(readiness):
+    """Set the startup tracker reported by ``/ready`` (None to report ready at once)."""
+    global _readiness
+    _readiness = readiness
+
+
+def get_readiness():
+    """Get the startup tracker, if any."""
+    return _readiness
+
+
+def set_context_store(store):
+    """Set the store behind Ollama ``context`` handles (None to always answer ``"context": []``)."""
+    global _context_store
+    _context_store = store
+
+
+def get_context_store():
+    """Get the configured context store, if any."""
+    return _context_store
+
+
+def set_priority_policy(policy):
+    """Set how requests are assigned priority classes and tenants (None for the defaults)."""
+    global _priority_policy
+    _priority_policy = policy if policy is not None else PriorityPolicy()
+
+
+def get_priority_policy():
+    """Get the request priority policy."""
+    return _priority_policy
+
+
+def set_metrics(metrics):
+    """Set the recorder for request metrics (None to disable)."""
+    global _metrics
+    _metrics = metrics
+
+
+def get_metrics():
+    """Get the configured request metrics recorder, if any."""
+    return _metrics
+
+
+def _mark(phase: str):
+    """Record the time since the previous mark as the given request phase."""
+    metrics = _metrics
+    if metrics is None or "metrics_mark" not in g:
+        return
+    now = time.perf_counter()
+    labels = (("route", request.endpoint), ("phase", phase))
+    metrics.observe("func_to_gen_phase_seconds", labels, now - g.metrics_mark)
+    g.metrics_mark = now
+
+
+def _start_request_metrics():
+    metrics = _metrics
+    if metrics is None:
+        return
+    g.metrics_start = g.metrics_mark = time.perf_counter()
+    metrics.inc("func_to_gen_in_flight_requests")
+
+
+def _record_response_metrics(response):
+    metrics = _metrics
+    if metrics is None or "metrics_start" not in g:
+        return response
+    if not response.is_streamed:
+        _mark("serialize")
+    labels = (("route", request.endpoint), ("status", str(response.status_code)))
+    metrics.inc("func_to_gen_requests_total", labels)
+    if response.status_code >= 400:
+        metrics.inc("func_to_gen_errors_total", labels)
+    return response
+
+
+def _finish_request_metrics(_exc=None):
+    metrics = _metrics
+    if metrics is None or "metrics_start" not in g:
+        return
+    elapsed = time.perf_counter() - g.pop("metrics_start")
+    metrics.observe("func_to_gen_request_seconds", (("route", request.endpoint),), elapsed)
+    metrics.inc("func_to_gen_in_flight_requests", value=-1)
+
+
+for _blueprint in (api, ollama_api):
+    _blueprint.before_request(_start_request_metrics)
+    _blueprint.after_request(_record_response_metrics)
+    _blueprint.teardown_request(_finish_request_metrics)
+
+
+def collect_component_metrics():
+    """Yield gauge samples describing the caches, worker pool and loaded models."""
+    if _cache is not None:
+        stats = _cache.stats()
+        yield ("func_to_gen_cache_hits_total", (), stats["hits"])
+        yield ("func_to_gen_cache_misses_total", (), stats["misses"])
+        yield ("func_to_gen_cache_entries", (), stats["entries"])
+        yield ("func_to_gen_cache_bytes", (), stats["bytes"])
+    if _semantic_cache is not None:
+        stats = _semantic_cache.stats()
+        yield ("func_to_gen_semantic_cache_hits_total", (), stats["hits"])
+        yield ("func_to_gen_semantic_cache_misses_total", (), stats["misses"])
+        yield ("func_to_gen_semantic_cache_entries", (), stats["entries"])
+        yield ("func_to_gen_semantic_cache_bytes", (), stats["bytes"])
+    if _executor is not None:
+        yield ("func_to_gen_executor_pending", (), _executor.pending)
+        yield ("func_to_gen_executor_workers", (), _executor.max_workers)
+        for priority, depth in _executor.queue_depths().items():
+            yield ("func_to_gen_executor_queued", (("class", priority),), depth)
+    if _limiter is not None:
+        stats = _limiter.stats()
+        yield ("func_to_gen_concurrency_limit", (), stats["limit"])
+        yield ("func_to_gen_concurrency_in_flight", (), stats["in_flight"])
+        yield ("func_to_gen_concurrency_rejected_total", (), stats["rejected"])
+    if _single_flight is not None:
+        yield ("func_to_gen_coalesced_requests_total", (), _single_flight.coalesced)
+    if _context_store is not None:
+        stats = _context_store.stats()
+        yield ("func_to_gen_contexts", (), stats["entries"])
+        yield ("func_to_gen_contexts_bytes", (), stats["bytes"])
+    if _embedding_service is not None and _embedding_service.store is not None:
+        stats = _embedding_service.store.stats()
+        yield ("func_to_gen_embedding_cache_hits_total", (), stats["hits"])
+        yield ("func_to_gen_embedding_cache_misses_total", (), stats["misses"])
+        yield ("func_to_gen_embedding_cache_entries", (), stats["entries"])
+        yield ("func_to_gen_embedding_cache_bytes", (), stats["bytes"])
+    if _registry is not None:
+        loaded = _registry.loaded_entries()
+        yield ("func_to_gen_loaded_models", (), len(loaded))
+        for entry in loaded:
+            pool = entry.get()
+            if not isinstance(pool, ReplicaPool):
+                continue
+            for replica in pool.stats():
+                labels = (("model", entry.name), ("replica", replica["name"]))
+                yield ("func_to_gen_replica_outstanding", labels, replica["outstanding"])
+                yield ("func_to_gen_replica_healthy", labels, int(replica["healthy"]))
+            yield ("func_to_gen_hedged_requests_total", (("model", entry.name),), pool.hedged)
+            yield ("func_to_gen_hedge_wins_total", (("model", entry.name),), pool.hedge_wins)
+
+
+def observe_queue_wait(priority: str, seconds: float):
+    """Record how long an answer of a priority class waited for a worker."""
+    metrics = _metrics
+    if metrics is not None:
+        metrics.observe("func_to_gen_queue_wait_seconds", (("class", priority),), seconds)
+
+
+def _cancel_token() -> CancelToken:
+    """The request's cancellation token, probing the client socket where the server exposes it."""
+    token = g.get("cancel_token")
+    if token is None:
+        sock = request.environ.get("werkzeug.socket") or request.environ.get("gunicorn.socket")
+        token = g.cancel_token = CancelToken(socket_probe(sock) if sock is not None else None)
+    return token
+
+
+def _run_answer(
+    model: str,
+    prompt: str,
+    keep_alive: Optional[float] = None,
+    cancel: Optional[CancelToken] = None,
+    deadline: Optional[Deadline] = None,
+    context: Optional[GenerationContext] = None,
+    classified: Optional[tuple] = None,
+):
+    """Run a model's answer function for a prompt, through the worker pool if configured.
+
+    The model is loaded if needed and kept marked in use until the answer,
+    including any streamed chunks, is complete. Answer functions declaring
+    a ``cancel`` parameter receive the request's :class:`CancelToken`, and
+    those declaring a ``deadline`` parameter its :class:`Deadline`. Those
+    declaring a ``context`` parameter receive a continued conversation's
+    :class:`GenerationContext`; others get its history before the prompt. On the
+    worker pool, the answer queues in the request's priority class; without
+    one, an answer with a deadline, or whose client connection can be
+    probed, runs on a thread of its own, so the request still times out
+    and notices a disconnect while the answer (or its stream) stalls. With
+    an adaptive limiter, the answer is rejected when the limit is reached,
+    before its model is loaded, and its latency adjusts the limit.
+    ``classified`` is the request's ``(priority, tenant)`` when this runs
+    outside the request's context.
+    """
+    if deadline is not None and deadline.expired:
+        raise RequestTimeout(deadline.timeout)
+    # Shed load before loading a model for an answer that would be rejected
+    limiter = _limiter
+    started = limiter.acquire() if limiter is not None else None
+    try:
+        answer_func = get_registry().acquire(model)
+    except BaseException:
+        if limiter is not None:
+            limiter.release(started, sample=False)
+        raise
+    release = partial(_release_answer, model, keep_alive, limiter, started)
+    try:
+        kwargs = answer_kwargs(answer_func, cancel=cancel, deadline=deadline, context=context)
+        if _executor is not None and _executor.kind == "process":
+            kwargs = {}
+        if context is not None and "context" not in kwargs:
+            prompt = context.full_prompt(prompt)
+        if kwargs:
+            answer_func = partial(answer_func, **kwargs)
+        if _executor is None and deadline is None and (cancel is None or not cancel.probing):
+            result = answer_func(prompt)
+        elif _executor is None:
+            result = run_on_thread(answer_func, prompt, cancel=cancel, deadline=deadline)
+        else:
+            priority, tenant = classified or _priority_policy.classify(request.path, request.headers)
+            result = _executor.run(
+                answer_func, prompt, cancel=cancel, deadline=deadline, priority=priority, tenant=tenant,
+            )
+    except BaseException as exc:
+        release(dropped=isinstance(exc, RequestTimeout), sample=False)
+        raise
+    if isinstance(result, str):
+        release()
+        return result
+    return _release_after(iter_answer_chunks(result), release, cancel, result, deadline)
+
+
+def _release_after(
+    chunks,
+    release,
+    cancel: Optional[CancelToken] = None,
+    source=None,
+    deadline: Optional[Deadline] = None,
+):
+    """Yield chunks, calling ``release(sample=...)`` once the stream ends or is closed.
+
+    With a ``cancel`` token, stops with :class:`ClientDisconnected` once the
+    client is gone, and with a ``deadline``, with :class:`RequestTimeout`
+    once it passes. A stream closed before its end cancels the token and
+    closes ``source`` so the answer function stops generating.
+    """
+    finished = False
+    try:
+        for chunk in chunks:
+            if cancel is not None and cancel.cancelled:
+                raise ClientDisconnected()
+            if deadline is not None and deadline.expired:
+                raise RequestTimeout(deadline.timeout)
+            yield chunk
+        finished = True
+    finally:
+        if not finished and cancel is not None:
+            cancel.cancel()
+        if not finished:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        release(sample=finished)
+
+
+def _release_answer(model: str, keep_alive, limiter, started, dropped: bool = False, sample: bool = True):
+    """Mark a model idle again and return the answer's slot to the adaptive limiter."""
+    get_registry().release(model, keep_alive)
+    if limiter is not None:
+        limiter.release(started, dropped=dropped, sample=sample)
+
+
+def _generate(
+    prompt: str,
+    model: str,
+    data: dict,
+    keep_alive: Optional[float] = None,
+    context: Optional[GenerationContext] = None,
+):
+    """Produce the answer for a request.
+
+    Consults the response cache first, then the semantic cache, then
+    shares the computation with identical in-flight requests when
+    coalescing is enabled.
+    """
+    deadline = request_deadline(data, request.headers, _request_timeout)
+    cache = _cache
+    semantic_cache = _semantic_cache
+    single_flight = _single_flight
+    if (cache is None and semantic_cache is None and single_flight is None) or is_cache_bypassed(
+        data, request.headers
+    ):
+        return _run_answer(model, prompt, keep_alive, _cancel_token(), deadline, context)
+
+    store = None
+    if cache is not None or semantic_cache is not None:
+        cached, g.cache_status, store = lookup_cached(cache, semantic_cache, _embed_prompt, model, prompt, data)
+        if cached is not None:
+            return cached
+
+    if single_flight is not None:
+        # A shared answer must not stop when the request that started it goes
+        # away, nor at its own deadline; only the server-wide timeout applies.
+        # Each caller still waits for it only until its own deadline.
+        shared_deadline = Deadline(_request_timeout) if _request_timeout else None
+        classified = _priority_policy.classify(request.path, request.headers)
+        result = single_flight.do(
+            make_cache_key(model, prompt, data),
+            partial(_run_answer, model, prompt, keep_alive, None, shared_deadline, context, classified),
+            deadline,
+        )
+        if deadline is not None and not isinstance(result, str):
+            result = run_on_thread(partial(_shared_chunks, result), prompt, _cancel_token(), deadline)
+    else:
+        result = _run_answer(model, prompt, keep_alive, _cancel_token(), deadline, context)
+
+    if store is None:
+        return result
+    if isinstance(result, str):
+        store(result)
+        return result
+    return record_stream(iter_answer_chunks(result), store)
+
+
+def _shared_chunks(chunks, prompt: str):
+    """Answer with a caller's iterator over a shared stream (for :func:`run_on_thread`)."""
+    return chunks
+
+
+def _embed_prompt(prompt: str):
+    """Embed a prompt for the semantic cache."""
+    vector = _embedding_service.embed([prompt])[0]
+    _mark("embed")
+    return vector
+
+
+def _add_cache_header(response):
+    """Report whether the response cache (HIT) or semantic cache (SEMANTIC) was hit."""
+    cache_status = g.get("cache_status")
+    if cache_status is not None:
+        response.headers["X-Cache"] = cache_status
+    return response
+
+
+api.after_request(_add_cache_header)
+ollama_api.after_request(_add_cache_header)
+
+
+def _openai_request_error(exc):
+    return _request_error(exc)
+
+
+def _ollama_request_error(exc):
+    return _request_error(exc, ollama=True)
+
+
+def _request_error(exc, ollama: bool = False):
+    """Answer a request that failed with one of the shared request errors."""
+    if isinstance(exc, ClientDisconnected):
+        _count_cancelled()
+    elif isinstance(exc, RequestTimeout):
+        _count_timed_out()
+    status, body, headers = describe_error(exc, ollama)
+    return jsonify(body), status, headers
+
+
+for _error in REQUEST_ERRORS:
+    api.register_error_handler(_error, _openai_request_error)
+    ollama_api.register_error_handler(_error, _ollama_request_error)
+
+
+def _mark_after(events, phase: str, format_error=None):
+    """Yield events, then record the time since the previous mark as ``phase``.
+
+    Ends the response quietly if the client disconnected mid-stream, and
+    with an error event made by ``format_error(message)`` on a timeout.
+    """
+    try:
+        yield from events
+    except ClientDisconnected:
+        _count_cancelled()
+        return
+    except RequestTimeout as exc:
+        _count_timed_out()
+        if format_error is not None:
+            yield format_error(str(exc))
+        return
+    _mark(phase)
+
+
+def _count_cancelled():
+    metrics = _metrics
+    if metrics is not None:
+        metrics.inc("func_to_gen_cancelled_requests_total", (("route", request.endpoint),))
+
+
+def _count_timed_out():
+    metrics = _metrics
+    if metrics is not None:
+        metrics.inc("func_to_gen_timed_out_requests_total", (("route", request.endpoint),))
+
+
+def _sse_response(events):
+    """Wrap an iterator of SSE strings in a streaming response."""
+    return Response(
+        stream_with_context(_mark_after(events, "answer", sse_error)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_events(result, events):
+    """Yield the events (see :class:`func_to_gen.pipeline.ChatCompletionEvents`) for an answer result."""
+    yield from events.start()
+    for chunk in iter_answer_chunks(result):
+        yield events.chunk(chunk)
+    yield from events.finish()
+
+
+def _ollama_load_or_unload(model: str, keep_alive: Optional[float], make_final):
+    """Load a model (or unload it when keep_alive is 0) without generating."""
+    registry = get_registry()
+    registry.acquire(model)
+    registry.release(model, keep_alive)
+    done_reason = "unload" if keep_alive == 0 else "load"
+    return jsonify(make_final("", model=model, done_reason=done_reason))
+
+
+def _ndjson_response(lines):
+    """Wrap an iterator of NDJSON lines in a streaming response."""
+    return Response(
+        stream_with_context(_mark_after(lines, "answer", ndjson_error)), mimetype="application/x-ndjson",
+    )
 
 
 @api.route("/chat/completions", methods=["POST"])
 def chat_completions():
     """Handle chat completion requests (OpenAI format)."""
     data = request.get_json(silent=True)
-
-    if not data:
-        return jsonify({"error": {"message": "Request body is required", "type": "invalid_request_error"}}), 400
-
-    messages = data.get("messages", [])
-    if not messages:
-        return jsonify({"error": {"message": "messages is required", "type": "invalid_request_error"}}), 400
+    _mark("parse")
 
     # Convert messages to a single prompt
-    prompt = messages_to_prompt(messages)
+    prompt = chat_prompt(data)
+    _mark("render")
+
+    # Get model from request or use default
+    model = _resolve_model(data)
 
     # Get the answer
-    answer_func = get_answer_function()
-    response_content = answer_func(prompt)
+    started_ns = time.perf_counter_ns()
+    result = _generate(prompt, model, data)
 
-    # Get model from request or use default
-    model = data.get("model", MODEL_NAME)
+    if data.get("stream"):
+        events = ChatCompletionEvents(model, prompt, _tokenizer, include_usage(data))
+        return _sse_response(_stream_events(result, events))
 
-    return jsonify(format_chat_completion_response(response_content, model=model))
+    response_content = collect_answer(result)
+    answer_ns = time.perf_counter_ns() - started_ns
+    _mark("answer")
+    usage = count_usage(_tokenizer, prompt, response_content)
+    response = jsonify(format_chat_completion_response(response_content, model=model, usage=usage))
+    response.headers["X-Answer-Duration-Ns"] = str(answer_ns)
+    return response
 
 
 @api.route("/completions", methods=["POST"])
 def completions():
     """Handle legacy completion requests."""
     data = request.get_json(silent=True)
+    _mark("parse")
 
-    if not data:
-        return jsonify({"error": {"message": "Request body is required", "type": "invalid_request_error"}}), 400
+    prompt = completion_prompt(data)
 
-    prompt = data.get("prompt", "")
-    if not prompt:
-        return jsonify({"error": {"message": "prompt is required", "type": "invalid_request_error"}}), 400
+    # Get model from request or use default
+    model = _resolve_model(data)
 
     # Get the answer
-    answer_func = get_answer_function()
-    response_content = answer_func(prompt)
+    started_ns = time.perf_counter_ns()
+    result = _generate(prompt, model, data)
 
-    # Get model from request or use default
-    model = data.get("model", MODEL_NAME)
+    if data.get("stream"):
+        events = CompletionEvents(model, prompt, _tokenizer, include_usage(data))
+        return _sse_response(_stream_events(result, events))
 
-    return jsonify(format_completion_response(response_content, model=model))
+    response_content = collect_answer(result)
+    answer_ns = time.perf_counter_ns() - started_ns
+    _mark("answer")
+    usage = count_usage(_tokenizer, prompt, response_content)
+    response = jsonify(format_completion_response(response_content, model=model, usage=usage))
+    response.headers["X-Answer-Duration-Ns"] = str(answer_ns)
+    return response
 
 
 @api.route("/models", methods=["GET"])
 def list_models():
     """List available models."""
-    return jsonify(format_models_response(MODEL_NAME))
+    return jsonify(format_models_response(get_registry().names()))
 
 
 @api.route("/models/<model_id>", methods=["GET"])
 def get_model(model_id: str):
     """Get a specific model."""
-    if model_id != MODEL_NAME:
-        return jsonify({"error": {"message": f"Model {model_id} not found", "type": "invalid_request_error"}}), 404
+    if not get_registry().has(model_id):
+        return jsonify(openai_error(f"Model {model_id} not found")), 404
 
     return jsonify({
-        "id": MODEL_NAME,
+        "id": model_id,
         "object": "model",
         "owned_by": "local",
     })
@@ -108,13 +730,16 @@ def get_model(model_id: str):
 
 @api.route("/embeddings", methods=["POST"])
 def embeddings():
-    """Embeddings endpoint - not supported."""
-    return jsonify({
-        "error": {
-            "message": "Embeddings are not supported. This API only wraps a text generation function.",
-            "type": "not_implemented_error",
-        }
-    }), 501
+    """Handle OpenAI embeddings requests."""
+    if _embedding_service is None:
+        return jsonify(openai_error(EMBEDDINGS_NOT_SUPPORTED, "not_implemented_error")), 501
+
+    data = require_body(request.get_json(silent=True))
+    _mark("parse")
+
+    response = answer_openai_embeddings(_embedding_service, data, data.get("model") or MODEL_NAME, _tokenizer)
+    _mark("answer")
+    return jsonify(response)
 
 
 # =============================================================================
@@ -125,81 +750,124 @@ def embeddings():
 def ollama_generate():
     """Handle Ollama native generate requests."""
     data = request.get_json(silent=True)
+    _mark("parse")
 
-    if not data:
-        return jsonify({"error": "Request body is required"}), 400
-
-    prompt = data.get("prompt", "")
+    prompt, keep_alive = ollama_prompt(data)
     if not prompt:
-        return jsonify({"error": "prompt is required"}), 400
-
-    # Get the answer
-    answer_func = get_answer_function()
-    response_content = answer_func(prompt)
+        # A bare keep_alive request loads or unloads the model
+        return _ollama_load_or_unload(_resolve_model(data), keep_alive, format_ollama_generate_response)
 
     # Get model from request or use default
-    model = data.get("model", MODEL_NAME)
+    model = _resolve_model(data)
+
+    # Continue the conversation of a context returned earlier
+    store = _context_store
+    context = store.resume(data.get("context"), model) if store is not None else None
 
-    return jsonify(format_ollama_generate_response(response_content, model=model))
+    # Get the answer
+    started_ns = time.perf_counter_ns()
+    result = _generate(prompt, model, data, keep_alive, context)
+
+    make_final = format_ollama_generate_response
+    if context is not None:
+        handle = store.new_handle()
+        make_final = partial(format_ollama_generate_response, context=[handle])
+        save_context = partial(store.save, handle, model, context, prompt)
+
+    if wants_ollama_stream(data, result):
+        if context is not None:
+            result = record_stream(iter_answer_chunks(result), save_context)
+        events = OllamaEvents(model, prompt, _tokenizer, started_ns, format_ollama_generate_chunk, make_final)
+        return _ndjson_response(_stream_events(result, events))
+
+    response_content = collect_answer(result)
+    finished_ns = time.perf_counter_ns()
+    _mark("answer")
+    if context is not None:
+        save_context(response_content)
+    stats = ollama_timing(_tokenizer, prompt, response_content, started_ns, started_ns, finished_ns)
+    return jsonify(make_final(response_content, model=model, stats=stats))
 
 
 @ollama_api.route("/chat", methods=["POST"])
 def ollama_chat():
     """Handle Ollama native chat requests."""
     data = request.get_json(silent=True)
-
-    if not data:
-        return jsonify({"error": "Request body is required"}), 400
-
-    messages = data.get("messages", [])
-    if not messages:
-        return jsonify({"error": "messages is required"}), 400
+    _mark("parse")
 
     # Convert messages to a single prompt
-    prompt = messages_to_prompt(messages)
+    prompt, keep_alive = ollama_prompt(data, "messages")
+    if not prompt:
+        # A bare keep_alive request loads or unloads the model
+        return _ollama_load_or_unload(_resolve_model(data), keep_alive, format_ollama_chat_response)
+    _mark("render")
+
+    # Get model from request or use default
+    model = _resolve_model(data)
 
     # Get the answer
-    answer_func = get_answer_function()
-    response_content = answer_func(prompt)
+    started_ns = time.perf_counter_ns()
+    result = _generate(prompt, model, data, keep_alive)
 
-    # Get model from request or use default
-    model = data.get("model", MODEL_NAME)
+    if wants_ollama_stream(data, result):
+        events = OllamaEvents(
+            model, prompt, _tokenizer, started_ns, format_ollama_chat_chunk, format_ollama_chat_response,
+        )
+        return _ndjson_response(_stream_events(result, events))
 
-    return jsonify(format_ollama_chat_response(response_content, model=model))
+    response_content = collect_answer(result)
+    finished_ns = time.perf_counter_ns()
+    _mark("answer")
+    stats = ollama_timing(_tokenizer, prompt, response_content, started_ns, started_ns, finished_ns)
+    return jsonify(format_ollama_chat_response(response_content, model=model, stats=stats))
 
 
 @ollama_api.route("/tags", methods=["GET"])
 def ollama_tags():
     """List available models (Ollama format)."""
-    return jsonify(format_ollama_tags_response(MODEL_NAME))
+    return jsonify(format_ollama_tags_response(get_registry().names()))
+
+
+@ollama_api.route("/ps", methods=["GET"])
+def ollama_ps():
+    """List models currently loaded in memory (Ollama format)."""
+    return jsonify(format_ollama_ps_response(get_registry().describe_loaded()))
 
 
 @ollama_api.route("/show", methods=["POST"])
 def ollama_show():
     """Show model information."""
-    data = request.get_json(silent=True)
-
-    if not data:
-        return jsonify({"error": "Request body is required"}), 400
+    data = require_body(request.get_json(silent=True))
+    _mark("parse")
 
-    model = data.get("model", MODEL_NAME)
+    model = _resolve_model(data)
 
-    return jsonify({
-        "modelfile": f"FROM {model}",
-        "parameters": "",
-        "template": "",
-        "details": {
-            "parent_model": "",
-            "format": "gguf",
-            "family": "local",
-            "families": ["local"],
-            "parameter_size": "unknown",
-            "quantization_level": "unknown",
-        },
-    })
+    return jsonify(format_ollama_show_response(model))
 
 
 @ollama_api.route("/embeddings", methods=["POST"])
 def ollama_embeddings():
-    """Ollama embeddings endpoint - not supported."""
-    return jsonify({"error": "Embeddings are not supported. This API only wraps a text generation function."}), 501
+    """Handle legacy Ollama embeddings requests (one prompt)."""
+    if _embedding_service is None:
+        return jsonify(ollama_error(EMBEDDINGS_NOT_SUPPORTED)), 501
+
+    data = require_body(request.get_json(silent=True))
+    _mark("parse")
+
+    response = answer_ollama_embeddings(_embedding_service, data, data.get("model") or MODEL_NAME)
+    _mark("answer")
+    return jsonify(response)
+
+
+@ollama_api.route("/embed", methods=["POST"])
+def ollama_embed():
+    """Handle Ollama embed requests (one or many inputs)."""
+    if _embedding_service is None:
+        return jsonify(ollama_error(EMBEDDINGS_NOT_SUPPORTED)), 501
+
+    data = require_body(request.get_json(silent=True))
+    _mark("parse")
+
+    response = answer_ollama_embed(_embedding_service, data, data.get("model") or MODEL_NAME, _tokenizer)
+    _mark("answer")
+    return jsonify(response)
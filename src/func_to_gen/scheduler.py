@@ -0,0 +1,152 @@
+"""Priority classes and fair queuing for answers waiting on the worker pool."""
+
+import heapq
+import itertools
+import time
+from typing import Optional
+
+# Priority classes, highest first, when none are configured
+DEFAULT_PRIORITY_CLASSES = ("interactive", "default", "batch")
+
+# Header naming the priority class of a request
+PRIORITY_HEADER = "X-Priority"
+
+# Header naming the tenant a request is accounted to
+TENANT_HEADER = "X-Tenant"
+
+
+class FairQueue:
+    """Queue served by strict priority class, fairly between tenants within a class.
+
+    Inside a class, tenants are served by start-time fair queuing: each
+    item gets a virtual start tag of ``max(class clock, tenant's previous
+    finish tag)``, and a tenant with weight ``w`` advances its finish tag
+    by ``1 / w`` per item. A tenant flooding the queue therefore only
+    delays its own items, and a weight-2 tenant gets twice the share of a
+    weight-1 tenant while both have work queued.
+
+    Not thread-safe; the owner serializes access.
+    """
+
+    def __init__(self, classes=DEFAULT_PRIORITY_CLASSES, weights: Optional[dict] = None, default_class: str = None):
+        self.classes = tuple(classes)
+        self.weights = dict(weights or {})
+        self.default_class = default_class if default_class is not None else self._middle_class()
+        if self.default_class not in self.classes:
+            raise ValueError(f"Unknown default priority class: {self.default_class}")
+        self._rank = {name: rank for rank, name in enumerate(self.classes)}
+        self._heaps = [[] for _ in self.classes]
+        self._clocks = [0.0 for _ in self.classes]
+        self._finish_tags = [{} for _ in self.classes]
+        self._sequence = itertools.count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def depths(self) -> dict:
+        """Number of queued items per priority class."""
+        return {name: len(heap) for name, heap in zip(self.classes, self._heaps)}
+
+    def resolve(self, priority: Optional[str]) -> str:
+        """The class an item asking for ``priority`` is queued in."""
+        return priority if priority in self._rank else self.default_class
+
+    def push(self, item, priority: Optional[str] = None, tenant: Optional[str] = None):
+        rank = self._rank[self.resolve(priority)]
+        finish_tags = self._finish_tags[rank]
+        start = max(self._clocks[rank], finish_tags.get(tenant, 0.0))
+        finish_tags[tenant] = start + 1.0 / self.weights.get(tenant, 1.0)
+        heapq.heappush(self._heaps[rank], (start, next(self._sequence), time.monotonic(), item))
+        self._size += 1
+
+    def pop(self):
+        """Remove the next item; returns ``(item, class, seconds queued)`` or None when empty."""
+        for rank, heap in enumerate(self._heaps):
+            if not heap:
+                continue
+            start, _, queued_at, item = heapq.heappop(heap)
+            self._size -= 1
+            self._clocks[rank] = start
+            if not heap:
+                # Nobody is waiting, so no tenant has credit or debt to carry over
+                self._finish_tags[rank].clear()
+                self._clocks[rank] = 0.0
+            return item, self.classes[rank], time.monotonic() - queued_at
+        return None
+
+    def _middle_class(self) -> str:
+        return self.classes[(len(self.classes) - 1) // 2]
+
+
+class PriorityPolicy:
+    """Assign a priority class and tenant to each request.
+
+    The class comes from the ``X-Priority`` header when ``allow_header``
+    is set and it names a known class, else from the API key, else from
+    the route path, else the default class. The header is off by default
+    since any client could use it to jump the queue; enable it only
+    behind a proxy that sets or strips it. The tenant is the API key
+    (the bearer token), else the ``X-Tenant`` header when
+    ``allow_tenant_header`` is set, else ``"anonymous"``; like the priority
+    header, the tenant header is off by default, since a client sending a
+    new tenant on every request would get a fresh fair share each time.
+    """
+
+    def __init__(
+        self,
+        classes=DEFAULT_PRIORITY_CLASSES,
+        routes: Optional[dict] = None,
+        api_keys: Optional[dict] = None,
+        allow_header: bool = False,
+        allow_tenant_header: bool = False,
+    ):
+        self.classes = tuple(classes)
+        self.routes = dict(routes or {})
+        self.api_keys = dict(api_keys or {})
+        self.allow_header = allow_header
+        self.allow_tenant_header = allow_tenant_header
+
+    def classify(self, path: str, headers) -> tuple:
+        """Return ``(priority class or None, tenant)`` for a request."""
+        api_key = _bearer_token(headers)
+        priority = None
+        if self.allow_header:
+            requested = headers.get(PRIORITY_HEADER)
+            if requested in self.classes:
+                priority = requested
+        if priority is None and api_key is not None:
+            priority = self.api_keys.get(api_key)
+        if priority is None:
+            priority = self.routes.get(path)
+        tenant = api_key
+        if tenant is None and self.allow_tenant_header:
+            tenant = headers.get(TENANT_HEADER)
+        tenant = tenant or "anonymous"
+        return priority, tenant
+
+
+def _bearer_token(headers) -> Optional[str]:
+    authorization = headers.get("Authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def create_priority_policy(config) -> PriorityPolicy:
+    """Build the request classifier from app config.
+
+    Recognised keys: ``PRIORITY_CLASSES`` (names, highest first),
+    ``PRIORITY_ROUTES`` (path -> class), ``PRIORITY_API_KEYS``
+    (API key -> class), ``PRIORITY_HEADER`` (True to honour the
+    ``X-Priority`` header) and ``TENANT_HEADER`` (True to honour the
+    ``X-Tenant`` header for requests without an API key).
+    """
+    return PriorityPolicy(
+        classes=config.get("PRIORITY_CLASSES", DEFAULT_PRIORITY_CLASSES),
+        routes=config.get("PRIORITY_ROUTES"),
+        api_keys=config.get("PRIORITY_API_KEYS"),
+        allow_header=config.get("PRIORITY_HEADER", False),
+        allow_tenant_header=config.get("TENANT_HEADER", False),
+    )
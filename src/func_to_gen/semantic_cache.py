@@ -0,0 +1,251 @@
+"""Semantic response cache matching prompts by embedding similarity.
+
+Prompts are embedded with the app's embed function and compared against
+previously answered prompts of the same namespace (model and generation
+parameters) by cosine similarity. The best match at or above the
+threshold is served in place of calling the answer function.
+
+Requires NumPy (``pip install func-to-gen[embeddings]``).
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from func_to_gen.embeddings import _numpy
+
+# Rough per-entry bookkeeping overhead, in bytes
+_ENTRY_OVERHEAD = 128
+
+# Lloyd iterations used to train the IVF partition centroids
+_KMEANS_ITERATIONS = 5
+
+
+class _Namespace:
+    """Unit-length prompt vectors and their answers, searched by dot product.
+
+    Rows are kept dense: removing an entry moves the last row into its
+    place. Past ``ivf_min_entries`` rows, vectors are partitioned around
+    k-means centroids and a search only scores the rows of the ``nprobe``
+    partitions closest to the query.
+    """
+
+    def __init__(self, dim: int, ivf_min_entries: int, nprobe: int):
+        np = _numpy()
+        self.dim = dim
+        self.ivf_min_entries = ivf_min_entries
+        self.nprobe = nprobe
+        self.vectors = np.empty((16, dim), dtype=np.float32)
+        self.partition = np.zeros(16, dtype=np.int32)
+        self.centroids = None
+        self.answers = []
+        self.ids = []
+        self.rows = {}
+        self._trained_at = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, entry_id: int, vector, answer: str):
+        np = _numpy()
+        row = len(self.ids)
+        if row == len(self.vectors):
+            self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+            self.partition = np.concatenate([self.partition, np.zeros_like(self.partition)])
+        self.vectors[row] = vector
+        self.answers.append(answer)
+        self.ids.append(entry_id)
+        self.rows[entry_id] = row
+        if len(self.ids) >= self.ivf_min_entries and len(self.ids) >= 2 * self._trained_at:
+            self._train()
+        elif self.centroids is not None:
+            self.partition[row] = int(np.argmax(self.centroids @ vector))
+
+    def remove(self, entry_id: int):
+        row = self.rows.pop(entry_id)
+        last = len(self.ids) - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.partition[row] = self.partition[last]
+            self.answers[row] = self.answers[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.answers.pop()
+        self.ids.pop()
+
+    def search(self, vector):
+        """Return ``(entry_id, similarity)`` of the closest row, or None when empty."""
+        np = _numpy()
+        size = len(self.ids)
+        if not size:
+            return None
+        if self.centroids is None:
+            scores = self.vectors[:size] @ vector
+            best = int(np.argmax(scores))
+            return self.ids[best], float(scores[best])
+        probes = np.argsort(self.centroids @ vector)[-self.nprobe:]
+        candidates = np.flatnonzero(np.isin(self.partition[:size], probes))
+        if not len(candidates):
+            return None
+        scores = self.vectors[candidates] @ vector
+        best = int(np.argmax(scores))
+        return self.ids[candidates[best]], float(scores[best])
+
+    def _train(self):
+        """Fit sqrt(n) spherical k-means centroids and reassign every row."""
+        np = _numpy()
+        size = len(self.ids)
+        vectors = self.vectors[:size]
+        count = max(int(size ** 0.5), 1)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(size, size=min(size, count * 40), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=count, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for index in range(count):
+                members = sample[assignment == index]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[index] = centroid / max(np.linalg.norm(centroid), 1e-12)
+        self.centroids = centroids
+        self.partition[:size] = np.argmax(vectors @ centroids.T, axis=1)
+        self._trained_at = size
+
+
+class SemanticCache:
+    """In-process cache of answers looked up by prompt similarity.
+
+    Args:
+        threshold: Minimum cosine similarity for a cached answer to be served.
+        max_entries: Entries kept across all namespaces; the oldest go first.
+        ttl: Seconds an entry may be served, or None to keep it until evicted.
+        max_bytes: Approximate memory budget for vectors and answers.
+        ivf_min_entries: Namespace size from which searches are partitioned.
+        nprobe: Partitions searched per lookup once partitioned.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 10_000,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        ivf_min_entries: int = 100_000,
+        nprobe: int = 8,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.ivf_min_entries = ivf_min_entries
+        self.nprobe = nprobe
+        self.hits = 0
+        self.misses = 0
+        self._namespaces = {}
+        # entry id -> (namespace, created, size), oldest first
+        self._entries = OrderedDict()
+        self._ids = itertools.count()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, namespace: str, vector) -> Optional[str]:
+        """Return the answer of the most similar cached prompt, or None on a miss."""
+        vector = _normalize(vector)
+        with self._lock:
+            self._expire()
+            entries = self._namespaces.get(namespace)
+            match = entries.search(vector) if entries is not None else None
+            if match is None or match[1] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entries.answers[entries.rows[match[0]]]
+
+    def set(self, namespace: str, vector, answer: str):
+        """Store the answer to a prompt, evicting the oldest entries as needed."""
+        vector = _normalize(vector)
+        size = vector.nbytes + len(answer.encode("utf-8")) + _ENTRY_OVERHEAD
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if entries is None:
+                entries = self._namespaces[namespace] = _Namespace(len(vector), self.ivf_min_entries, self.nprobe)
+            elif len(vector) != entries.dim:
+                raise ValueError(f"Expected {entries.dim}-dimensional prompt embeddings, got {len(vector)}")
+            entry_id = next(self._ids)
+            entries.add(entry_id, vector, answer)
+            self._entries[entry_id] = (namespace, time.monotonic(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Drop all cached entries."""
+        with self._lock:
+            self._namespaces.clear()
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def _expire(self):
+        """Drop entries older than the TTL; they are always at the front."""
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._entries:
+            entry_id, (_, created, _) = next(iter(self._entries.items()))
+            if created > cutoff:
+                break
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        namespace, _, size = self._entries.pop(entry_id)
+        entries = self._namespaces[namespace]
+        entries.remove(entry_id)
+        if not len(entries):
+            del self._namespaces[namespace]
+        self._bytes -= size
+
+
+def _normalize(vector):
+    np = _numpy()
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def create_semantic_cache(config) -> Optional[SemanticCache]:
+    """Build a semantic cache from app config, or None when it is off.
+
+    Recognised keys: ``SEMANTIC_CACHE_THRESHOLD`` (enables the cache),
+    ``SEMANTIC_CACHE_MAX_ENTRIES``, ``SEMANTIC_CACHE_TTL``,
+    ``SEMANTIC_CACHE_MAX_BYTES``, ``SEMANTIC_CACHE_IVF_MIN_ENTRIES`` and
+    ``SEMANTIC_CACHE_NPROBE``.
+    """
+    threshold = config.get("SEMANTIC_CACHE_THRESHOLD")
+    if not threshold:
+        return None
+    return SemanticCache(
+        threshold=threshold,
+        max_entries=config.get("SEMANTIC_CACHE_MAX_ENTRIES", 10_000),
+        ttl=config.get("SEMANTIC_CACHE_TTL"),
+        max_bytes=config.get("SEMANTIC_CACHE_MAX_BYTES"),
+        ivf_min_entries=config.get("SEMANTIC_CACHE_IVF_MIN_ENTRIES", 100_000),
+        nprobe=config.get("SEMANTIC_CACHE_NPROBE", 8),
+    )
@@ -0,0 +1,291 @@
+"""Pre-fork multi-process server.
+
+The master process loads the answer function once, then forks worker
+processes that each serve the app on the shared listening socket. Model
+weights loaded before the fork are shared copy-on-write, so N workers
+use all cores for HTTP and JSON work without N copies of the model.
+
+Signals handled by the master:
+    SIGTERM, SIGINT: stop the workers gracefully, then exit.
+    SIGHUP: reload the answer function and replace the workers gracefully.
+    SIGTTIN, SIGTTOU: add or remove a worker.
+"""
+
+import errno
+import gc
+import os
+import select
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Optional
+
+from werkzeug.serving import make_server
+
+# Seconds a worker must stay up before it is restarted without delay
+MIN_WORKER_UPTIME = 1.0
+
+# Longest delay before restarting a worker that keeps crashing, in seconds
+MAX_RESTART_DELAY = 10.0
+
+_MASTER_SIGNALS = {
+    signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU, signal.SIGCHLD,
+}
+
+
+def _log(message: str):
+    sys.stderr.write(f"[func-to-gen {os.getpid()}] {message}\n")
+    sys.stderr.flush()
+
+
+class PreforkServer:
+    """Supervise forked worker processes serving a WSGI app.
+
+    Args:
+        load: Called in the master, at start and on every reload, to load
+            the answer function; returns a zero-argument callable that
+            builds the WSGI app in each worker after the fork.
+        host: Interface to listen on.
+        port: Port to listen on (0 picks a free port).
+        workers: Number of worker processes (default: one per CPU).
+        threads: Whether each worker serves requests on a thread per
+            connection.
+        graceful_timeout: Seconds stopping workers may spend finishing
+            in-flight requests before they are killed.
+    """
+
+    def __init__(
+        self,
+        load,
+        host: str = "127.0.0.1",
+        port: int = 5000,
+        workers: Optional[int] = None,
+        threads: bool = True,
+        graceful_timeout: float = 30.0,
+    ):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("The pre-fork server needs os.fork(), which this platform lacks")
+        self.load = load
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.socket = None
+        # pid -> start time of the workers of the current generation
+        self._workers = {}
+        # pid -> kill time of workers finishing their last requests
+        self._retiring = {}
+        self._make_app = None
+        self._signals = []
+        self._wake_read = self._wake_write = None
+        self._restart_delay = 0.0
+
+    # -------------------------------------------------------------------------
+    # Master
+    # -------------------------------------------------------------------------
+
+    def bind(self):
+        """Open the listening socket shared by all workers."""
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(socket.SOMAXCONN)
+        sock.set_inheritable(True)
+        self.socket = sock
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def serve(self):
+        """Load the app, fork the workers and supervise them until stopped."""
+        if self.socket is None:
+            self.bind()
+        self._make_app = self.load()
+        self._install_signals()
+        _log(f"Listening on http://{self.host}:{self.port} with {self.workers} workers")
+        try:
+            self._spawn_missing()
+            while True:
+                self._wait_for_signal(1.0)
+                self._reap()
+                action = self._next_signal()
+                while action is not None:
+                    if action in (signal.SIGTERM, signal.SIGINT):
+                        return
+                    if action == signal.SIGHUP:
+                        self.reload()
+                    elif action == signal.SIGTTIN:
+                        self.workers += 1
+                    elif action == signal.SIGTTOU and self.workers > 1:
+                        self.workers -= 1
+                        self._retire(max(self._workers, key=self._workers.get))
+                    action = self._next_signal()
+                self._kill_overdue()
+                self._spawn_missing()
+        finally:
+            self.stop()
+
+    def reload(self):
+        """Reload the answer function and replace every worker gracefully.
+
+        If loading fails, the current workers keep serving.
+        """
+        _log("Reloading")
+        try:
+            self._make_app = self.load()
+        except Exception as exc:
+            _log(f"Reload failed, keeping the current workers: {exc!r}")
+            return
+        old_workers = list(self._workers)
+        for _ in range(self.workers):
+            self._spawn()
+        for pid in old_workers:
+            self._retire(pid)
+
+    def stop(self):
+        """Stop every worker, killing those still busy after the graceful timeout."""
+        for pid in list(self._workers):
+            self._retire(pid)
+        while self._retiring:
+            self._reap()
+            self._kill_overdue()
+            if self._retiring:
+                time.sleep(0.05)
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        for fd in (self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._wake_read = self._wake_write = None
+        _log("Stopped")
+
+    def _spawn_missing(self):
+        if len(self._workers) < self.workers and self._restart_delay:
+            # Workers crashing right after boot; do not fork in a tight loop
+            time.sleep(self._restart_delay)
+        while len(self._workers) < self.workers:
+            self._spawn()
+
+    def _spawn(self):
+        # Keep objects loaded so far out of the collector, so collections in
+        # the workers do not touch (and so copy) the pages holding them
+        gc.collect()
+        gc.freeze()
+        # Hold signals until the worker has replaced the master's handlers
+        signal.pthread_sigmask(signal.SIG_BLOCK, _MASTER_SIGNALS)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                self._run_worker()
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _MASTER_SIGNALS)
+        self._workers[pid] = time.monotonic()
+        _log(f"Booted worker {pid}")
+
+    def _retire(self, pid: int):
+        """Ask a worker to finish its requests and exit."""
+        if self._workers.pop(pid, None) is None:
+            return
+        self._retiring[pid] = time.monotonic() + self.graceful_timeout
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self):
+        """Collect exited workers, scheduling restarts for unexpected exits."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self._retiring.pop(pid, None) is not None:
+                continue
+            started = self._workers.pop(pid, None)
+            if started is None:
+                continue
+            _log(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                self._restart_delay = min(max(self._restart_delay * 2, 0.1), MAX_RESTART_DELAY)
+            else:
+                self._restart_delay = 0.0
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self._retiring.items()):
+            if now >= deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def _install_signals(self):
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+        for signum in _MASTER_SIGNALS - {signal.SIGCHLD}:
+            signal.signal(signum, self._queue_signal)
+        signal.signal(signal.SIGCHLD, self._wake)
+
+    def _queue_signal(self, signum, _frame):
+        self._signals.append(signum)
+        self._wake(signum, _frame)
+
+    def _wake(self, _signum, _frame):
+        try:
+            os.write(self._wake_write, b".")
+        except OSError as exc:
+            if exc.errno not in (errno.EAGAIN, errno.EBADF):
+                raise
+
+    def _next_signal(self):
+        return self._signals.pop(0) if self._signals else None
+
+    def _wait_for_signal(self, timeout: float):
+        readable, _, _ = select.select([self._wake_read], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self._wake_read, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+
+    def _run_worker(self):
+        """Serve the app in a forked worker until asked to stop; never returns."""
+        status = 0
+        try:
+            for signum in (signal.SIGINT, signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                # Terminal signals reach the whole process group; the master decides
+                signal.signal(signum, signal.SIG_IGN)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            # Until it serves, a worker asked to stop can simply exit
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, _MASTER_SIGNALS)
+            for fd in (self._wake_read, self._wake_write):
+                os.close(fd)
+            server = make_server(
+                self.host, self.port, self._make_app(), threaded=self.threads, fd=self.socket.fileno(),
+            )
+            # Let in-flight requests finish when shutting down
+            server.daemon_threads = False
+            signal.signal(
+                signal.SIGTERM, lambda _signum, _frame: threading.Thread(target=server.shutdown).start(),
+            )
+            server.serve_forever()
+            server.server_close()
+        except BaseException as exc:
+            _log(f"Worker failed: {exc!r}")
+            status = 1
+        finally:
+            sys.stderr.flush()
+            os._exit(status)
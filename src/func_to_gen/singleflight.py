@@ -0,0 +1,201 @@
+"""Single-flight coalescing of identical in-flight requests."""
+
+import threading
+
+from func_to_gen.deadlines import RequestTimeout
+
+_END = object()
+
+
+class _SharedStream:
+    """Replayable view over one chunk iterator shared by many readers.
+
+    Whichever reader first needs a chunk that has not been produced yet
+    pulls it from the source, so the stream keeps moving as long as any
+    reader is still consuming it. Once every reader has gone away early,
+    :meth:`abandon` closes the source.
+    """
+
+    def __init__(self, source, on_finish):
+        self._source = iter(source)
+        self._on_finish = on_finish
+        self._chunks = []
+        self._done = False
+        self._error = None
+        self._lock = threading.Lock()
+
+    def _chunk_at(self, index: int):
+        with self._lock:
+            while index >= len(self._chunks):
+                if self._error is not None:
+                    raise self._error
+                if self._done:
+                    return _END
+                try:
+                    self._chunks.append(next(self._source))
+                except StopIteration:
+                    self._done = True
+                    self._on_finish()
+                except BaseException as exc:
+                    self._error = exc
+                    self._on_finish()
+            return self._chunks[index]
+
+    def abandon(self):
+        """Stop a stream nobody reads any more, closing its source."""
+        with self._lock:
+            if self._done or self._error is not None:
+                return
+            self._done = True
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                close()
+
+
+class _Subscription:
+    """One reader's iterator over a shared stream, from its first chunk.
+
+    ``on_close`` is called once, when the reader reaches the end, fails or
+    is closed (or garbage collected) early.
+    """
+
+    def __init__(self, stream: _SharedStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._index = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._on_close is None:
+            raise StopIteration
+        try:
+            chunk = self._stream._chunk_at(self._index)
+        except BaseException:
+            self.close()
+            raise
+        if chunk is _END:
+            self.close()
+            raise StopIteration
+        self._index += 1
+        return chunk
+
+    def close(self):
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close()
+
+    def __del__(self):
+        self.close()
+
+
+class _Call:
+    """An in-flight computation that followers can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.stream = None
+        # Callers still reading the result, leader included
+        self.subscribers = 1
+
+
+class SingleFlight:
+    """Share one computation between concurrent callers with the same key."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func, deadline=None):
+        """Return ``func()``'s result, running it only once per in-flight key.
+
+        Callers arriving while the leader is still running get the leader's
+        result. If the result is a chunk iterator, every caller receives its
+        own iterator over the same shared chunks; once all of them are
+        closed before the end, the source is closed and the key released.
+
+        With a ``deadline`` (:class:`func_to_gen.deadlines.Deadline`), the
+        caller waits for the result only until then and gets
+        :class:`RequestTimeout`; the computation goes on for the others
+        (the leader then runs ``func`` on a thread of its own).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.subscribers += 1
+                self.coalesced += 1
+
+        if leader and deadline is None:
+            self._run(key, call, func)
+        elif leader:
+            thread = threading.Thread(
+                target=self._run, args=(key, call, func), name="func-to-gen-single-flight", daemon=True,
+            )
+            thread.start()
+        if not call.event.wait(deadline.remaining() if deadline is not None else None):
+            self._unsubscribe(key, call)
+            raise RequestTimeout(deadline.timeout)
+        if call.error is not None:
+            raise call.error
+        if call.stream is not None:
+            return self._subscribe(key, call)
+        return call.result
+
+    def _run(self, key: str, call: _Call, func):
+        """Compute the shared result and wake every caller waiting for it."""
+        try:
+            result = func()
+        except BaseException as exc:
+            call.error = exc
+            self._forget(key, call)
+            call.event.set()
+            return
+        if isinstance(result, str):
+            call.result = result
+            self._forget(key, call)
+            call.event.set()
+            return
+        with self._lock:
+            call.stream = _SharedStream(result, lambda: self._forget(key, call))
+            unread = call.subscribers == 0
+        call.event.set()
+        if unread:
+            # Every caller gave up at its deadline before the stream started
+            self._forget(key, call)
+            call.stream.abandon()
+
+    def _subscribe(self, key: str, call: _Call) -> _Subscription:
+        return _Subscription(call.stream, lambda: self._unsubscribe(key, call))
+
+    def _unsubscribe(self, key: str, call: _Call):
+        """Drop a reader; the last one to leave stops the stream if it is unfinished.
+
+        Callers giving up before the result arrives leave the computation
+        running, for callers arriving later.
+        """
+        with self._lock:
+            call.subscribers -= 1
+            if call.subscribers > 0 or call.stream is None:
+                return
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.stream.abandon()
+
+    def _forget(self, key: str, call: _Call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+
+def create_single_flight(config):
+    """Build a SingleFlight when ``SINGLE_FLIGHT`` is enabled in app config."""
+    if not config.get("SINGLE_FLIGHT"):
+        return None
+    return SingleFlight()
@@ -0,0 +1,161 @@
+"""Response cache stored in a SQLite database shared by worker processes.
+
+The database runs in WAL mode, so lookups from any number of processes
+proceed while another process writes. Lookups are a single primary-key
+read and never write; expiry and size limits are enforced by a
+background thread in each process, oldest entries first.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from func_to_gen.cache import CacheBackend
+
+# Rough per-entry bookkeeping overhead, in bytes
+_ENTRY_OVERHEAD = 128
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created);
+"""
+
+
+class SQLiteCache(CacheBackend):
+    """Answer cache in a SQLite file with TTL, size limits and background eviction.
+
+    Args:
+        path: Database file, shared by every process that should share answers.
+        max_entries: Entries kept; the oldest are evicted beyond this.
+        ttl: Seconds an answer may be served, or None to keep it until evicted.
+        max_bytes: Approximate budget for keys and answers.
+        evict_interval: Seconds between eviction passes.
+        pool_size: Idle connections kept open for reuse; a thread finding
+            none idle opens another, closed again when the pool is full.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        evict_interval: float = 1.0,
+        pool_size: int = 4,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._closed = threading.Event()
+        with self._connection() as connection:
+            connection.executescript(_SCHEMA)
+        self._evictor = threading.Thread(target=self._evict_loop, name="func-to-gen-cache-evictor", daemon=True)
+        self._evictor.start()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: str):
+        size = len(key) + len(value.encode("utf-8")) + _ENTRY_OVERHEAD
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        with self._connection() as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created, expires, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, expires, size),
+            )
+
+    def clear(self):
+        with self._connection() as connection, connection:
+            connection.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._connection() as connection:
+            entries, size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def evict(self):
+        """Delete expired answers, then the oldest ones beyond the size limits."""
+        with self._connection() as connection, connection:
+            connection.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+            if self.max_entries is not None:
+                connection.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            if self.max_bytes is not None:
+                connection.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY created DESC) AS total"
+                    " FROM responses) WHERE total > ?)",
+                    (self.max_bytes,),
+                )
+
+    def close(self):
+        """Stop background eviction and close the idle connections."""
+        self._closed.set()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    @contextmanager
+    def _connection(self):
+        """Borrow an idle connection, or open one if none is idle."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield connection
+        finally:
+            if self._closed.is_set():
+                connection.close()
+            else:
+                try:
+                    self._idle.put_nowait(connection)
+                except queue.Full:
+                    connection.close()
+
+    def _evict_loop(self):
+        while not self._closed.wait(self.evict_interval):
+            try:
+                self.evict()
+            except sqlite3.Error:
+                # Another process holds the write lock; try again next pass
+                pass
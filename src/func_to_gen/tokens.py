@@ -0,0 +1,38 @@
+"""Token counting for usage and timing statistics."""
+
+import re
+from typing import Optional
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_token_count(text: str) -> int:
+    """Approximate the number of tokens in ``text``.
+
+    Counts words and punctuation marks, then adds a token for every four
+    characters beyond the first four of each word, since subword
+    tokenizers split long words. Close enough for throughput and cost
+    dashboards without loading a real tokenizer.
+    """
+    count = 0
+    for match in _TOKEN_RE.finditer(text):
+        count += 1 + max(len(match.group()) - 4, 0) // 4
+    return count
+
+
+class Answer(str):
+    """An answer string carrying token counts reported by the backend.
+
+    Answer functions that know their exact counts can return
+    ``Answer(text, prompt_tokens=..., completion_tokens=...)`` instead of a
+    plain string; counts left as None fall back to the configured tokenizer.
+    """
+
+    def __new__(cls, text: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        answer = super().__new__(cls, text)
+        answer.prompt_tokens = prompt_tokens
+        answer.completion_tokens = completion_tokens
+        return answer
+
+    def __reduce__(self):
+        return (Answer, (str(self), self.prompt_tokens, self.completion_tokens))
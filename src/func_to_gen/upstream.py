@@ -0,0 +1,304 @@
+"""Answer functions forwarding prompts to an OpenAI- or Ollama-compatible server.
+
+Connections to the upstream are HTTP/1.1 keep-alive connections taken
+from a pool, so requests do not pay for connection setup, and streamed
+answers are passed on line by line as they arrive.
+"""
+
+import http.client
+import json
+import socket
+import threading
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+from func_to_gen.deadlines import RequestTimeout
+
+# Errors meaning an idle keep-alive connection was closed by the upstream
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class UpstreamError(Exception):
+    """The upstream server failed or answered with an error.
+
+    ``status`` is the upstream's HTTP status, or None if it was unreachable.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        self.status = status
+        super().__init__(message)
+
+
+class ConnectionPool:
+    """Keep-alive connections to one upstream host.
+
+    A request takes the most recently used idle connection, or opens a new
+    one if none is idle; there is no limit on connections in use. Up to
+    ``size`` connections are kept idle for later requests.
+
+    Args:
+        host: Upstream host name.
+        port: Upstream port.
+        scheme: ``"http"`` or ``"https"``.
+        size: Idle connections kept open.
+        timeout: Socket timeout in seconds.
+    """
+
+    def __init__(self, host: str, port: int, scheme: str = "http", size: int = 8, timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.created = 0
+        self.reused = 0
+        self._connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None, headers: Optional[dict] = None,
+                timeout: Optional[float] = None) -> "Exchange":
+        """Send a request and return the :class:`Exchange` holding its response.
+
+        A request failing on an idle connection the upstream has meanwhile
+        closed is sent again on another one.
+        """
+        while True:
+            conn, reused = self._take()
+            _set_timeout(conn, timeout or self.timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                # The connection lets go of its socket if the response closes it
+                sock = conn.sock
+                return Exchange(self, conn, sock, conn.getresponse())
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+            except BaseException:
+                conn.close()
+                raise
+
+    def release(self, conn: http.client.HTTPConnection, response: http.client.HTTPResponse):
+        """Keep ``conn`` for reuse if ``response`` was read to the end, or close it."""
+        if response.isclosed() and not response.will_close:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Idle connections and connections opened and reused so far."""
+        return {"idle": len(self._idle), "created": self.created, "reused": self.reused}
+
+    def _take(self):
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+            self.created += 1
+        return self._connection_class(self.host, self.port, timeout=self.timeout), False
+
+
+def _set_timeout(conn: http.client.HTTPConnection, timeout: float):
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+
+
+class Exchange:
+    """A response and the pooled connection it arrives on."""
+
+    def __init__(self, pool: ConnectionPool, conn: http.client.HTTPConnection, sock, response):
+        self.response = response
+        self._pool = pool
+        self._conn = conn
+        self._sock = sock
+        self._lock = threading.Lock()
+
+    def abort(self):
+        """Unblock a read waiting on the upstream (from any thread); the connection is then discarded."""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def release(self):
+        """Hand the connection back to the pool, which keeps it if the response was read to the end."""
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, self.response)
+
+
+class Upstream:
+    """Answer function forwarding prompts to an OpenAI- or Ollama-compatible server.
+
+    With ``api="openai"`` prompts are posted to ``/v1/completions`` (as
+    served by llama.cpp, vLLM and others), with ``api="ollama"`` to
+    ``/api/generate``. Streamed answers are yielded chunk by chunk as the
+    upstream sends them; cancelling the request aborts the upstream read.
+
+        from func_to_gen import Upstream, create_app
+
+        app = create_app(answer_func=Upstream("http://127.0.0.1:8080", model="llama"))
+
+    Args:
+        url: Base URL of the upstream, optionally with a path prefix.
+        model: Model name sent to the upstream.
+        api: ``"openai"`` or ``"ollama"``.
+        stream: Whether to stream answers from the upstream, or return
+            each answer whole.
+        pool_size: Idle keep-alive connections kept open.
+        timeout: Socket timeout in seconds (capped by request deadlines).
+        headers: Extra headers for every request, e.g. ``Authorization``.
+        options: Extra fields for every request body, e.g. ``max_tokens``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        model: Optional[str] = None,
+        api: str = "openai",
+        stream: bool = True,
+        pool_size: int = 8,
+        timeout: float = 60.0,
+        headers: Optional[dict] = None,
+        options: Optional[dict] = None,
+    ):
+        if api not in ("openai", "ollama"):
+            raise ValueError(f"Unknown upstream API {api!r}, expected 'openai' or 'ollama'")
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Invalid upstream URL {url!r}")
+        self.model = model
+        self.api = api
+        self.stream = stream
+        self.options = dict(options or {})
+        self.pool = ConnectionPool(
+            parts.hostname,
+            parts.port or (443 if parts.scheme == "https" else 80),
+            scheme=parts.scheme,
+            size=pool_size,
+            timeout=timeout,
+        )
+        prefix = parts.path.rstrip("/")
+        self.path = prefix + ("/v1/completions" if api == "openai" else "/api/generate")
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def __call__(self, prompt: str, cancel=None, deadline=None):
+        body = {**self.options, "prompt": prompt, "stream": self.stream}
+        if self.model is not None:
+            body["model"] = self.model
+        timeout = self.pool.timeout
+        if deadline is not None:
+            timeout = max(min(timeout, deadline.remaining()), 0.001)
+        try:
+            exchange = self.pool.request(
+                "POST", self.path, body=json.dumps(body).encode(), headers=self.headers, timeout=timeout,
+            )
+        except OSError as exc:
+            raise self._failure(exc, deadline) from exc
+        response = exchange.response
+        if response.status != 200:
+            data = response.read()
+            exchange.release()
+            raise UpstreamError(f"Upstream answered {response.status}: {_error_message(data)}", response.status)
+        if not self.stream:
+            try:
+                data = json.loads(response.read())
+            except OSError as exc:
+                raise self._failure(exc, deadline) from exc
+            finally:
+                exchange.release()
+            return self._text(data)
+        if cancel is not None:
+            cancel.add_callback(exchange.abort)
+        return self._chunks(exchange, deadline)
+
+    def close(self):
+        """Close the idle upstream connections."""
+        self.pool.close()
+
+    def _failure(self, exc: OSError, deadline) -> Exception:
+        """The error to raise for a connection failure or timeout."""
+        if deadline is not None and deadline.expired:
+            return RequestTimeout(deadline.timeout)
+        return UpstreamError(f"Upstream {self.pool.host}:{self.pool.port} failed: {exc}")
+
+    def _chunks(self, exchange: Exchange, deadline):
+        response = exchange.response
+        try:
+            for line in _lines(response, lambda exc: self._failure(exc, deadline)):
+                data = self._parse_line(line.strip())
+                if data is None:
+                    continue
+                if data is _DONE:
+                    break
+                text = self._text(data)
+                if text:
+                    yield text
+                if data.get("done"):
+                    break
+            # Read the end of the chunked body so the connection can be reused
+            response.read()
+        finally:
+            exchange.release()
+
+    def _parse_line(self, line: bytes):
+        """Decode one streamed line into a JSON object, ``_DONE``, or None to skip it."""
+        if self.api == "openai":
+            if not line.startswith(b"data:"):
+                return None
+            line = line[len(b"data:"):].strip()
+            if line == b"[DONE]":
+                return _DONE
+        if not line:
+            return None
+        return json.loads(line)
+
+    def _text(self, data: dict) -> str:
+        if "error" in data:
+            raise UpstreamError(f"Upstream failed: {_error_message(data)}", 200)
+        if self.api == "ollama":
+            return data.get("response", "")
+        choices = data.get("choices") or [{}]
+        return choices[0].get("text") or ""
+
+
+_DONE = object()
+
+
+def _lines(response: http.client.HTTPResponse, failure):
+    """Iterate a response's lines, raising ``failure(exc)`` if reading fails."""
+    while True:
+        try:
+            line = response.readline()
+        except OSError as exc:
+            raise failure(exc) from exc
+        if not line:
+            return
+        yield line
+
+
+def _error_message(data) -> str:
+    """Extract the message from an OpenAI or Ollama error body."""
+    try:
+        if not isinstance(data, dict):
+            data = json.loads(data)
+        error = data["error"]
+    except (ValueError, KeyError, TypeError):
+        return data.decode(errors="replace").strip() if isinstance(data, bytes) else str(data)
+    if isinstance(error, dict):
+        return error.get("message", str(error))
+    return str(error)
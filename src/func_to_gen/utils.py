@@ -1,7 +1,9 @@
 """Utility functions for formatting OpenAI-compatible responses."""
 
+import json
 import time
 import uuid
+from typing import Iterable, Iterator, Optional, Union
 
 
 def generate_id(prefix: str = "chatcmpl") -> str:
@@ -18,6 +20,7 @@ def format_chat_completion_response(
     content: str,
     model: str = "local-llm",
     finish_reason: str = "stop",
+    usage: Optional[dict] = None,
 ) -> dict:
     """Format a response in OpenAI chat completion format."""
     return {
@@ -35,11 +38,7 @@ def format_chat_completion_response(
                 "finish_reason": finish_reason,
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0,
-        },
+        "usage": usage or format_usage(0, 0),
     }
 
 
@@ -47,6 +46,7 @@ def format_completion_response(
     content: str,
     model: str = "local-llm",
     finish_reason: str = "stop",
+    usage: Optional[dict] = None,
 ) -> dict:
     """Format a response in OpenAI legacy completion format."""
     return {
@@ -61,25 +61,139 @@ def format_completion_response(
                 "finish_reason": finish_reason,
             }
         ],
-        "usage": {
-            "prompt_tokens": 0,
-            "completion_tokens": 0,
-            "total_tokens": 0,
-        },
+        "usage": usage or format_usage(0, 0),
+    }
+
+
+def format_usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    """Format token counts as an OpenAI usage object."""
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def format_usage_chunk(
+    usage: dict,
+    completion_id: str,
+    created: int,
+    model: str = "local-llm",
+    object_type: str = "chat.completion.chunk",
+) -> dict:
+    """Format the final streamed chunk carrying usage (``stream_options.include_usage``)."""
+    return {
+        "id": completion_id,
+        "object": object_type,
+        "created": created,
+        "model": model,
+        "choices": [],
+        "usage": usage,
+    }
+
+
+def format_chat_completion_chunk(
+    content: Optional[str],
+    completion_id: str,
+    created: int,
+    model: str = "local-llm",
+    role: Optional[str] = None,
+    finish_reason: Optional[str] = None,
+) -> dict:
+    """Format a streamed chunk in OpenAI chat.completion.chunk format."""
+    delta = {}
+    if role is not None:
+        delta["role"] = role
+    if content is not None:
+        delta["content"] = content
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "delta": delta,
+                "finish_reason": finish_reason,
+            }
+        ],
+    }
+
+
+def format_completion_chunk(
+    text: str,
+    completion_id: str,
+    created: int,
+    model: str = "local-llm",
+    finish_reason: Optional[str] = None,
+) -> dict:
+    """Format a streamed chunk in OpenAI legacy completion format."""
+    return {
+        "id": completion_id,
+        "object": "text_completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "text": text,
+                "finish_reason": finish_reason,
+            }
+        ],
     }
 
 
-def format_models_response(model_name: str = "local-llm") -> dict:
+SSE_DONE = "data: [DONE]\n\n"
+
+
+def format_sse(payload: dict) -> str:
+    """Format a payload as a Server-Sent Events data line."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def iter_answer_chunks(result: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Yield text chunks from an answer function result.
+
+    Answer functions may return either a complete string or an iterable
+    of string chunks. Empty chunks are skipped.
+    """
+    if isinstance(result, str):
+        if result:
+            yield result
+        return
+    for chunk in result:
+        if chunk:
+            yield chunk
+
+
+def collect_answer(result: Union[str, Iterable[str]]) -> str:
+    """Join an answer function result into a single string."""
+    if isinstance(result, str):
+        return result
+    return "".join(iter_answer_chunks(result))
+
+
+def _as_model_names(model_names: Union[str, Iterable[str]]) -> list[str]:
+    """Accept a single model name or an iterable of names."""
+    if isinstance(model_names, str):
+        return [model_names]
+    return list(model_names)
+
+
+def format_models_response(model_names: Union[str, Iterable[str]] = "local-llm") -> dict:
     """Format a response for the models list endpoint."""
+    created = get_timestamp()
     return {
         "object": "list",
         "data": [
             {
                 "id": model_name,
                 "object": "model",
-                "created": get_timestamp(),
+                "created": created,
                 "owned_by": "local",
             }
+            for model_name in _as_model_names(model_names)
         ],
     }
 
@@ -109,9 +223,33 @@ def get_iso_timestamp() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def to_iso_timestamp(timestamp: float) -> str:
+    """Convert a Unix timestamp to ISO format."""
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _ollama_stats(stats: Optional[dict]) -> dict:
+    """Build the Ollama timing/count fields, defaulting missing ones to 0."""
+    fields = {
+        "total_duration": 0,
+        "load_duration": 0,
+        "prompt_eval_count": 0,
+        "prompt_eval_duration": 0,
+        "eval_count": 0,
+        "eval_duration": 0,
+    }
+    if stats:
+        fields.update({key: value for key, value in stats.items() if key in fields})
+    return fields
+
+
 def format_ollama_generate_response(
     response: str,
     model: str = "local-llm",
+    done_reason: str = "stop",
+    stats: Optional[dict] = None,
+    context: Optional[list] = None,
 ) -> dict:
     """Format a response in Ollama /api/generate format."""
     return {
@@ -119,20 +257,17 @@ def format_ollama_generate_response(
         "created_at": get_iso_timestamp(),
         "response": response,
         "done": True,
-        "done_reason": "stop",
-        "context": [],
-        "total_duration": 0,
-        "load_duration": 0,
-        "prompt_eval_count": 0,
-        "prompt_eval_duration": 0,
-        "eval_count": 0,
-        "eval_duration": 0,
+        "done_reason": done_reason,
+        "context": context or [],
+        **_ollama_stats(stats),
     }
 
 
 def format_ollama_chat_response(
     content: str,
     model: str = "local-llm",
+    done_reason: str = "stop",
+    stats: Optional[dict] = None,
 ) -> dict:
     """Format a response in Ollama /api/chat format."""
     return {
@@ -143,24 +278,48 @@ def format_ollama_chat_response(
             "content": content,
         },
         "done": True,
-        "done_reason": "stop",
-        "total_duration": 0,
-        "load_duration": 0,
-        "prompt_eval_count": 0,
-        "prompt_eval_duration": 0,
-        "eval_count": 0,
-        "eval_duration": 0,
+        "done_reason": done_reason,
+        **_ollama_stats(stats),
+    }
+
+
+def format_ollama_generate_chunk(response: str, model: str = "local-llm") -> dict:
+    """Format an intermediate streamed line in Ollama /api/generate format."""
+    return {
+        "model": model,
+        "created_at": get_iso_timestamp(),
+        "response": response,
+        "done": False,
+    }
+
+
+def format_ollama_chat_chunk(content: str, model: str = "local-llm") -> dict:
+    """Format an intermediate streamed line in Ollama /api/chat format."""
+    return {
+        "model": model,
+        "created_at": get_iso_timestamp(),
+        "message": {
+            "role": "assistant",
+            "content": content,
+        },
+        "done": False,
     }
 
 
-def format_ollama_tags_response(model_name: str = "local-llm") -> dict:
+def format_ndjson(payload: dict) -> str:
+    """Format a payload as a single newline-delimited JSON line."""
+    return json.dumps(payload) + "\n"
+
+
+def format_ollama_tags_response(model_names: Union[str, Iterable[str]] = "local-llm") -> dict:
     """Format a response for Ollama /api/tags endpoint."""
+    modified_at = get_iso_timestamp()
     return {
         "models": [
             {
                 "name": model_name,
                 "model": model_name,
-                "modified_at": get_iso_timestamp(),
+                "modified_at": modified_at,
                 "size": 0,
                 "digest": "",
                 "details": {
@@ -172,5 +331,92 @@ def format_ollama_tags_response(model_name: str = "local-llm") -> dict:
                     "quantization_level": "unknown",
                 },
             }
+            for model_name in _as_model_names(model_names)
         ]
     }
+
+
+def format_ollama_ps_response(models: list[dict]) -> dict:
+    """Format a response for Ollama /api/ps endpoint.
+
+    Each item needs ``name``, ``size`` (bytes) and ``expires_at`` (Unix
+    timestamp, or None when the model never expires).
+    """
+    return {
+        "models": [
+            {
+                "name": model["name"],
+                "model": model["name"],
+                "size": model["size"],
+                "digest": "",
+                "details": {
+                    "parent_model": "",
+                    "format": "gguf",
+                    "family": "local",
+                    "families": ["local"],
+                    "parameter_size": "unknown",
+                    "quantization_level": "unknown",
+                },
+                "expires_at": to_iso_timestamp(model["expires_at"]) if model["expires_at"] is not None else None,
+                "size_vram": 0,
+            }
+            for model in models
+        ]
+    }
+
+
+def format_ollama_show_response(model: str = "local-llm") -> dict:
+    """Format a response for Ollama /api/show endpoint."""
+    return {
+        "modelfile": f"FROM {model}",
+        "parameters": "",
+        "template": "",
+        "details": {
+            "parent_model": "",
+            "format": "gguf",
+            "family": "local",
+            "families": ["local"],
+            "parameter_size": "unknown",
+            "quantization_level": "unknown",
+        },
+    }
+
+
+def format_embeddings_response(embeddings: list, model: str, prompt_tokens: int = 0) -> dict:
+    """Format a response for OpenAI /v1/embeddings endpoint.
+
+    ``embeddings`` holds one float list (or base64 string) per input.
+    """
+    return {
+        "object": "list",
+        "data": [
+            {"object": "embedding", "index": index, "embedding": embedding}
+            for index, embedding in enumerate(embeddings)
+        ],
+        "model": model,
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "total_tokens": prompt_tokens,
+        },
+    }
+
+
+def format_ollama_embeddings_response(embedding: list) -> dict:
+    """Format a response for the legacy Ollama /api/embeddings endpoint."""
+    return {"embedding": embedding}
+
+
+def format_ollama_embed_response(
+    embeddings: list,
+    model: str = "local-llm",
+    prompt_eval_count: int = 0,
+    total_duration: int = 0,
+) -> dict:
+    """Format a response for Ollama /api/embed endpoint."""
+    return {
+        "model": model,
+        "embeddings": embeddings,
+        "total_duration": total_duration,
+        "load_duration": 0,
+        "prompt_eval_count": prompt_eval_count,
+    }
@@ -1,5 +1,7 @@
 """Pytest fixtures for Flask test client."""
 
+import json
+
 import pytest
 
 from func_to_gen import create_app
@@ -10,6 +12,18 @@ def mock_answer(prompt: str) -> str:
     return f"Response to: {prompt}"
 
 
+def mock_stream_answer(prompt: str):
+    """Mock answer function that yields its response in chunks."""
+    for word in f"Response to: {prompt}".split(" "):
+        yield word + " "
+
+
+def make_client(answer_func, **config):
+    """Create a test client with the given answer function and config."""
+    app = create_app(answer_func=answer_func, config={"TESTING": True, **config})
+    return app.test_client()
+
+
 @pytest.fixture
 def app():
     """Create application for testing."""
@@ -21,3 +35,25 @@ def app():
 def client(app):
     """Create test client."""
     return app.test_client()
+
+
+@pytest.fixture
+def stream_client():
+    """Create test client backed by a chunk-yielding answer function."""
+    app = create_app(answer_func=mock_stream_answer, config={"TESTING": True})
+    return app.test_client()
+
+
+def parse_sse(response) -> list:
+    """Parse an SSE response body into a list of data payloads."""
+    events = []
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith("data: "):
+            payload = line[len("data: "):]
+            events.append(payload if payload == "[DONE]" else json.loads(payload))
+    return events
+
+
+def parse_ndjson(response) -> list:
+    """Parse an NDJSON response body into a list of objects."""
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
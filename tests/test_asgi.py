@@ -0,0 +1,233 @@
+"""Tests for the ASGI application."""
+
+import asyncio
+import json
+
+import pytest
+
+from func_to_gen import create_app
+from func_to_gen.asgi import create_asgi_app
+from tests.conftest import mock_answer
+
+
+async def call(app, method: str, path: str, body=None, headers=()):
+    """Send one HTTP request through an ASGI app and collect the response."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Like a real server, report a disconnect only once the client leaves
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(b"content-type", b"application/json"), *headers],
+    }
+    await app(scope, receive, send)
+    start = sent[0]
+    content = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), content.decode()
+
+
+def request(app, method, path, body=None):
+    return asyncio.run(call(app, method, path, body))
+
+
+async def async_answer(prompt: str) -> str:
+    await asyncio.sleep(0)
+    return f"Async response to: {prompt}"
+
+
+async def async_stream_answer(prompt: str):
+    for word in ("Async", "stream"):
+        await asyncio.sleep(0)
+        yield word + " "
+
+
+class TestAsgi:
+    """Tests for serving the API over ASGI."""
+
+    def test_health(self):
+        """Test the health endpoint."""
+        app = create_asgi_app(answer_func=async_answer)
+        status, _, body = request(app, "GET", "/health")
+
+        assert status == 200
+        assert json.loads(body) == {"status": "ok"}
+
+    def test_coroutine_answer(self):
+        """Test chat completions with a coroutine answer function."""
+        app = create_asgi_app(answer_func=async_answer)
+        status, _, body = request(app, "POST", "/v1/chat/completions", {
+            "messages": [{"role": "user", "content": "Hi"}],
+        })
+
+        data = json.loads(body)
+        assert status == 200
+        assert data["object"] == "chat.completion"
+        assert data["choices"][0]["message"]["content"] == "Async response to: user: Hi"
+        assert data["usage"]["total_tokens"] > 0
+
+    def test_async_generator_streams_sse(self):
+        """Test SSE streaming from an async generator."""
+        app = create_asgi_app(answer_func=async_stream_answer)
+        status, headers, body = request(app, "POST", "/v1/completions", {"prompt": "Hi", "stream": True})
+
+        assert status == 200
+        assert headers[b"content-type"] == b"text/event-stream"
+        events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        assert "".join(json.loads(e)["choices"][0]["text"] for e in events[:-1]) == "Async stream "
+
+    def test_ollama_ndjson_stream(self):
+        """Test Ollama NDJSON streaming from an async generator."""
+        app = create_asgi_app(answer_func=async_stream_answer)
+        status, _, body = request(app, "POST", "/api/generate", {"prompt": "Hi"})
+
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert status == 200
+        assert [line["done"] for line in lines] == [False, False, True]
+        assert lines[-1]["eval_count"] > 0
+
+    def test_sync_functions_run_on_threads(self):
+        """Test that plain and generator sync functions still work."""
+        def sync_stream(prompt):
+            yield "sync "
+            yield "chunks"
+
+        app = create_asgi_app(models={"plain": lambda prompt: "plain", "gen": sync_stream})
+        _, _, plain = request(app, "POST", "/api/generate", {"model": "plain", "prompt": "Hi"})
+        _, _, gen = request(app, "POST", "/api/chat", {
+            "model": "gen", "messages": [{"role": "user", "content": "Hi"}], "stream": False,
+        })
+
+        assert json.loads(plain)["response"] == "plain"
+        assert json.loads(gen)["message"]["content"] == "sync chunks"
+
+    def test_errors(self):
+        """Test validation, unknown models and unknown paths."""
+        app = create_asgi_app(models={"only": async_answer})
+
+        assert request(app, "POST", "/v1/completions", {"model": "nope", "prompt": "Hi"})[0] == 404
+        assert request(app, "POST", "/api/generate", {"prompt": ""})[0] == 400
+        assert request(app, "GET", "/nowhere")[0] == 404
+        assert request(app, "GET", "/v1/completions")[0] == 405
+
+    def test_models(self):
+        """Test model listings."""
+        app = create_asgi_app(models={"a": async_answer, "b": async_answer})
+
+        assert [m["id"] for m in json.loads(request(app, "GET", "/v1/models")[2])["data"]] == ["a", "b"]
+        assert request(app, "GET", "/v1/models/b")[0] == 200
+        assert [m["name"] for m in json.loads(request(app, "GET", "/api/tags")[2])["models"]] == ["a", "b"]
+
+    def test_embeddings(self):
+        """Test embeddings run the embed function on the thread pool."""
+        app = create_asgi_app(async_answer, embed_func=lambda texts: [[float(len(t)), 0.0] for t in texts])
+
+        status, _, body = request(app, "POST", "/v1/embeddings", {"input": ["ab", "abcd"]})
+        assert status == 200
+        assert [item["embedding"] for item in json.loads(body)["data"]] == [[2.0, 0.0], [4.0, 0.0]]
+        assert json.loads(request(app, "POST", "/api/embeddings", {"prompt": "abc"})[2]) == {"embedding": [3.0, 0.0]}
+        assert request(create_asgi_app(async_answer), "POST", "/v1/embeddings", {"input": "x"})[0] == 501
+
+    def test_many_concurrent_slow_generations(self):
+        """Test that many slow coroutine answers overlap instead of queueing."""
+        async def slow(prompt):
+            await asyncio.sleep(0.2)
+            return "done"
+
+        app = create_asgi_app(answer_func=slow)
+
+        async def run_all():
+            body = {"prompt": "Hi", "stream": False}
+            return await asyncio.gather(*(call(app, "POST", "/api/generate", body) for _ in range(500)))
+
+        loop = asyncio.new_event_loop()
+        try:
+            started = loop.time()
+            results = loop.run_until_complete(run_all())
+            elapsed = loop.time() - started
+        finally:
+            loop.close()
+
+        assert all(status == 200 for status, _, _ in results)
+        assert elapsed < 2
+
+    def test_overload_returns_503(self):
+        """Test the concurrency limit and queue bound."""
+        async def slow(prompt):
+            await asyncio.sleep(0.05)
+            return "done"
+
+        app = create_asgi_app(answer_func=slow, config={"MAX_CONCURRENCY": 1, "MAX_QUEUE_DEPTH": 0})
+
+        async def run_two():
+            body = {"prompt": "Hi"}
+            return await asyncio.gather(*(call(app, "POST", "/v1/completions", body) for _ in range(2)))
+
+        statuses = sorted(status for status, _, _ in asyncio.run(run_two()))
+        assert statuses == [200, 503]
+
+    @pytest.mark.parametrize("key", ["SINGLE_FLIGHT", "METRICS", "EXECUTOR"])
+    def test_unsupported_config_raises(self, key):
+        """Test that config for features the ASGI app lacks is rejected rather than ignored."""
+        with pytest.raises(ValueError, match=key):
+            create_asgi_app(answer_func=async_answer, config={key: "process" if key == "EXECUTOR" else True})
+
+        create_asgi_app(answer_func=async_answer, config={key: False})
+
+    def test_batch_function(self):
+        """Test that answer_batch_func is served like with the Flask app."""
+        batches = []
+
+        def answer_batch(prompts):
+            batches.append(len(prompts))
+            return [f"Batched: {prompt}" for prompt in prompts]
+
+        app = create_asgi_app(answer_batch_func=answer_batch)
+        status, _, body = request(app, "POST", "/v1/completions", {"prompt": "Hi"})
+
+        assert status == 200
+        assert json.loads(body)["choices"][0]["text"] == "Batched: Hi"
+        assert batches == [1]
+
+    def test_cache_header(self):
+        """Test that cached answers are reported in the X-Cache header."""
+        app = create_asgi_app(answer_func=async_answer, config={"CACHE_MAX_ENTRIES": 8})
+        body = {"prompt": "Hi", "stream": False}
+
+        first = request(app, "POST", "/api/generate", body)
+        second = request(app, "POST", "/api/generate", body)
+
+        assert first[1][b"x-cache"] == b"MISS"
+        assert second[1][b"x-cache"] == b"HIT"
+        assert json.loads(second[2])["response"] == json.loads(first[2])["response"]
+
+    @pytest.mark.parametrize("path, body", [
+        ("/v1/chat/completions", {}),
+        ("/v1/chat/completions", {"messages": []}),
+        ("/v1/completions", {"model": "nope", "prompt": "Hi"}),
+        ("/v1/completions", {"prompt": "Hi", "timeout": -1}),
+        ("/api/generate", {"prompt": "Hi", "keep_alive": "soon"}),
+        ("/api/generate", {"prompt": "Hi", "context": "bogus"}),
+        ("/api/chat", {"model": "only"}),
+        ("/api/show", {"model": "nope"}),
+    ])
+    def test_errors_match_flask_app(self, path, body):
+        """Test that both apps reject a malformed request with the same status and body."""
+        models = {"only": mock_answer}
+        flask_response = create_app(models=models, config={"TESTING": True}).test_client().post(path, json=body)
+        status, _, content = request(create_asgi_app(models=models), "POST", path, body)
+
+        assert status == flask_response.status_code
+        assert status >= 400
+        assert json.loads(content) == flask_response.get_json()
@@ -0,0 +1,92 @@
+"""Tests for dynamic micro-batching."""
+
+import json
+import threading
+
+import pytest
+
+from func_to_gen import create_app
+from func_to_gen.batching import MicroBatcher
+
+
+class TestBatching:
+    """Tests for batch-capable answer functions."""
+
+    def test_concurrent_prompts_share_one_call(self):
+        """Test that prompts arriving together are answered in one batch."""
+        calls = []
+
+        def answer_batch(prompts):
+            calls.append(list(prompts))
+            return [f"Batch answer to: {p}" for p in prompts]
+
+        batcher = MicroBatcher(answer_batch, max_batch_size=4, max_wait_ms=200)
+        futures = [batcher.submit(f"prompt {i}") for i in range(4)]
+
+        assert [f.result(timeout=5) for f in futures] == [f"Batch answer to: prompt {i}" for i in range(4)]
+        assert len(calls) == 1
+
+    def test_batch_size_limit(self):
+        """Test that batches never exceed the configured size."""
+        calls = []
+
+        def answer_batch(prompts):
+            calls.append(len(prompts))
+            return list(prompts)
+
+        batcher = MicroBatcher(answer_batch, max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit(str(i)) for i in range(5)]
+
+        assert [f.result(timeout=5) for f in futures] == [str(i) for i in range(5)]
+        assert max(calls) <= 2
+
+    def test_batch_errors_reach_every_caller(self):
+        """Test that a failing batch call fails all of its requests."""
+        def answer_batch(prompts):
+            raise ValueError("boom")
+
+        batcher = MicroBatcher(answer_batch, max_wait_ms=50)
+        futures = [batcher.submit("a"), batcher.submit("b")]
+
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+
+    def test_wrong_result_count(self):
+        """Test that a batch returning the wrong number of answers is an error."""
+        batcher = MicroBatcher(lambda prompts: ["only one"], max_wait_ms=50)
+        futures = [batcher.submit("a"), batcher.submit("b")]
+
+        with pytest.raises(RuntimeError):
+            futures[0].result(timeout=5)
+
+    def test_routes_use_batch_function(self):
+        """Test that concurrent requests from different routes are batched."""
+        calls = []
+
+        def answer_batch(prompts):
+            calls.append(len(prompts))
+            return [f"Batch answer to: {p}" for p in prompts]
+
+        app = create_app(
+            answer_batch_func=answer_batch,
+            config={"TESTING": True, "BATCH_MAX_SIZE": 2, "BATCH_MAX_WAIT_MS": 500},
+        )
+        client = app.test_client()
+        results = {}
+
+        def post(path, body):
+            results[path] = client.post(path, data=json.dumps(body), content_type="application/json")
+
+        threads = [
+            threading.Thread(target=post, args=("/v1/completions", {"prompt": "Hello"})),
+            threading.Thread(target=post, args=("/api/generate", {"prompt": "Hi", "stream": False})),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results["/v1/completions"].get_json()["choices"][0]["text"] == "Batch answer to: Hello"
+        assert results["/api/generate"].get_json()["response"] == "Batch answer to: Hi"
+        assert calls == [2]
@@ -0,0 +1,70 @@
+"""Tests for the benchmark suite."""
+
+import json
+
+from func_to_gen.bench import (
+    fixed_latency_answer,
+    main,
+    measure_startup,
+    percentile,
+    run_benchmark,
+    streaming_answer,
+)
+
+
+class TestBench:
+    """Tests for the load-testing benchmark."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99) == 99
+        assert percentile([7], 99) == 7
+        assert percentile([], 50) == 0.0
+
+    def test_run_benchmark_report(self):
+        """Test that every endpoint is driven and reported."""
+        report = run_benchmark(fixed_latency_answer(1), concurrency=2, requests=6)
+
+        assert set(report["endpoints"]) == {"/v1/chat/completions", "/v1/completions", "/api/generate", "/api/chat"}
+        for result in report["endpoints"].values():
+            assert result["succeeded"] == 6
+            assert result["errors"] == {}
+            assert result["throughput_rps"] > 0
+            assert result["latency_ms"]["p99"] >= result["latency_ms"]["p50"] >= 1
+
+    def test_streaming_time_to_first_chunk(self):
+        """Test that streamed responses report an earlier first chunk."""
+        report = run_benchmark(
+            streaming_answer(chunks=5, chunk_delay_ms=10),
+            endpoints=["/api/generate"],
+            concurrency=1,
+            requests=2,
+            stream=True,
+        )
+
+        result = report["endpoints"]["/api/generate"]
+        assert result["time_to_first_chunk_ms"]["p50"] < result["latency_ms"]["p50"]
+
+    def test_cli_writes_json(self, tmp_path):
+        """Test the command line entry point."""
+        output = tmp_path / "bench.json"
+        code = main([
+            "--endpoint", "/v1/completions", "--requests", "3", "--concurrency", "1",
+            "--config", "MAX_CONCURRENCY=2", "--output", str(output),
+        ])
+
+        report = json.loads(output.read_text())
+        assert code == 0
+        assert report["config"] == {"MAX_CONCURRENCY": 2}
+        assert report["endpoints"]["/v1/completions"]["succeeded"] == 3
+
+    def test_measure_startup(self):
+        """Test that cold starts are timed up to the first answer."""
+        report = measure_startup(runs=1)
+
+        assert report["runs"] == 1
+        assert 0 < report["listening_ms"]["p50"] <= report["ready_ms"]["p50"]
+        assert report["ready_ms"]["p50"] <= report["first_response_ms"]["p50"]
@@ -0,0 +1,126 @@
+"""Tests for the exact-match response cache."""
+
+import json
+import time
+
+from func_to_gen.cache import ResponseCache, make_cache_key
+from tests.conftest import make_client, parse_sse
+
+
+class CountingAnswer:
+    """Answer function that records how often it is called."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        return f"Response to: {prompt}"
+
+
+class TestResponseCache:
+    """Tests for the response cache."""
+
+    def test_repeated_request_is_served_from_cache(self):
+        """Test that identical requests call the answer function once."""
+        answer = CountingAnswer()
+        client = make_client(answer, CACHE_MAX_ENTRIES=8)
+        body = json.dumps({"messages": [{"role": "user", "content": "Hello"}]})
+
+        first = client.post("/v1/chat/completions", data=body, content_type="application/json")
+        second = client.post("/v1/chat/completions", data=body, content_type="application/json")
+
+        assert answer.calls == 1
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT"
+        assert first.get_json()["choices"] == second.get_json()["choices"]
+        assert first.get_json()["id"] != second.get_json()["id"]
+
+    def test_cache_shared_across_routes(self):
+        """Test that the same rendered prompt hits the cache from another route."""
+        answer = CountingAnswer()
+        client = make_client(answer, CACHE_MAX_ENTRIES=8)
+
+        client.post("/v1/completions", data=json.dumps({"prompt": "user: Hi"}), content_type="application/json")
+        response = client.post(
+            "/api/chat",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hi"}]}),
+            content_type="application/json",
+        )
+
+        assert answer.calls == 1
+        assert response.get_json()["message"]["content"] == "Response to: user: Hi"
+
+    def test_parameters_are_part_of_the_key(self):
+        """Test that different generation parameters miss the cache."""
+        answer = CountingAnswer()
+        client = make_client(answer, CACHE_MAX_ENTRIES=8)
+
+        for temperature in (0.1, 0.9):
+            client.post(
+                "/v1/completions",
+                data=json.dumps({"prompt": "Hello", "temperature": temperature}),
+                content_type="application/json",
+            )
+
+        assert answer.calls == 2
+
+    def test_bypass(self):
+        """Test per-request cache bypass via body field and header."""
+        answer = CountingAnswer()
+        client = make_client(answer, CACHE_MAX_ENTRIES=8)
+        body = {"prompt": "Hello"}
+
+        client.post("/v1/completions", data=json.dumps(body), content_type="application/json")
+        client.post("/v1/completions", data=json.dumps({**body, "cache": False}), content_type="application/json")
+        client.post(
+            "/v1/completions",
+            data=json.dumps(body),
+            content_type="application/json",
+            headers={"Cache-Control": "no-cache"},
+        )
+
+        assert answer.calls == 3
+
+    def test_streamed_answers_are_cached(self):
+        """Test that a completed stream is stored and replayed."""
+        client = make_client(lambda prompt: iter(["Hel", "lo"]), CACHE_MAX_ENTRIES=8)
+        body = json.dumps({"prompt": "Hello", "stream": True})
+
+        client.post("/v1/completions", data=body, content_type="application/json").get_data()
+        response = client.post("/v1/completions", data=body, content_type="application/json")
+
+        assert response.headers["X-Cache"] == "HIT"
+        assert "".join(e["choices"][0]["text"] for e in parse_sse(response)[:-1]) == "Hello"
+
+    def test_lru_eviction_and_stats(self):
+        """Test LRU eviction and hit/miss counters."""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+        assert len(cache) == 2
+
+    def test_ttl_and_memory_budget(self):
+        """Test expiry by TTL and eviction by memory budget."""
+        cache = ResponseCache(max_entries=10, ttl=0.01)
+        cache.set("a", "1")
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+        cache = ResponseCache(max_entries=10, max_bytes=400)
+        cache.set("a", "x" * 150)
+        cache.set("b", "x" * 150)
+        assert cache.get("a") is None
+        assert cache.size_bytes <= 400
+
+    def test_key_ignores_transport_fields(self):
+        """Test that stream and cache flags do not change the key."""
+        assert make_cache_key("m", "p", {"stream": True}) == make_cache_key("m", "p", {"cache": True})
+        assert make_cache_key("m", "p") != make_cache_key("other", "p")
@@ -0,0 +1,219 @@
+"""Tests for cancelling answers when the client disconnects."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from func_to_gen.app import create_app
+from func_to_gen.asgi import create_asgi_app
+from func_to_gen.bench import BenchServer
+from func_to_gen.cancellation import CancelToken, ClientDisconnected, answer_kwargs
+from func_to_gen.executor import AnswerExecutor
+
+
+def send_and_hang_up(server, path: str, body: dict, read_first: bool = False, delay: float = 0.0):
+    """POST a request over a raw socket and close it after the first bytes or a delay."""
+    payload = json.dumps(body).encode()
+    sock = socket.create_connection((server.host, server.port))
+    sock.sendall(
+        f"POST {path} HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    if read_first:
+        sock.recv(1)
+    time.sleep(delay)
+    sock.close()
+
+
+class TestCancelToken:
+    """Tests for CancelToken and keyword opt-in."""
+
+    def test_callbacks_run_once(self):
+        """Callbacks run on cancel, and immediately when added afterwards."""
+        calls = []
+        token = CancelToken()
+        token.add_callback(lambda: calls.append("early"))
+        token.cancel()
+        token.cancel()
+        token.add_callback(lambda: calls.append("late"))
+
+        assert token.cancelled
+        assert calls == ["early", "late"]
+
+    def test_probe(self):
+        """A probe reporting a disconnect cancels the token."""
+        gone = []
+        token = CancelToken(probe=lambda: bool(gone))
+
+        assert not token.cancelled
+        gone.append(True)
+        assert token.cancelled
+
+    def test_answer_kwargs(self):
+        """Only explicitly declared parameters opt in."""
+        def opted_in(prompt, cancel=None):
+            pass
+
+        def forwards(prompt, **options):
+            pass
+
+        assert answer_kwargs(opted_in, cancel="token") == {"cancel": "token"}
+        assert answer_kwargs(forwards, cancel="token") == {}
+        assert answer_kwargs(opted_in, cancel=None) == {}
+
+
+class TestExecutorCancellation:
+    """Tests for cancellation in the worker pool."""
+
+    def test_queued_answer_is_dropped(self):
+        """An answer whose client left while queued never runs."""
+        executor = AnswerExecutor(max_workers=1, max_queue=4)
+        release = threading.Event()
+        ran = []
+        blocker = threading.Thread(target=executor.run, args=(lambda p: release.wait(5) and "done", "x"))
+        blocker.start()
+        time.sleep(0.05)
+
+        token = CancelToken()
+        threading.Timer(0.05, token.cancel).start()
+        with pytest.raises(ClientDisconnected):
+            executor.run(lambda p: ran.append(p) or "answer", "queued", cancel=token)
+        release.set()
+        blocker.join()
+        executor.shutdown()
+
+        assert ran == []
+        assert executor.pending == 0
+
+    def test_stream_stops_when_cancelled(self):
+        """A streaming worker stops pulling chunks and closes the generator."""
+        executor = AnswerExecutor(max_workers=1)
+        closed = threading.Event()
+        token = CancelToken()
+
+        def answer(prompt):
+            try:
+                while True:
+                    yield "chunk"
+                    time.sleep(0.01)
+            finally:
+                closed.set()
+
+        chunks = executor.run(answer, "x", cancel=token)
+        next(chunks)
+        token.cancel()
+
+        assert closed.wait(2)
+        with pytest.raises(ClientDisconnected):
+            list(chunks)
+        executor.shutdown()
+
+
+class TestServerDisconnect:
+    """Tests for disconnect detection on a real HTTP server."""
+
+    @pytest.mark.parametrize("config", [{}, {"MAX_CONCURRENCY": 2}])
+    def test_stream_disconnect_closes_answer(self, config):
+        """Closing a streamed response stops the answer generator."""
+        cancelled = threading.Event()
+        closed = threading.Event()
+
+        def answer(prompt, cancel=None):
+            cancel.add_callback(cancelled.set)
+            try:
+                for _ in range(1000):
+                    yield "token "
+                    time.sleep(0.005)
+            finally:
+                closed.set()
+
+        app = create_app(answer, config={"TESTING": True, **config})
+        with BenchServer(app) as server:
+            send_and_hang_up(server, "/api/generate", {"prompt": "Hi", "stream": True}, read_first=True)
+            assert closed.wait(5)
+            assert cancelled.wait(5)
+
+    @pytest.mark.parametrize("config", [{}, {"MAX_CONCURRENCY": 2}])
+    def test_non_streamed_disconnect_is_detected(self, config):
+        """An answer polling its token sees the client leave before any response."""
+        noticed = threading.Event()
+
+        def answer(prompt, cancel=None):
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if cancel.cancelled:
+                    noticed.set()
+                    return "abandoned"
+                time.sleep(0.01)
+            return "finished"
+
+        app = create_app(answer, config={"TESTING": True, **config})
+        with BenchServer(app) as server:
+            send_and_hang_up(server, "/v1/completions", {"prompt": "Hi"}, delay=0.2)
+            assert noticed.wait(5)
+
+    @pytest.mark.parametrize("config", [{}, {"MAX_CONCURRENCY": 2}])
+    def test_disconnect_runs_callbacks_of_blocking_answer(self, config):
+        """A blocking answer's cancel callback fires when the client leaves."""
+        aborted = threading.Event()
+
+        def answer(prompt, cancel=None):
+            cancel.add_callback(aborted.set)
+            aborted.wait(5)
+            return "abandoned"
+
+        app = create_app(answer, config={"TESTING": True, **config})
+        with BenchServer(app) as server:
+            started = time.monotonic()
+            send_and_hang_up(server, "/v1/completions", {"prompt": "Hi"}, delay=0.2)
+            assert aborted.wait(5)
+            assert time.monotonic() - started < 2
+
+    def test_answers_without_cancel_parameter_still_work(self, client):
+        """Answer functions that do not opt in are called as before."""
+        response = client.post("/v1/completions", json={"prompt": "Hi"})
+
+        assert response.status_code == 200
+
+
+class TestAsgiDisconnect:
+    """Tests for disconnect handling in the ASGI app."""
+
+    def test_disconnect_cancels_coroutine_answer(self):
+        """http.disconnect cancels a pending coroutine answer and sends nothing."""
+        cancelled = []
+
+        async def answer(prompt):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+            return "late"
+
+        app = create_asgi_app(answer)
+
+        async def run():
+            messages = [{"type": "http.request", "body": json.dumps({"prompt": "Hi"}).encode()}]
+            sent = []
+
+            async def receive():
+                if messages:
+                    return messages.pop(0)
+                await asyncio.sleep(0.05)
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "POST", "path": "/v1/completions", "headers": []}
+            await asyncio.wait_for(app(scope, receive, send), 5)
+            return sent
+
+        assert asyncio.run(run()) == []
+        assert cancelled == ["Hi"]
+        assert app.pending == 0
@@ -2,6 +2,8 @@
 
 import json
 
+from tests.conftest import parse_sse
+
 
 class TestChatCompletions:
     """Tests for the chat completions endpoint."""
@@ -141,3 +143,55 @@ class TestChatCompletions:
         )
 
         assert response.status_code == 400
+
+    def test_chat_completion_stream(self, stream_client):
+        """Test SSE streaming of chat completion chunks."""
+        response = stream_client.post(
+            "/v1/chat/completions",
+            data=json.dumps({
+                "messages": [{"role": "user", "content": "Hello"}],
+                "stream": True,
+            }),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = parse_sse(response)
+
+        assert events[-1] == "[DONE]"
+        chunks = events[:-1]
+        assert all(c["object"] == "chat.completion.chunk" for c in chunks)
+        assert len({c["id"] for c in chunks}) == 1
+        assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+        assert "Hello" in content
+
+    def test_chat_completion_stream_from_string_answer(self, client):
+        """Test that plain string answers can still be streamed."""
+        response = client.post(
+            "/v1/chat/completions",
+            data=json.dumps({
+                "messages": [{"role": "user", "content": "Hello"}],
+                "stream": True,
+            }),
+            content_type="application/json",
+        )
+
+        events = parse_sse(response)
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in events[:-1])
+        assert content == "Response to: user: Hello"
+
+    def test_chat_completion_iterator_answer_without_stream(self, stream_client):
+        """Test that chunked answers are joined when streaming is off."""
+        response = stream_client.post(
+            "/v1/chat/completions",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hello"}]}),
+            content_type="application/json",
+        )
+
+        data = response.get_json()
+        assert data["object"] == "chat.completion"
+        assert data["choices"][0]["message"]["content"].strip() == "Response to: user: Hello"
@@ -2,6 +2,8 @@
 
 import json
 
+from tests.conftest import parse_sse
+
 
 class TestCompletions:
     """Tests for the legacy completions endpoint."""
@@ -110,3 +112,21 @@ class TestCompletions:
         )
 
         assert response.status_code == 400
+
+    def test_completion_stream(self, stream_client):
+        """Test SSE streaming of legacy completion chunks."""
+        response = stream_client.post(
+            "/v1/completions",
+            data=json.dumps({"prompt": "Hello world", "stream": True}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        events = parse_sse(response)
+
+        assert events[-1] == "[DONE]"
+        chunks = events[:-1]
+        assert all(c["object"] == "text_completion" for c in chunks)
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+        assert "".join(c["choices"][0]["text"] for c in chunks).strip() == "Response to: Hello world"
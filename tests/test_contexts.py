@@ -0,0 +1,169 @@
+"""Tests for Ollama context continuation."""
+
+import json
+
+import pytest
+
+from func_to_gen.asgi import create_asgi_app
+from func_to_gen import create_app
+from func_to_gen.contexts import (
+    DEFAULT_MAX_BYTES,
+    ContextStore,
+    GenerationContext,
+    InvalidContextError,
+    create_context_store,
+)
+from tests.conftest import make_client, mock_answer, mock_stream_answer, parse_ndjson
+from tests.test_asgi import request as asgi_request
+
+
+def generate(client, prompt, context=None, stream=False):
+    body = {"prompt": prompt, "stream": stream}
+    if context is not None:
+        body["context"] = context
+    return client.post("/api/generate", data=json.dumps(body), content_type="application/json")
+
+
+class SessionAnswer:
+    """Answer function keeping a per-conversation turn count as backend state."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompt, context=None):
+        self.calls.append((prompt, context.history))
+        context.state = (context.state or 0) + 1
+        return f"turn {context.state}"
+
+
+class TestContextStore:
+    """Tests for the bounded context store."""
+
+    def test_save_and_resume(self):
+        """Test that a saved turn resumes as a copy with its history and state."""
+        store = ContextStore()
+        context = store.resume(None, "m")
+        context.state = "kv-1"
+        handle = store.new_handle()
+        store.save(handle, "m", context, "Hi", "Hello")
+
+        resumed = store.resume([handle], "m")
+        resumed.state = "kv-2"
+        assert resumed.history == "user: Hi\nassistant: Hello"
+        assert store.resume([handle], "m").state == "kv-1"
+
+    def test_handles_belong_to_their_model(self):
+        """Test that a handle sent with another model starts a new conversation."""
+        store = ContextStore()
+        handle = store.new_handle()
+        store.save(handle, "m", GenerationContext(state="kv"), "Hi", "Hello")
+
+        other = store.resume([handle], "other")
+        assert (other.history, other.state) == ("", None)
+
+    def test_bounded(self):
+        """Test that the least recently used contexts are evicted."""
+        store = ContextStore(max_entries=2)
+        handles = [store.new_handle() for _ in range(3)]
+        for handle in handles:
+            store.save(handle, "m", GenerationContext(), "a", "b")
+
+        assert len(store) == 2
+        assert store.resume([handles[0]], "m").history == ""
+        assert store.resume([handles[1]], "m").history == "user: a\nassistant: b"
+        assert 0 < handles[2] < 2 ** 53
+
+    def test_byte_budget_by_default(self):
+        """Test that stored histories have a finite budget unless configured otherwise."""
+        assert ContextStore().max_bytes == DEFAULT_MAX_BYTES
+        assert create_context_store({}).max_bytes == DEFAULT_MAX_BYTES
+        assert create_context_store({"CONTEXT_MAX_BYTES": 1024}).max_bytes == 1024
+
+    def test_foreign_and_invalid_context(self):
+        """Test that token lists from another server start anew and other values are rejected."""
+        assert ContextStore().resume([1, 2, 3], "m").history == ""
+        with pytest.raises(InvalidContextError):
+            ContextStore().resume("abc", "m")
+
+
+class TestOllamaContext:
+    """Tests for /api/generate context handles."""
+
+    def test_plain_answer_gets_history(self):
+        """Test that an answer function without a context parameter sees the conversation turn by turn."""
+        client = make_client(mock_answer)
+        first = generate(client, "Hi").get_json()
+        second = generate(client, "More", first["context"]).get_json()
+
+        assert len(first["context"]) == 1
+        assert second["response"] == "Response to: user: Hi\nassistant: Response to: Hi\nuser: More"
+        assert second["context"] != first["context"]
+
+    def test_context_parameter_gets_only_new_text(self):
+        """Test that a context-aware answer function gets prior state and only the new prompt."""
+        answer = SessionAnswer()
+        client = make_client(answer)
+        first = generate(client, "Hi").get_json()
+        second = generate(client, "Again", first["context"]).get_json()
+        branch = generate(client, "Other", first["context"]).get_json()
+
+        assert [first["response"], second["response"], branch["response"]] == ["turn 1", "turn 2", "turn 2"]
+        assert answer.calls == [("Hi", ""), ("Again", "user: Hi\nassistant: turn 1"), ("Other", "user: Hi\nassistant: turn 1")]
+
+    def test_streamed_context(self):
+        """Test that the final streamed line carries the context handle."""
+        client = make_client(mock_stream_answer)
+        lines = parse_ndjson(generate(client, "Hi", stream=True))
+        follow_up = generate(client, "!", lines[-1]["context"]).get_json()
+
+        assert lines[-1]["done"] is True
+        assert follow_up["response"] == "Response to: user: Hi\nassistant: Response to: Hi \nuser: ! "
+
+    def test_unknown_context(self):
+        """Test that a handle unknown to this process, e.g. from another worker, starts a new conversation."""
+        response = generate(make_client(mock_answer), "Hi", [12345])
+
+        assert response.status_code == 200
+        assert response.get_json()["response"] == "Response to: Hi"
+        assert len(response.get_json()["context"]) == 1
+
+    def test_invalid_context(self):
+        """Test that a context that is not a list of integers is a client error."""
+        response = generate(make_client(mock_answer), "Hi", "abc")
+        assert response.status_code == 400
+        assert "context" in response.get_json()["error"]
+
+    def test_context_of_another_model(self):
+        """Test that a handle is not continued by another model."""
+        app = create_app(
+            models={"a": lambda prompt: f"a: {prompt}", "b": lambda prompt: f"b: {prompt}"}, config={"TESTING": True},
+        )
+        client = app.test_client()
+        first = client.post("/api/generate", json={"model": "a", "prompt": "Hi", "stream": False}).get_json()
+        second = client.post(
+            "/api/generate", json={"model": "b", "prompt": "More", "stream": False, "context": first["context"]},
+        ).get_json()
+
+        assert second["response"] == "b: More"
+
+    def test_contexts_disabled(self):
+        """Test that CONTEXT_MAX_ENTRIES=0 keeps answering an empty context."""
+        client = make_client(mock_answer, CONTEXT_MAX_ENTRIES=0)
+        first = generate(client, "Hi").get_json()
+        second = generate(client, "Hi", [1]).get_json()
+
+        assert first["context"] == []
+        assert second["response"] == "Response to: Hi"
+
+    def test_asgi_context(self):
+        """Test context continuation in the ASGI app."""
+        answer = SessionAnswer()
+        app = create_asgi_app(answer_func=answer)
+        _, _, body = asgi_request(app, "POST", "/api/generate", {"prompt": "Hi", "stream": False})
+        first = json.loads(body)
+        _, _, body = asgi_request(
+            app, "POST", "/api/generate", {"prompt": "Again", "stream": False, "context": first["context"]},
+        )
+
+        assert json.loads(body)["response"] == "turn 2"
+        assert answer.calls[-1] == ("Again", "user: Hi\nassistant: turn 1")
@@ -0,0 +1,242 @@
+"""Tests for per-request deadlines and timeouts."""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from func_to_gen.asgi import create_asgi_app
+from func_to_gen.deadlines import Deadline, InvalidTimeoutError, RequestTimeout, parse_timeout, request_deadline
+from func_to_gen.executor import AnswerExecutor
+from func_to_gen.routes import get_executor
+from tests.conftest import make_client, parse_ndjson, parse_sse
+from tests.test_asgi import call
+
+
+def hanging_answer(release: threading.Event):
+    """Answer function that blocks until ``release`` is set."""
+    def answer(prompt: str) -> str:
+        release.wait(5)
+        return "late"
+    return answer
+
+
+def stalled_stream(release: threading.Event, first_chunk: bool):
+    """Streaming answer that stalls (optionally after one chunk) until ``release`` is set."""
+    def answer(prompt: str):
+        if first_chunk:
+            yield "token "
+        release.wait(5)
+        yield "late"
+    return answer
+
+
+def slow_stream(prompt: str):
+    for _ in range(50):
+        time.sleep(0.02)
+        yield "token "
+
+
+class TestDeadline:
+    """Tests for parsing timeouts."""
+
+    def test_parse_timeout(self):
+        """Timeouts are positive seconds given as numbers or strings."""
+        assert parse_timeout(None) is None
+        assert parse_timeout("2.5") == 2.5
+        assert parse_timeout(3) == 3.0
+        for value in ("soon", 0, -1, True):
+            with pytest.raises(InvalidTimeoutError):
+                parse_timeout(value)
+
+    def test_request_deadline_precedence(self):
+        """The body field wins over the header, which wins over the default."""
+        assert request_deadline({"timeout": 1}, {"X-Request-Timeout": "2"}, 3).timeout == 1
+        assert request_deadline({}, {"X-Request-Timeout": "2"}, 3).timeout == 2
+        assert request_deadline({}, {}, 3).timeout == 3
+        assert request_deadline({}, {}, None) is None
+
+    def test_remaining(self):
+        """remaining() counts down to zero."""
+        deadline = Deadline(0.01)
+        assert 0 < deadline.remaining() <= 0.01
+        time.sleep(0.02)
+        assert deadline.remaining() == 0
+        assert deadline.expired
+
+
+class TestExecutorDeadlines:
+    """Tests for deadlines in the worker pool."""
+
+    def test_expired_queued_answer_is_dropped(self):
+        """An answer whose deadline passed while queued never runs."""
+        executor = AnswerExecutor(max_workers=1, max_queue=4)
+        release = threading.Event()
+        ran = []
+        blocker = threading.Thread(target=executor.run, args=(hanging_answer(release), "x"))
+        blocker.start()
+        time.sleep(0.05)
+
+        with pytest.raises(RequestTimeout):
+            executor.run(lambda p: ran.append(p) or "answer", "queued", deadline=Deadline(0.05))
+        release.set()
+        blocker.join()
+        executor.shutdown()
+
+        assert ran == []
+        assert executor.pending == 0
+
+
+class TestRouteTimeouts:
+    """Tests for timeouts on the generation routes."""
+
+    def test_openai_timeout(self):
+        """A hung answer returns 504 in the OpenAI error shape."""
+        release = threading.Event()
+        client = make_client(hanging_answer(release), MAX_CONCURRENCY=1, REQUEST_TIMEOUT=0.1)
+
+        started = time.monotonic()
+        response = client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "Hi"}]})
+        release.set()
+
+        assert time.monotonic() - started < 2
+        assert response.status_code == 504
+        assert response.get_json()["error"]["type"] == "timeout_error"
+        assert "timed out" in response.get_json()["error"]["message"]
+
+    def test_ollama_timeout_from_body(self):
+        """A per-request timeout field returns 504 in the Ollama error shape."""
+        release = threading.Event()
+        client = make_client(hanging_answer(release), MAX_CONCURRENCY=1)
+
+        response = client.post("/api/generate", json={"prompt": "Hi", "timeout": 0.1})
+        release.set()
+
+        assert response.status_code == 504
+        assert response.get_json() == {"error": "Request timed out after 0.1s"}
+
+    def test_timeout_header(self):
+        """The X-Request-Timeout header sets the deadline."""
+        release = threading.Event()
+        client = make_client(hanging_answer(release), MAX_CONCURRENCY=1)
+
+        response = client.post("/v1/completions", json={"prompt": "Hi"}, headers={"X-Request-Timeout": "0.1"})
+        release.set()
+
+        assert response.status_code == 504
+
+    def test_timeout_without_executor(self):
+        """Without a worker pool, a hung answer still returns 504 at its deadline."""
+        release = threading.Event()
+        client = make_client(hanging_answer(release))
+
+        started = time.monotonic()
+        response = client.post("/api/generate", json={"prompt": "Hi", "timeout": 0.1})
+        release.set()
+
+        assert time.monotonic() - started < 2
+        assert response.status_code == 504
+        assert response.get_json() == {"error": "Request timed out after 0.1s"}
+
+    def test_invalid_timeout(self, client):
+        """A malformed timeout returns 400."""
+        response = client.post("/api/generate", json={"prompt": "Hi", "timeout": "soon"})
+
+        assert response.status_code == 400
+        assert "Invalid timeout" in response.get_json()["error"]
+
+    def test_cooperative_answer_frees_its_worker(self):
+        """A timed-out answer polling its cancel token gives its worker back."""
+        def answer(prompt, cancel=None):
+            cancel.wait(5)
+            return "stopped"
+
+        client = make_client(answer, MAX_CONCURRENCY=1, REQUEST_TIMEOUT=0.1)
+        assert client.post("/v1/completions", json={"prompt": "Hi"}).status_code == 504
+
+        executor = get_executor()
+        deadline = time.monotonic() + 2
+        while executor.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert executor.pending == 0
+
+    def test_deadline_is_passed_to_answer(self):
+        """Answer functions declaring a deadline parameter receive it."""
+        def answer(prompt, deadline=None):
+            return f"{deadline.timeout:g} {deadline.remaining() > 0}"
+
+        client = make_client(answer, REQUEST_TIMEOUT=30)
+        response = client.post("/v1/completions", json={"prompt": "Hi"})
+
+        assert response.get_json()["choices"][0]["text"] == "30 True"
+
+    def test_streams_end_with_error_event(self):
+        """A stream past its deadline ends with an error in the stream format."""
+        client = make_client(slow_stream)
+
+        sse = parse_sse(client.post("/v1/completions", json={"prompt": "Hi", "stream": True, "timeout": 0.1}))
+        ndjson = parse_ndjson(client.post("/api/generate", json={"prompt": "Hi", "stream": True, "timeout": 0.1}))
+
+        assert sse[-1]["error"]["type"] == "timeout_error"
+        assert ndjson[-1] == {"error": "Request timed out after 0.1s"}
+
+    def test_stalled_stream_times_out_without_executor(self):
+        """A stream stalling before or between chunks ends at its deadline without a worker pool."""
+        for first_chunk in (False, True):
+            release = threading.Event()
+            client = make_client(stalled_stream(release, first_chunk))
+
+            started = time.monotonic()
+            lines = parse_ndjson(client.post("/api/generate", json={"prompt": "Hi", "stream": True, "timeout": 0.2}))
+            elapsed = time.monotonic() - started
+            release.set()
+
+            assert elapsed < 2
+            assert lines[-1] == {"error": "Request timed out after 0.2s"}
+
+
+class TestAsgiTimeouts:
+    """Tests for timeouts in the ASGI app."""
+
+    def test_coroutine_answer_times_out(self):
+        """A slow coroutine answer is cancelled with a 504."""
+        async def answer(prompt):
+            await asyncio.sleep(5)
+            return "late"
+
+        app = create_asgi_app(answer, config={"REQUEST_TIMEOUT": 0.1})
+        status, _, body = asyncio.run(call(app, "POST", "/api/generate", {"prompt": "Hi"}))
+
+        assert status == 504
+        assert "timed out" in body
+        assert app.pending == 0
+
+    def test_header_is_case_insensitive(self):
+        """The timeout header is found whatever its case."""
+        async def answer(prompt):
+            await asyncio.sleep(5)
+            return "late"
+
+        app = create_asgi_app(answer)
+        headers = [(b"x-request-timeout", b"0.1")]
+        status, _, _ = asyncio.run(call(app, "POST", "/v1/completions", {"prompt": "Hi"}, headers))
+
+        assert status == 504
+
+    def test_stalled_stream_times_out(self):
+        """A stream stalling between chunks ends at its deadline."""
+        async def answer(prompt):
+            yield "token "
+            await asyncio.sleep(5)
+            yield "late"
+
+        app = create_asgi_app(answer)
+        started = time.monotonic()
+        status, _, body = asyncio.run(
+            call(app, "POST", "/api/generate", {"prompt": "Hi", "stream": True, "timeout": 0.2}),
+        )
+
+        assert time.monotonic() - started < 2
+        assert json.loads(body.splitlines()[-1]) == {"error": "Request timed out after 0.2s"}
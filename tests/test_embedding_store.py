@@ -0,0 +1,113 @@
+"""Tests for the on-disk embedding cache."""
+
+import pytest
+
+from func_to_gen.app import create_app
+from func_to_gen.embedding_store import EmbeddingStore, create_embedding_store
+from func_to_gen.embeddings import EmbeddingService
+from tests.conftest import mock_answer
+
+# NumPy comes with the embeddings extra
+np = pytest.importorskip("numpy")
+
+
+def counting_embed(calls):
+    """Embed each text as [len, 1] and record the texts passed in."""
+    def embed(texts):
+        calls.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+    return embed
+
+
+class TestEmbeddingStore:
+    """Tests for EmbeddingStore."""
+
+    def test_roundtrip_and_stats(self, tmp_path):
+        """Stored vectors are returned for known texts and counted as hits."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put_many("m", ["a", "bb"], np.array([[1, 2], [3, 4]]))
+
+        positions, vectors = store.get_many("m", ["bb", "new", "a"])
+
+        assert positions == [0, 2]
+        assert vectors.tolist() == [[3, 4], [1, 2]]
+        assert store.stats() == {"hits": 2, "misses": 1, "hit_ratio": 2 / 3, "entries": 2, "bytes": 16}
+
+    def test_keys_are_namespaced_by_model(self, tmp_path):
+        """The same text embedded by another model is a miss."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put_many("m", ["a"], np.array([[1, 2]]))
+
+        assert store.get_many("other", ["a"]) == ([], None)
+
+    def test_survives_restart_and_shares_read_only(self, tmp_path):
+        """A new store on the same directory sees vectors written by another."""
+        writer = EmbeddingStore(str(tmp_path))
+        reader = EmbeddingStore(str(tmp_path), readonly=True)
+        writer.put_many("m", ["a"], np.array([[1, 2]]))
+
+        assert reader.get_many("m", ["a"])[1].tolist() == [[1, 2]]
+
+        writer.put_many("m", ["b"], np.array([[5, 6]]))
+        assert reader.get_many("m", ["b"])[1].tolist() == [[5, 6]]
+
+        reader.put_many("m", ["c"], np.array([[7, 8]]))
+        assert EmbeddingStore(str(tmp_path)).get_many("m", ["c"]) == ([], None)
+
+    def test_compacts_to_newest_entries(self, tmp_path):
+        """Exceeding max_entries keeps the newest entries in a new generation."""
+        store = EmbeddingStore(str(tmp_path), max_entries=4)
+        reader = EmbeddingStore(str(tmp_path), readonly=True)
+        for i in range(5):
+            store.put_many("m", [str(i)], np.array([[i, i]]))
+
+        assert len(store) == 3
+        assert store.get_many("m", ["0", "1", "2", "3", "4"])[0] == [2, 3, 4]
+        assert reader.get_many("m", ["4"])[1].tolist() == [[4, 4]]
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["index-1.bin", "lock", "meta.json", "vectors-1.f32"]
+
+    def test_max_bytes(self, tmp_path):
+        """max_bytes caps the vector file size."""
+        store = EmbeddingStore(str(tmp_path), max_bytes=32)
+        store.put_many("m", ["a", "b", "c", "d", "e"], np.ones((5, 2)))
+
+        assert store.size_bytes <= 32
+
+    def test_rejects_other_dimensions(self, tmp_path):
+        """Vectors of a different width than stored ones raise."""
+        store = EmbeddingStore(str(tmp_path))
+        store.put_many("m", ["a"], np.ones((1, 2)))
+
+        with pytest.raises(ValueError, match="2-dimensional"):
+            store.put_many("m", ["b"], np.ones((1, 3)))
+
+    def test_disabled_by_default(self):
+        """No store is created without EMBED_CACHE_DIR."""
+        assert create_embedding_store({}) is None
+
+
+class TestCachedEmbeddings:
+    """Tests for embedding requests served from the cache."""
+
+    def test_only_new_texts_are_embedded(self, tmp_path):
+        """Repeated texts skip the embed function and keep their order."""
+        calls = []
+        service = EmbeddingService(counting_embed(calls), store=EmbeddingStore(str(tmp_path)))
+
+        service.embed(["a", "bbb"], "m")
+        vectors = service.embed(["cc", "bbb", "a"], "m")
+
+        assert calls == ["a", "bbb", "cc"]
+        assert vectors.tolist() == [[2, 1], [3, 1], [1, 1]]
+
+    def test_route_uses_cache_across_restarts(self, tmp_path):
+        """A restarted app serves previously embedded texts from disk."""
+        calls = []
+        config = {"TESTING": True, "EMBED_CACHE_DIR": str(tmp_path)}
+        for _ in range(2):
+            client = create_app(mock_answer, config=config, embed_func=counting_embed(calls)).test_client()
+            data = client.post("/v1/embeddings", json={"input": ["hello", "hi"]}).get_json()
+            assert [item["embedding"] for item in data["data"]] == [[5.0, 1.0], [2.0, 1.0]]
+
+        assert calls == ["hello", "hi"]
+        assert "func_to_gen_embedding_cache_hits_total 2" in client.get("/metrics").get_data(as_text=True)
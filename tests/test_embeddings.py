@@ -1,7 +1,19 @@
-"""Tests for /v1/embeddings endpoint."""
+"""Tests for the embeddings endpoints."""
 
+import base64
 import json
 
+import pytest
+
+from func_to_gen.app import create_app
+from tests.conftest import mock_answer
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy comes with the embeddings extra; only the embed function tests need it
+    np = None
+
 
 class TestEmbeddings:
     """Tests for the embeddings endpoint (not supported)."""
@@ -23,3 +35,105 @@ class TestEmbeddings:
         assert "error" in data
         assert "not supported" in data["error"]["message"].lower()
         assert data["error"]["type"] == "not_implemented_error"
+
+
+def fake_embed(texts):
+    """Embed each text as [len, vowels, 1, 0] so results are easy to check."""
+    return np.array([[len(text), sum(c in "aeiou" for c in text), 1.0, 0.0] for text in texts])
+
+
+def make_embed_client(embed_func=fake_embed, **config):
+    app = create_app(answer_func=mock_answer, config={"TESTING": True, **config}, embed_func=embed_func)
+    return app.test_client()
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+class TestEmbedFunction:
+    """Tests for embeddings served by an embed function."""
+
+    def test_single_input(self):
+        """A string input returns one float embedding and usage."""
+        client = make_embed_client()
+        response = client.post("/v1/embeddings", json={"model": "embedder", "input": "hello"})
+
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data["object"] == "list"
+        assert data["model"] == "embedder"
+        assert data["data"] == [{"object": "embedding", "index": 0, "embedding": [5.0, 2.0, 1.0, 0.0]}]
+        assert data["usage"]["prompt_tokens"] == data["usage"]["total_tokens"] == 1
+
+    def test_list_input_keeps_order(self):
+        """A list input returns one embedding per item, indexed in order."""
+        client = make_embed_client()
+        data = client.post("/v1/embeddings", json={"input": ["a", "abc", "hello world"]}).get_json()
+
+        assert [item["index"] for item in data["data"]] == [0, 1, 2]
+        assert [item["embedding"][0] for item in data["data"]] == [1.0, 3.0, 11.0]
+
+    def test_base64_encoding(self):
+        """base64 embeddings decode to little-endian float32 vectors."""
+        client = make_embed_client()
+        data = client.post("/v1/embeddings", json={"input": "hello", "encoding_format": "base64"}).get_json()
+
+        vector = np.frombuffer(base64.b64decode(data["data"][0]["embedding"]), dtype="<f4")
+        assert vector.tolist() == [5.0, 2.0, 1.0, 0.0]
+
+    def test_dimensions_truncate_and_renormalize(self):
+        """dimensions keeps the leading components scaled to unit length."""
+        client = make_embed_client(embed_func=lambda texts: [[3.0, 4.0, 12.0]] * len(texts))
+        data = client.post("/v1/embeddings", json={"input": "x", "dimensions": 2}).get_json()
+
+        assert data["data"][0]["embedding"] == pytest.approx([0.6, 0.8])
+
+    def test_large_inputs_are_batched(self):
+        """Inputs are passed to the embed function in EMBED_BATCH_SIZE chunks."""
+        batch_sizes = []
+
+        def embed(texts):
+            batch_sizes.append(len(texts))
+            return fake_embed(texts)
+
+        client = make_embed_client(embed_func=embed, EMBED_BATCH_SIZE=4)
+        data = client.post("/v1/embeddings", json={"input": ["x" * i for i in range(10)]}).get_json()
+
+        assert batch_sizes == [4, 4, 2]
+        assert [item["embedding"][0] for item in data["data"]] == list(range(10))
+
+    def test_invalid_requests(self):
+        """Malformed input, dimensions and encoding_format return 400."""
+        client = make_embed_client()
+        for body in (
+            {"input": []},
+            {"input": [1, 2]},
+            {"input": "x", "dimensions": 0},
+            {"input": "x", "encoding_format": "int8"},
+        ):
+            response = client.post("/v1/embeddings", json=body)
+            assert response.status_code == 400
+            assert response.get_json()["error"]["type"] == "invalid_request_error"
+
+    def test_ollama_embeddings(self):
+        """Legacy /api/embeddings embeds one prompt."""
+        client = make_embed_client()
+        response = client.post("/api/embeddings", json={"model": "embedder", "prompt": "hello"})
+
+        assert response.status_code == 200
+        assert response.get_json() == {"embedding": [5.0, 2.0, 1.0, 0.0]}
+
+    def test_ollama_embed_is_normalized(self):
+        """/api/embed embeds a list of inputs as unit vectors."""
+        client = make_embed_client()
+        data = client.post("/api/embed", json={"model": "embedder", "input": ["hello", "a"]}).get_json()
+
+        assert data["model"] == "embedder"
+        assert len(data["embeddings"]) == 2
+        assert np.linalg.norm(data["embeddings"], axis=1) == pytest.approx([1.0, 1.0])
+        assert data["prompt_eval_count"] == 2
+
+    def test_ollama_without_embed_function(self, client):
+        """Ollama embedding routes return 501 without an embed function."""
+        response = client.post("/api/embeddings", json={"prompt": "hello"})
+
+        assert response.status_code == 501
+        assert "not supported" in response.get_json()["error"].lower()
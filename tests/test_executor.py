@@ -0,0 +1,89 @@
+"""Tests for the bounded worker pool."""
+
+import json
+import threading
+
+import pytest
+
+from func_to_gen.executor import AnswerExecutor
+from tests.conftest import make_client, mock_answer, mock_stream_answer, parse_sse
+
+
+class TestExecutor:
+    """Tests for running answers on a worker pool."""
+
+    def test_pooled_completion(self):
+        """Test that answers run normally through the pool."""
+        client = make_client(mock_answer, MAX_CONCURRENCY=2)
+        response = client.post(
+            "/v1/completions",
+            data=json.dumps({"prompt": "Hello"}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.get_json()["choices"][0]["text"] == "Response to: Hello"
+
+    def test_pooled_streaming(self):
+        """Test that chunked answers stream back from pool workers."""
+        client = make_client(mock_stream_answer, MAX_CONCURRENCY=2)
+        response = client.post(
+            "/v1/completions",
+            data=json.dumps({"prompt": "Hello", "stream": True}),
+            content_type="application/json",
+        )
+
+        events = parse_sse(response)
+        assert "".join(e["choices"][0]["text"] for e in events[:-1]).strip() == "Response to: Hello"
+
+    def test_queue_full_returns_503(self):
+        """Test that requests beyond the queue depth are rejected."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_answer(prompt):
+            started.set()
+            release.wait(5)
+            return "done"
+
+        client = make_client(blocking_answer, MAX_CONCURRENCY=1, MAX_QUEUE_DEPTH=0, RETRY_AFTER=3)
+        body = json.dumps({"prompt": "Hello", "stream": False})
+        background = threading.Thread(
+            target=client.post, args=("/api/generate",), kwargs={"data": body, "content_type": "application/json"},
+        )
+        background.start()
+        assert started.wait(5)
+
+        try:
+            ollama = client.post("/api/generate", data=body, content_type="application/json")
+            openai = client.post(
+                "/v1/completions", data=json.dumps({"prompt": "Hello"}), content_type="application/json",
+            )
+        finally:
+            release.set()
+            background.join()
+
+        assert ollama.status_code == 503
+        assert ollama.headers["Retry-After"] == "3"
+        assert "error" in ollama.get_json()
+        assert openai.status_code == 503
+        assert openai.get_json()["error"]["type"] == "server_overloaded_error"
+
+    def test_answer_errors_propagate(self):
+        """Test that exceptions from the answer function reach the caller."""
+        def failing_answer(prompt):
+            raise ValueError("boom")
+
+        executor = AnswerExecutor(max_workers=1, max_queue=0)
+        with pytest.raises(ValueError):
+            executor.run(failing_answer, "Hello")
+        executor.shutdown()
+        assert executor.pending == 0
+
+    def test_process_pool(self):
+        """Test running a picklable answer function in worker processes."""
+        executor = AnswerExecutor(max_workers=1, max_queue=1, kind="process")
+        try:
+            assert executor.run(mock_stream_answer, "Hi").strip() == "Response to: Hi"
+        finally:
+            executor.shutdown()
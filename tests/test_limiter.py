@@ -0,0 +1,169 @@
+"""Tests for the adaptive concurrency limiter."""
+
+import json
+import threading
+
+import pytest
+
+from func_to_gen import LazyModel, create_app
+from func_to_gen.asgi import create_asgi_app
+from func_to_gen.limiter import AdaptiveLimiter, ConcurrencyLimitError
+from func_to_gen.routes import get_limiter
+from tests.conftest import make_client, mock_answer
+from tests.test_asgi import request
+
+
+def feed(limiter, latency, count, monkeypatch, in_flight=None):
+    """Record ``count`` answers of ``latency`` seconds with the limiter saturated."""
+    clock = [0.0]
+    monkeypatch.setattr("func_to_gen.limiter.time.monotonic", lambda: clock[0])
+    for _ in range(count):
+        limiter.in_flight = in_flight if in_flight is not None else limiter.limit
+        started = clock[0]
+        clock[0] += latency
+        limiter.release(started)
+
+
+class TestAdaptiveLimiter:
+    """Tests for the limit adjustments."""
+
+    def test_rejects_beyond_limit(self):
+        """Test that requests beyond the limit are shed and counted."""
+        limiter = AdaptiveLimiter(initial_limit=2)
+        first = limiter.acquire()
+        limiter.acquire()
+        with pytest.raises(ConcurrencyLimitError) as exc_info:
+            limiter.acquire()
+
+        assert exc_info.value.retry_after == 1
+        limiter.release(first, sample=False)
+        limiter.acquire()
+        assert limiter.stats() == {"limit": 2, "in_flight": 2, "rejected": 1}
+
+    def test_grows_while_latency_is_steady(self, monkeypatch):
+        """Test that the limit rises while latency does not."""
+        limiter = AdaptiveLimiter(initial_limit=10, max_limit=50)
+        feed(limiter, 0.1, 50, monkeypatch)
+        assert limiter.limit == 50
+
+    def test_shrinks_when_latency_rises(self, monkeypatch):
+        """Test that the limit falls once answers slow down under load."""
+        limiter = AdaptiveLimiter(initial_limit=40)
+        feed(limiter, 0.1, 200, monkeypatch)
+        grown = limiter.limit
+        feed(limiter, 1.0, 20, monkeypatch)
+        assert limiter.limit < grown / 2
+
+    def test_no_growth_when_underused(self, monkeypatch):
+        """Test that a mostly idle limiter does not raise its limit."""
+        limiter = AdaptiveLimiter(initial_limit=10)
+        feed(limiter, 0.1, 50, monkeypatch, in_flight=1)
+        assert limiter.limit == 10
+
+    def test_dropped_answers_shrink_limit(self):
+        """Test that timed-out answers lower the limit, down to the minimum."""
+        limiter = AdaptiveLimiter(initial_limit=10, min_limit=5)
+        for _ in range(20):
+            limiter.release(limiter.acquire(), dropped=True)
+        assert limiter.limit == 5
+
+
+class TestLimitedApp:
+    """Tests for load shedding in the app."""
+
+    def test_sheds_with_503_and_exports_metrics(self):
+        """Test that requests beyond the limit get 503 and the limit is exported."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_answer(prompt):
+            if prompt == "block":
+                started.set()
+                release.wait(5)
+            return "done"
+
+        client = make_client(
+            blocking_answer, ADAPTIVE_CONCURRENCY=True, ADAPTIVE_CONCURRENCY_INITIAL=1, RETRY_AFTER=2,
+        )
+        background = threading.Thread(target=client.post, args=("/v1/completions",), kwargs={
+            "data": json.dumps({"prompt": "block"}), "content_type": "application/json",
+        })
+        background.start()
+        assert started.wait(5)
+        try:
+            response = client.post(
+                "/v1/completions", data=json.dumps({"prompt": "Hello"}), content_type="application/json",
+            )
+        finally:
+            release.set()
+            background.join()
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "2"
+        assert response.get_json()["error"]["type"] == "server_overloaded_error"
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert "func_to_gen_concurrency_limit 1" in text
+        assert "func_to_gen_concurrency_in_flight 0" in text
+        assert "func_to_gen_concurrency_rejected_total 1" in text
+
+    def test_answers_within_limit(self):
+        """Test that answers within the limit are served normally."""
+        client = make_client(mock_answer, ADAPTIVE_CONCURRENCY=True)
+        response = client.post(
+            "/api/generate",
+            data=json.dumps({"prompt": "Hello", "stream": False}),
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        assert response.get_json()["response"] == "Response to: Hello"
+
+    def test_shed_requests_do_not_load_models(self):
+        """Test that a request rejected by the limiter does not load its model."""
+        started = threading.Event()
+        release = threading.Event()
+        loads = []
+
+        def blocking_answer(prompt):
+            started.set()
+            release.wait(5)
+            return "done"
+
+        def load_big():
+            loads.append("big")
+            return mock_answer
+
+        app = create_app(
+            models={"small": blocking_answer, "big": LazyModel(load_big)},
+            config={"TESTING": True, "ADAPTIVE_CONCURRENCY": True, "ADAPTIVE_CONCURRENCY_INITIAL": 1},
+        )
+        client = app.test_client()
+        background = threading.Thread(target=client.post, args=("/v1/completions",), kwargs={
+            "data": json.dumps({"model": "small", "prompt": "block"}), "content_type": "application/json",
+        })
+        background.start()
+        assert started.wait(5)
+        try:
+            response = client.post("/v1/completions", json={"model": "big", "prompt": "Hello"})
+        finally:
+            release.set()
+            background.join()
+
+        assert response.status_code == 503
+        assert loads == []
+
+    def test_unknown_model_frees_its_slot(self):
+        """Test that a request for an unknown model gives its limiter slot back."""
+        app = create_app(models={"small": mock_answer}, config={"TESTING": True, "ADAPTIVE_CONCURRENCY": True})
+        response = app.test_client().post("/v1/completions", json={"model": "missing", "prompt": "Hello"})
+
+        assert response.status_code == 404
+        assert get_limiter().in_flight == 0
+
+    def test_asgi_unknown_model_frees_its_slot(self):
+        """Test that the ASGI app also gives the slot of an unknown model back."""
+        app = create_asgi_app(models={"small": mock_answer}, config={"ADAPTIVE_CONCURRENCY": True})
+        status, _, _ = request(app, "POST", "/v1/completions", {"model": "missing", "prompt": "Hello"})
+
+        assert status == 404
+        assert app.limiter.in_flight == 0
@@ -0,0 +1,106 @@
+"""Tests for the /metrics endpoint."""
+
+import json
+import threading
+
+from func_to_gen.metrics import Metrics
+from tests.conftest import make_client, mock_answer
+
+
+def sample(text: str, prefix: str) -> float:
+    """Return the value of the metrics line starting with ``prefix``."""
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{prefix} not found")
+
+
+class TestMetrics:
+    """Tests for request metrics."""
+
+    def test_metrics_endpoint(self, client):
+        """Test request counts and phase histograms after a chat request."""
+        client.post(
+            "/v1/chat/completions",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hi"}]}),
+            content_type="application/json",
+        )
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.mimetype == "text/plain"
+        text = response.get_data(as_text=True)
+
+        route = 'route="api.chat_completions"'
+        assert sample(text, f'func_to_gen_requests_total{{{route},status="200"}}') == 1
+        for phase in ("parse", "render", "answer", "serialize"):
+            assert sample(text, f'func_to_gen_phase_seconds_count{{{route},phase="{phase}"}}') == 1
+        assert sample(text, f"func_to_gen_request_seconds_count{{{route}}}") == 1
+        assert sample(text, "func_to_gen_in_flight_requests") == 0
+
+    def test_error_counts_by_status(self, client):
+        """Test that failed requests are counted by status."""
+        client.post("/api/chat", data="", content_type="application/json")
+        text = client.get("/metrics").get_data(as_text=True)
+
+        assert sample(text, 'func_to_gen_errors_total{route="ollama_api.ollama_chat",status="400"}') == 1
+
+    def test_streamed_answer_phase(self, stream_client):
+        """Test that streamed responses record the answer phase at stream end."""
+        stream_client.post(
+            "/api/generate", data=json.dumps({"prompt": "Hi"}), content_type="application/json",
+        ).get_data()
+        text = stream_client.get("/metrics").get_data(as_text=True)
+
+        route = 'route="ollama_api.ollama_generate"'
+        assert sample(text, f'func_to_gen_phase_seconds_count{{{route},phase="answer"}}') == 1
+        assert sample(text, "func_to_gen_in_flight_requests") == 0
+
+    def test_component_metrics(self):
+        """Test that cache counters are exported."""
+        client = make_client(mock_answer, CACHE_MAX_ENTRIES=4)
+        for _ in range(2):
+            client.post("/v1/completions", data=json.dumps({"prompt": "Hi"}), content_type="application/json")
+        text = client.get("/metrics").get_data(as_text=True)
+
+        assert sample(text, "func_to_gen_cache_hits_total") == 1
+        assert sample(text, "func_to_gen_cache_misses_total") == 1
+
+    def test_metrics_disabled(self):
+        """Test that metrics can be turned off."""
+        client = make_client(mock_answer, METRICS=False)
+        assert client.get("/metrics").status_code == 404
+
+    def test_shards_are_summed_across_threads(self):
+        """Test that counters and histograms recorded on many threads add up."""
+        metrics = Metrics(buckets=(0.1, 1.0))
+
+        def record():
+            for _ in range(100):
+                metrics.inc("hits_total")
+                metrics.observe("latency_seconds", (), 0.5)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        text = metrics.render()
+        assert metrics.counter_value("hits_total") == 400
+        assert sample(text, 'latency_seconds_bucket{le="0.1"}') == 0
+        assert sample(text, 'latency_seconds_bucket{le="1.0"}') == 400
+        assert sample(text, 'latency_seconds_bucket{le="+Inf"}') == 400
+        assert sample(text, "latency_seconds_sum") == 200
+
+    def test_exited_threads_are_folded(self):
+        """Test that shards of finished threads are merged instead of kept."""
+        metrics = Metrics()
+        for _ in range(50):
+            thread = threading.Thread(target=metrics.inc, args=("hits_total",))
+            thread.start()
+            thread.join()
+        metrics.inc("hits_total")
+
+        assert metrics.counter_value("hits_total") == 51
+        assert len(metrics._shards) == 1
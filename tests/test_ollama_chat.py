@@ -2,6 +2,8 @@
 
 import json
 
+from tests.conftest import parse_ndjson
+
 
 class TestOllamaChat:
     """Tests for the Ollama chat endpoint."""
@@ -112,3 +114,52 @@ class TestOllamaChat:
         )
 
         assert response.status_code == 400
+
+    def test_chat_streams_by_default(self, stream_client):
+        """Test that chunked answers are streamed as NDJSON by default."""
+        response = stream_client.post(
+            "/api/chat",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hello Ollama"}]}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+        lines = parse_ndjson(response)
+
+        assert len(lines) > 2
+        assert all(line["done"] is False for line in lines[:-1])
+        assert "Hello Ollama" in "".join(line["message"]["content"] for line in lines)
+
+        final = lines[-1]
+        assert final["done"] is True
+        assert final["done_reason"] == "stop"
+        assert final["total_duration"] > 0
+        assert final["total_duration"] >= final["eval_duration"]
+
+    def test_chat_stream_false(self, stream_client):
+        """Test that stream false returns a single object for chunked answers."""
+        payload = {"messages": [{"role": "user", "content": "Hello Ollama"}]}
+        payload["stream"] = False
+        response = stream_client.post(
+            "/api/chat",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+        data = response.get_json()
+        assert data["done"] is True
+        assert "Hello Ollama" in data["message"]["content"]
+
+    def test_chat_stream_true_with_string_answer(self, client):
+        """Test that string answers are streamed when explicitly requested."""
+        payload = {"messages": [{"role": "user", "content": "Hello Ollama"}]}
+        payload["stream"] = True
+        response = client.post(
+            "/api/chat",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+        lines = parse_ndjson(response)
+        assert [line["done"] for line in lines] == [False, True]
@@ -0,0 +1,126 @@
+"""Tests for model loading, keep_alive and the Ollama /api/ps endpoint."""
+
+import json
+import time
+
+import pytest
+
+from func_to_gen import LazyModel, create_app
+from func_to_gen.registry import parse_keep_alive
+
+
+class LoadTracker:
+    """Record loads and unloads of a lazy model."""
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+
+    def load(self):
+        self.events.append("load")
+        return lambda prompt: f"{self.name}: {prompt}"
+
+    def unload(self, func):
+        self.events.append("unload")
+
+
+@pytest.fixture
+def trackers():
+    return {name: LoadTracker(name) for name in ("alpha", "beta")}
+
+
+def make_lazy_client(trackers, **config):
+    models = {
+        name: LazyModel(tracker.load, unload=tracker.unload, size=1024)
+        for name, tracker in trackers.items()
+    }
+    app = create_app(models=models, config={"TESTING": True, **config})
+    return app.test_client()
+
+
+def generate(client, model, **extra):
+    return client.post(
+        "/api/generate",
+        data=json.dumps({"model": model, "prompt": "Hi", "stream": False, **extra}),
+        content_type="application/json",
+    )
+
+
+class TestOllamaPs:
+    """Tests for lazy loading, idle unloading and /api/ps."""
+
+    def test_ps_lists_loaded_models(self, trackers):
+        """Test that only loaded models are reported, with size and expiry."""
+        client = make_lazy_client(trackers)
+        assert client.get("/api/ps").get_json() == {"models": []}
+
+        generate(client, "alpha")
+        models = client.get("/api/ps").get_json()["models"]
+
+        assert [m["name"] for m in models] == ["alpha"]
+        assert models[0]["size"] == 1024
+        assert models[0]["expires_at"] is not None
+
+    def test_keep_alive_zero_unloads_immediately(self, trackers):
+        """Test that keep_alive 0 unloads the model after the request."""
+        client = make_lazy_client(trackers)
+        response = generate(client, "alpha", keep_alive=0)
+
+        assert response.get_json()["response"] == "alpha: Hi"
+        assert trackers["alpha"].events == ["load", "unload"]
+        assert client.get("/api/ps").get_json() == {"models": []}
+
+    def test_negative_keep_alive_never_expires(self, trackers):
+        """Test that a negative keep_alive keeps the model loaded."""
+        client = make_lazy_client(trackers)
+        generate(client, "alpha", keep_alive="-1m")
+
+        assert client.get("/api/ps").get_json()["models"][0]["expires_at"] is None
+
+    def test_bare_keep_alive_request_loads_and_unloads(self, trackers):
+        """Test loading and unloading a model without a prompt."""
+        client = make_lazy_client(trackers)
+        load = client.post(
+            "/api/generate", data=json.dumps({"model": "beta", "keep_alive": "5m"}), content_type="application/json",
+        )
+        unload = client.post(
+            "/api/chat", data=json.dumps({"model": "beta", "keep_alive": 0}), content_type="application/json",
+        )
+
+        assert load.get_json()["done_reason"] == "load"
+        assert unload.get_json()["done_reason"] == "unload"
+        assert trackers["beta"].events == ["load", "unload"]
+
+    def test_idle_models_expire(self, trackers):
+        """Test that models past their keep-alive are unloaded."""
+        from func_to_gen.routes import get_registry
+
+        client = make_lazy_client(trackers)
+        generate(client, "alpha", keep_alive=0.001)
+        time.sleep(0.01)
+        get_registry().unload_expired()
+
+        assert trackers["alpha"].events == ["load", "unload"]
+
+    def test_max_loaded_models_evicts_lru(self, trackers):
+        """Test that loading past the limit unloads the least recently used model."""
+        client = make_lazy_client(trackers, MAX_LOADED_MODELS=1)
+        generate(client, "alpha")
+        generate(client, "beta")
+
+        assert trackers["alpha"].events == ["load", "unload"]
+        assert [m["name"] for m in client.get("/api/ps").get_json()["models"]] == ["beta"]
+
+    def test_invalid_keep_alive(self, trackers):
+        """Test that malformed keep_alive values are rejected."""
+        client = make_lazy_client(trackers)
+        assert generate(client, "alpha", keep_alive="soon").status_code == 400
+
+    def test_parse_keep_alive(self):
+        """Test parsing of numeric and duration keep_alive values."""
+        assert parse_keep_alive(None) is None
+        assert parse_keep_alive(30) == 30.0
+        assert parse_keep_alive("10") == 10.0
+        assert parse_keep_alive("5m") == 300.0
+        assert parse_keep_alive("1h30m") == 5400.0
+        assert parse_keep_alive("-1") == -1.0
@@ -0,0 +1,110 @@
+"""Tests for background loading, warmup and the readiness endpoint."""
+
+import json
+import threading
+
+from func_to_gen import create_app
+from func_to_gen.asgi import create_asgi_app
+from func_to_gen.registry import ModelRegistry
+from func_to_gen.routes import get_readiness
+from tests.conftest import mock_answer
+from tests.test_asgi import request as asgi_request
+
+
+def generate(client, prompt="Hello", model=None):
+    body = {"prompt": prompt, "stream": False}
+    if model is not None:
+        body["model"] = model
+    return client.post("/api/generate", data=json.dumps(body), content_type="application/json")
+
+
+class TestReadiness:
+    """Tests for the /ready endpoint."""
+
+    def test_ready_at_once_without_startup_work(self):
+        """Test that an app with a plain answer function is ready immediately."""
+        client = create_app(answer_func=mock_answer, config={"TESTING": True}).test_client()
+        response = client.get("/ready")
+
+        assert response.status_code == 200
+        assert response.get_json()["status"] == "ready"
+
+    def test_import_path_loaded_in_background(self):
+        """Test that an answer function given as an import path is served."""
+        app = create_app(answer_func="tests.conftest:mock_answer", config={"TESTING": True})
+        client = app.test_client()
+
+        response = generate(client)
+        assert response.status_code == 200
+        assert response.get_json()["response"] == "Response to: Hello"
+        assert client.get("/ready").status_code == 200
+
+    def test_not_ready_until_warmup_finishes(self):
+        """Test that /ready answers 503 while the warmup hook runs."""
+        release = threading.Event()
+        warmed = []
+
+        def warmup(answer):
+            release.wait(5)
+            warmed.append(answer("warmup"))
+
+        client = create_app(answer_func=mock_answer, config={"TESTING": True}, warmup=warmup).test_client()
+        loading = client.get("/ready")
+        release.set()
+        assert get_readiness().wait(5)
+        ready = client.get("/ready")
+
+        assert loading.status_code == 503
+        assert loading.get_json()["status"] == "loading"
+        assert ready.status_code == 200
+        assert ready.get_json()["startup_seconds"] >= 0
+        assert warmed == ["Response to: warmup"]
+
+    def test_failed_startup_reported(self):
+        """Test that a failing import leaves the app unready with the error."""
+        client = create_app(answer_func="tests.conftest:no_such_answer", config={"TESTING": True}).test_client()
+        assert not get_readiness().wait(5)
+
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "failed"
+        assert "no_such_answer" in response.get_json()["error"]
+
+    def test_models_accept_import_paths(self):
+        """Test import paths in a models mapping."""
+        client = create_app(
+            models={"mock": "tests.conftest:mock_answer", "other": mock_answer}, config={"TESTING": True},
+        ).test_client()
+
+        response = generate(client, model="mock")
+        assert response.get_json()["response"] == "Response to: Hello"
+
+
+class TestPinnedModels:
+    """Tests for registry entries given as import paths."""
+
+    def test_import_path_stays_loaded(self):
+        """Test that an imported answer function is never unloaded."""
+        registry = ModelRegistry()
+        registry.register("mock", "tests.conftest:mock_answer")
+        entry = registry.entry("mock")
+
+        assert not entry.loaded
+        assert registry.acquire("mock") is mock_answer
+        registry.release("mock", keep_alive=0)
+        assert entry.loaded
+        assert not entry.unload()
+        assert registry.startup_entries() == [entry]
+
+
+class TestAsgiReadiness:
+    """Tests for readiness in the ASGI app."""
+
+    def test_ready_after_background_import(self):
+        """Test that the ASGI app reports ready once the import path is loaded."""
+        app = create_asgi_app(answer_func="tests.conftest:mock_answer")
+        assert app.readiness.wait(5)
+
+        status, _, body = asgi_request(app, "GET", "/ready")
+        assert status == 200
+        assert json.loads(body)["status"] == "ready"
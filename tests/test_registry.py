@@ -0,0 +1,126 @@
+"""Tests for serving several models from one app."""
+
+import json
+
+import pytest
+
+from func_to_gen import LazyModel, create_app
+from func_to_gen.registry import ModelRegistry
+
+
+@pytest.fixture
+def loads():
+    """Record lazy model loads."""
+    return []
+
+
+@pytest.fixture
+def multi_client(loads):
+    """Create a test client serving two eager models and one lazy model."""
+    def load_big():
+        loads.append("big")
+        return lambda prompt: f"big: {prompt}"
+
+    app = create_app(
+        models={
+            "small": lambda prompt: f"small: {prompt}",
+            "tiny": lambda prompt: f"tiny: {prompt}",
+            "big": LazyModel(load_big),
+        },
+        config={"TESTING": True},
+    )
+    return app.test_client()
+
+
+class TestModelRegistry:
+    """Tests for routing requests by model."""
+
+    def test_routes_by_model(self, multi_client):
+        """Test that the model field selects the answer function."""
+        for model in ("small", "tiny"):
+            response = multi_client.post(
+                "/v1/completions",
+                data=json.dumps({"model": model, "prompt": "Hi"}),
+                content_type="application/json",
+            )
+            assert response.get_json()["choices"][0]["text"] == f"{model}: Hi"
+
+    def test_default_model(self, multi_client):
+        """Test that requests without a model use the first registered one."""
+        response = multi_client.post(
+            "/api/generate",
+            data=json.dumps({"prompt": "Hi"}),
+            content_type="application/json",
+        )
+
+        data = response.get_json()
+        assert data["model"] == "small"
+        assert data["response"] == "small: Hi"
+
+    def test_unknown_model_404(self, multi_client):
+        """Test that unknown models are rejected in both API shapes."""
+        openai = multi_client.post(
+            "/v1/chat/completions",
+            data=json.dumps({"model": "nope", "messages": [{"role": "user", "content": "Hi"}]}),
+            content_type="application/json",
+        )
+        ollama = multi_client.post(
+            "/api/chat",
+            data=json.dumps({"model": "nope", "messages": [{"role": "user", "content": "Hi"}]}),
+            content_type="application/json",
+        )
+
+        assert openai.status_code == 404
+        assert "nope" in openai.get_json()["error"]["message"]
+        assert ollama.status_code == 404
+        assert "error" in ollama.get_json()
+
+    def test_lazy_model_loads_on_first_use(self, multi_client, loads):
+        """Test that lazy factories run once, on the first request."""
+        assert loads == []
+
+        for _ in range(2):
+            response = multi_client.post(
+                "/api/generate",
+                data=json.dumps({"model": "big", "prompt": "Hi"}),
+                content_type="application/json",
+            )
+            assert response.get_json()["response"] == "big: Hi"
+
+        assert loads == ["big"]
+
+    def test_lists_all_models(self, multi_client):
+        """Test that model listings include every registered model."""
+        openai = multi_client.get("/v1/models").get_json()
+        ollama = multi_client.get("/api/tags").get_json()
+
+        assert [m["id"] for m in openai["data"]] == ["small", "tiny", "big"]
+        assert [m["name"] for m in ollama["models"]] == ["small", "tiny", "big"]
+        assert multi_client.get("/v1/models/big").status_code == 200
+        assert multi_client.get("/v1/models/nope").status_code == 404
+
+
+class TestMaxLoaded:
+    """Tests for the cap on loaded lazy models."""
+
+    def test_evicts_before_loading(self):
+        """Test that a model is unloaded before the next one loads, and plain models do not count."""
+        loaded = set()
+        peak = []
+
+        def lazy(name):
+            def load():
+                loaded.add(name)
+                peak.append(len(loaded))
+                return lambda prompt: f"{name}: {prompt}"
+            return LazyModel(load, unload=lambda func: loaded.discard(name))
+
+        registry = ModelRegistry.from_mapping(
+            {"plain": lambda prompt: prompt, "a": lazy("a"), "b": lazy("b")}, max_loaded=1,
+        )
+        for name in ("a", "b", "a"):
+            registry.acquire(name)
+            registry.release(name)
+
+        assert peak == [1, 1, 1]
+        assert [entry.name for entry in registry.loaded_entries()] == ["plain", "a"]
@@ -0,0 +1,228 @@
+"""Tests for load balancing and hedging across replicas."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from func_to_gen.contexts import GenerationContext
+from func_to_gen.deadlines import Deadline, RequestTimeout
+from func_to_gen.replicas import ReplicaPool
+from tests.conftest import make_client
+from tests.test_metrics import sample
+
+
+def named_answer(name):
+    def answer(prompt: str) -> str:
+        return f"{name}: {prompt}"
+    return answer
+
+
+def named_stream(name):
+    def answer(prompt: str):
+        yield f"{name}: "
+        yield prompt
+    return answer
+
+
+def failing_answer(prompt: str) -> str:
+    raise RuntimeError("replica down")
+
+
+class SlowAnswer:
+    """Replica that answers "prime" at once and other prompts only when not cancelled within 5s."""
+
+    def __init__(self, stream=False):
+        self.stream = stream
+        self.cancelled = threading.Event()
+
+    def __call__(self, prompt, cancel=None):
+        if prompt != "prime" and cancel.wait(5):
+            self.cancelled.set()
+            if self.stream:
+                return iter(())
+            return "cancelled"
+        if self.stream:
+            return iter(["slow: ", prompt])
+        return f"slow: {prompt}"
+
+
+def wait_idle(pool):
+    deadline = time.monotonic() + 5
+    while any(replica["outstanding"] for replica in pool.stats()) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return pool.stats()
+
+
+class TestBalancing:
+    """Tests for picking and ejecting replicas."""
+
+    def test_least_outstanding_replica_is_picked(self):
+        """Test that requests avoid a replica still busy with a stream."""
+        pool = ReplicaPool([named_stream("a"), named_stream("b")])
+        first = pool("one")
+        assert next(first) == "a: "
+
+        assert "".join(pool("two")) == "b: two"
+        assert "".join(pool("three")) == "b: three"
+        first.close()
+        assert "".join(pool("four")) == "a: four"
+        assert [replica["outstanding"] for replica in pool.stats()] == [0, 0]
+
+    def test_idle_replicas_take_turns(self):
+        """Test that sequential requests rotate over the replicas."""
+        pool = ReplicaPool({"a": named_answer("a"), "b": named_answer("b")})
+        assert [pool("x") for _ in range(4)] == ["a: x", "b: x", "a: x", "b: x"]
+
+    def test_failing_replica_is_ejected(self):
+        """Test that consecutive failures eject a replica until its cooldown ends."""
+        pool = ReplicaPool([failing_answer, named_answer("b")], max_failures=2, eject_seconds=0.2)
+        results = []
+        for _ in range(6):
+            try:
+                results.append(pool("x"))
+            except RuntimeError:
+                results.append("error")
+
+        assert results.count("error") == 2
+        assert results[-2:] == ["b: x", "b: x"]
+        assert [replica["healthy"] for replica in pool.stats()] == [False, True]
+
+        time.sleep(0.25)
+        assert pool.stats()[0]["healthy"]
+        with pytest.raises(RuntimeError):
+            for _ in range(2):
+                pool("x")
+        # A single failure after the cooldown ejects it again
+        assert not pool.stats()[0]["healthy"]
+
+    def test_all_ejected_still_answers(self):
+        """Test that a pool whose replicas are all ejected keeps trying one."""
+        pool = ReplicaPool([failing_answer], max_failures=1)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                pool("x")
+        assert pool.stats()[0]["outstanding"] == 0
+
+
+class TestHedging:
+    """Tests for duplicate requests to a second replica."""
+
+    def test_slow_replica_is_hedged_and_cancelled(self):
+        """Test that a request without output after the latency quantile goes to a second replica."""
+        slow = SlowAnswer()
+        pool = ReplicaPool([slow, named_answer("fast")], hedge=True, hedge_min_samples=1)
+        assert pool("prime") == "slow: prime"
+        assert pool("prime") == "fast: prime"
+
+        assert pool("hello") == "fast: hello"
+        assert slow.cancelled.wait(5)
+        assert pool.hedged == 1
+        assert pool.hedge_wins == 1
+        assert [replica["outstanding"] for replica in wait_idle(pool)] == [0, 0]
+
+    def test_streams_are_hedged(self):
+        """Test that the first replica to yield a chunk streams the answer."""
+        slow = SlowAnswer(stream=True)
+        pool = ReplicaPool([slow, named_stream("fast")], hedge=True, hedge_min_samples=1)
+        assert "".join(pool("prime")) == "slow: prime"
+        assert "".join(pool("prime")) == "fast: prime"
+
+        assert "".join(pool("hello")) == "fast: hello"
+        assert slow.cancelled.wait(5)
+        assert [replica["outstanding"] for replica in wait_idle(pool)] == [0, 0]
+
+    def test_hedge_returns_before_uncooperative_replica(self):
+        """Test that a hedged request returns as soon as the hedge answers, even if the slow replica ignores cancel."""
+        def blocking(prompt):
+            time.sleep(1)
+            return f"blocking: {prompt}"
+
+        pool = ReplicaPool([blocking, named_answer("fast")], hedge=True)
+        pool.hedge_delay = lambda: 0.05
+
+        started = time.monotonic()
+        assert pool("hello") == "fast: hello"
+        assert time.monotonic() - started < 0.5
+        assert (pool.hedged, pool.hedge_wins) == (1, 1)
+        assert [replica["outstanding"] for replica in wait_idle(pool)] == [0, 0]
+
+    def test_failed_leg_is_hedged_at_once(self):
+        """Test that a replica failing before the hedge delay passes the request on."""
+        pool = ReplicaPool([failing_answer, named_answer("b")], hedge=True)
+        pool.hedge_delay = lambda: 5.0
+
+        started = time.monotonic()
+        assert pool("x") == "b: x"
+        assert time.monotonic() - started < 1
+        assert pool.hedged == 1
+
+    def test_all_legs_failing(self):
+        """Test that the first error is raised when every leg fails."""
+        pool = ReplicaPool([failing_answer, failing_answer], hedge=True)
+        pool.hedge_delay = lambda: 0.0
+
+        with pytest.raises(RuntimeError):
+            pool("x")
+        assert [replica["outstanding"] for replica in pool.stats()] == [0, 0]
+
+    def test_wait_for_hedge_ends_at_deadline(self):
+        """Test that waiting on a hanging hedge after the first replica failed ends at the deadline."""
+        def late_failure(prompt):
+            time.sleep(0.1)
+            raise RuntimeError("replica down")
+
+        slow = SlowAnswer()
+        pool = ReplicaPool([late_failure, slow], hedge=True)
+        pool.hedge_delay = lambda: 0.01
+
+        started = time.monotonic()
+        with pytest.raises(RequestTimeout):
+            pool("hello", deadline=Deadline(0.3))
+        assert time.monotonic() - started < 2
+        assert slow.cancelled.wait(5)
+        assert [replica["outstanding"] for replica in wait_idle(pool)] == [0, 0]
+
+    def test_no_hedge_before_enough_samples(self):
+        """Test that hedging waits for a latency estimate."""
+        pool = ReplicaPool([named_answer("a"), named_answer("b")], hedge=True, hedge_min_samples=3)
+        assert pool.hedge_delay() is None
+        for _ in range(3):
+            pool("x")
+        assert pool.hedge_delay() is not None
+        assert pool.hedged == 0
+
+
+class TestContexts:
+    """Tests for continued conversations through a pool."""
+
+    def test_context_is_forwarded(self):
+        """Test that replicas get the context, or its history before the prompt."""
+        def with_context(prompt, context=None):
+            context.state = "kept"
+            return f"{context.history}| {prompt}"
+
+        context = GenerationContext(history="user: Hi\nassistant: Hello")
+        assert ReplicaPool([with_context])("now", context=context) == "user: Hi\nassistant: Hello| now"
+        assert context.state == "kept"
+        assert ReplicaPool([named_answer("a")])("now", context=context) == "a: user: Hi\nassistant: Hello\nuser: now"
+
+
+class TestReplicaApp:
+    """Tests for serving a list of replicas."""
+
+    def test_list_of_replicas(self):
+        """Test that create_app pools a list of answer functions and exports their state."""
+        client = make_client([named_answer("a"), named_answer("b")])
+        answers = set()
+        for _ in range(2):
+            response = client.post(
+                "/api/generate", data=json.dumps({"prompt": "Hi", "stream": False}), content_type="application/json",
+            )
+            answers.add(response.get_json()["response"])
+        text = client.get("/metrics").get_data(as_text=True)
+
+        assert answers == {"a: Hi", "b: Hi"}
+        assert sample(text, 'func_to_gen_replica_healthy{model="local-llm",replica="1"}') == 1
+        assert sample(text, 'func_to_gen_hedged_requests_total{model="local-llm"}') == 0
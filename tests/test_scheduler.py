@@ -0,0 +1,171 @@
+"""Tests for priority classes and fair queuing."""
+
+import json
+import threading
+import time
+
+from func_to_gen.executor import AnswerExecutor
+from func_to_gen.scheduler import FairQueue, PriorityPolicy, create_priority_policy
+from tests.conftest import make_client, mock_answer
+
+
+def drain(fair_queue):
+    items = []
+    while len(fair_queue):
+        items.append(fair_queue.pop()[0])
+    return items
+
+
+class TestFairQueue:
+    """Tests for the queue ordering."""
+
+    def test_higher_classes_first(self):
+        """Test that items of a higher class are served before earlier lower ones."""
+        fair_queue = FairQueue()
+        fair_queue.push("batch", "batch")
+        fair_queue.push("default", None)
+        fair_queue.push("interactive", "interactive")
+
+        assert drain(fair_queue) == ["interactive", "default", "batch"]
+
+    def test_unknown_class_uses_default(self):
+        """Test that an unknown class name queues in the default class."""
+        fair_queue = FairQueue(default_class="batch")
+        assert fair_queue.resolve("urgent") == "batch"
+        assert fair_queue.resolve("interactive") == "interactive"
+
+    def test_tenants_interleave(self):
+        """Test that a tenant flooding a class does not delay another tenant's item."""
+        fair_queue = FairQueue()
+        for index in range(5):
+            fair_queue.push(f"flood-{index}", tenant="flood")
+        fair_queue.push("other", tenant="other")
+
+        assert drain(fair_queue)[:2] == ["flood-0", "other"]
+
+    def test_weighted_share(self):
+        """Test that a tenant with twice the weight is served twice as often."""
+        fair_queue = FairQueue(weights={"heavy": 2})
+        for index in range(6):
+            fair_queue.push(("heavy", index), tenant="heavy")
+            fair_queue.push(("light", index), tenant="light")
+
+        served = [tenant for tenant, _ in drain(fair_queue)[:6]]
+        assert served.count("heavy") == 4
+        assert served.count("light") == 2
+
+    def test_fifo_within_tenant(self):
+        """Test that one tenant's items keep their order."""
+        fair_queue = FairQueue()
+        for index in range(4):
+            fair_queue.push(index, tenant="a")
+        assert drain(fair_queue) == [0, 1, 2, 3]
+
+    def test_pop_reports_class_and_wait(self):
+        """Test that popping returns the class and time spent queued."""
+        fair_queue = FairQueue()
+        fair_queue.push("item", "batch")
+        time.sleep(0.01)
+
+        item, priority, waited = fair_queue.pop()
+        assert (item, priority) == ("item", "batch")
+        assert waited >= 0.01
+        assert fair_queue.pop() is None
+
+
+class TestPriorityPolicy:
+    """Tests for classifying requests."""
+
+    def test_header_route_and_api_key(self):
+        """Test the header, API key and route sources in order of precedence."""
+        policy = PriorityPolicy(
+            routes={"/v1/completions": "batch"}, api_keys={"sk-live": "interactive"}, allow_header=True,
+        )
+
+        assert policy.classify("/v1/completions", {}) == ("batch", "anonymous")
+        assert policy.classify("/v1/completions", {"Authorization": "Bearer sk-live"}) == ("interactive", "sk-live")
+        assert policy.classify(
+            "/v1/completions", {"Authorization": "Bearer sk-live", "X-Priority": "batch"},
+        ) == ("batch", "sk-live")
+
+    def test_header_is_opt_in(self):
+        """Test that the priority header is ignored unless enabled, and when unknown."""
+        assert PriorityPolicy().classify("/api/chat", {"X-Priority": "interactive"}) == (None, "anonymous")
+        assert create_priority_policy({}).classify("/api/chat", {"X-Priority": "interactive"}) == (None, "anonymous")
+        policy = PriorityPolicy(allow_header=True)
+        assert policy.classify("/api/chat", {"X-Priority": "urgent"}) == (None, "anonymous")
+
+    def test_tenant_header_is_opt_in(self):
+        """Test that the tenant header is ignored unless enabled, and never overrides the API key."""
+        headers = {"X-Tenant": "team-a"}
+        assert PriorityPolicy().classify("/api/chat", headers) == (None, "anonymous")
+
+        policy = create_priority_policy({"TENANT_HEADER": True})
+        assert policy.classify("/api/chat", headers) == (None, "team-a")
+        assert policy.classify("/api/chat", {**headers, "Authorization": "Bearer sk-live"}) == (None, "sk-live")
+
+
+class TestScheduledExecutor:
+    """Tests for the worker pool serving queued answers by priority."""
+
+    def test_interactive_overtakes_batch(self):
+        """Test that a queued interactive answer runs before queued batch answers."""
+        release = threading.Event()
+        started = threading.Event()
+        order = []
+
+        def answer(prompt):
+            if prompt == "blocker":
+                started.set()
+                release.wait(5)
+            order.append(prompt)
+            return prompt
+
+        executor = AnswerExecutor(max_workers=1, max_queue=8)
+        threads = [threading.Thread(target=executor.run, args=(answer, "blocker"))]
+        threads[0].start()
+        assert started.wait(5)
+        for prompt, priority in [("batch-1", "batch"), ("batch-2", "batch"), ("chat", "interactive")]:
+            thread = threading.Thread(target=executor.run, args=(answer, prompt), kwargs={"priority": priority})
+            thread.start()
+            threads.append(thread)
+            while executor.pending < len(threads):
+                time.sleep(0.001)
+        assert executor.queue_depths() == {"interactive": 1, "default": 0, "batch": 2}
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        executor.shutdown()
+
+        assert order == ["blocker", "chat", "batch-1", "batch-2"]
+
+    def test_wait_observer(self):
+        """Test that each started answer reports its class and queue wait."""
+        waits = []
+        executor = AnswerExecutor(max_workers=1, max_queue=1)
+        executor.wait_observer = lambda priority, seconds: waits.append((priority, seconds))
+
+        assert executor.run(mock_answer, "Hello", priority="batch") == "Response to: Hello"
+        executor.shutdown()
+
+        assert len(waits) == 1
+        assert waits[0][0] == "batch"
+
+    def test_queue_wait_metrics(self):
+        """Test that queue waits are exported per class."""
+        client = make_client(
+            mock_answer, MAX_CONCURRENCY=1, PRIORITY_ROUTES={"/v1/completions": "batch"}, PRIORITY_HEADER=True,
+        )
+        client.post("/v1/completions", data=json.dumps({"prompt": "Hello"}), content_type="application/json")
+        client.post(
+            "/api/generate",
+            data=json.dumps({"prompt": "Hello", "stream": False}),
+            content_type="application/json",
+            headers={"X-Priority": "interactive"},
+        )
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert 'func_to_gen_queue_wait_seconds_count{class="batch"} 1' in text
+        assert 'func_to_gen_queue_wait_seconds_count{class="interactive"} 1' in text
+        assert 'func_to_gen_executor_queued{class="batch"} 0' in text
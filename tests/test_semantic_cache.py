@@ -0,0 +1,136 @@
+"""Tests for the semantic response cache."""
+
+import time
+
+import pytest
+
+from func_to_gen.app import create_app
+from func_to_gen.semantic_cache import SemanticCache, create_semantic_cache
+
+# NumPy comes with the embeddings extra
+np = pytest.importorskip("numpy")
+
+
+def bag_of_words_embed(texts):
+    """Embed texts as word counts over a tiny vocabulary, ignoring order."""
+    vocabulary = ["how", "reset", "password", "weather", "today", "my", "do", "i"]
+    return [[text.lower().replace("?", "").split().count(word) for word in vocabulary] for text in texts]
+
+
+class TestSemanticCache:
+    """Tests for SemanticCache."""
+
+    def test_similar_vector_hits(self):
+        """A vector above the threshold returns the stored answer."""
+        cache = SemanticCache(threshold=0.9)
+        cache.set("m", [1.0, 0.0], "answer")
+
+        assert cache.get("m", [0.99, 0.05]) == "answer"
+        assert cache.get("m", [0.0, 1.0]) is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_namespaces_are_separate(self):
+        """Entries of one namespace never answer another."""
+        cache = SemanticCache(threshold=0.9)
+        cache.set("a", [1.0, 0.0], "answer")
+
+        assert cache.get("b", [1.0, 0.0]) is None
+
+    def test_evicts_oldest_beyond_max_entries(self):
+        """The oldest entries are dropped first."""
+        cache = SemanticCache(threshold=0.99, max_entries=2)
+        cache.set("m", [1.0, 0.0, 0.0], "x")
+        cache.set("m", [0.0, 1.0, 0.0], "y")
+        cache.set("n", [0.0, 0.0, 1.0], "z")
+
+        assert len(cache) == 2
+        assert cache.get("m", [1.0, 0.0, 0.0]) is None
+        assert cache.get("m", [0.0, 1.0, 0.0]) == "y"
+        assert cache.get("n", [0.0, 0.0, 1.0]) == "z"
+
+    def test_max_bytes(self):
+        """The memory budget evicts old entries."""
+        cache = SemanticCache(threshold=0.99, max_bytes=400)
+        for i in range(10):
+            cache.set("m", np.eye(10)[i], "answer")
+
+        assert cache.stats()["bytes"] <= 400
+        assert cache.get("m", np.eye(10)[9]) == "answer"
+
+    def test_ttl(self):
+        """Entries older than the TTL are not served."""
+        cache = SemanticCache(threshold=0.9, ttl=0.01)
+        cache.set("m", [1.0, 0.0], "answer")
+        time.sleep(0.02)
+
+        assert cache.get("m", [1.0, 0.0]) is None
+        assert len(cache) == 0
+
+    def test_partitioned_search(self):
+        """Past ivf_min_entries, searches only score the closest partitions."""
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(400, 16))
+        cache = SemanticCache(threshold=0.99, max_entries=1000, ivf_min_entries=100, nprobe=4)
+        for i, vector in enumerate(vectors):
+            cache.set("m", vector, str(i))
+
+        assert cache._namespaces["m"].centroids is not None
+        assert cache.get("m", vectors[123] * 2) == "123"
+        assert cache.get("m", vectors[399]) == "399"
+
+    def test_disabled_by_default(self):
+        """No cache is created without SEMANTIC_CACHE_THRESHOLD."""
+        assert create_semantic_cache({}) is None
+
+
+class TestSemanticCacheRoutes:
+    """Tests for the semantic cache in the generation routes."""
+
+    def make_client(self, calls, **config):
+        def answer(prompt):
+            calls.append(prompt)
+            return f"answer {len(calls)}"
+
+        config = {"TESTING": True, "SEMANTIC_CACHE_THRESHOLD": 0.9, **config}
+        return create_app(answer, config=config, embed_func=bag_of_words_embed).test_client()
+
+    def test_paraphrase_is_served_from_cache(self):
+        """A reworded prompt gets the earlier answer without calling the model."""
+        calls = []
+        client = self.make_client(calls)
+
+        first = client.post("/v1/completions", json={"prompt": "how do I reset my password"})
+        second = client.post("/v1/completions", json={"prompt": "reset my password how do I?"})
+        other = client.post("/v1/completions", json={"prompt": "weather today"})
+
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "SEMANTIC"
+        assert second.get_json()["choices"][0]["text"] == "answer 1"
+        assert other.get_json()["choices"][0]["text"] == "answer 2"
+        assert len(calls) == 2
+
+    def test_parameters_separate_namespaces(self):
+        """Different generation parameters never share answers."""
+        calls = []
+        client = self.make_client(calls)
+
+        client.post("/v1/completions", json={"prompt": "reset password", "temperature": 0})
+        client.post("/v1/completions", json={"prompt": "reset password", "temperature": 1})
+
+        assert len(calls) == 2
+
+    def test_streamed_answer_is_cached(self):
+        """Streamed answers are stored once complete."""
+        calls = []
+        client = self.make_client(calls)
+
+        client.post("/api/generate", json={"prompt": "reset password", "stream": True}).get_data()
+        response = client.post("/api/generate", json={"prompt": "password reset", "stream": False})
+
+        assert response.get_json()["response"] == "answer 1"
+
+    def test_requires_embed_function(self):
+        """Enabling the semantic cache without an embed function fails fast."""
+        with pytest.raises(ValueError, match="embed_func"):
+            create_app(lambda prompt: "", config={"SEMANTIC_CACHE_THRESHOLD": 0.9})
@@ -0,0 +1,168 @@
+"""Tests for the pre-fork server and the serve command."""
+
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from func_to_gen.cli import build_parser, parse_config
+from func_to_gen.registry import import_object
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Process that imported this module; in served workers, the master
+LOADED_IN = os.getpid()
+
+# File the "slow" answer creates once it has started, set by ServedProcess
+STARTED_ENV = "FUNC_TO_GEN_TEST_STARTED"
+
+
+def pid_answer(prompt: str) -> str:
+    """Answer with the serving and the loading process ids."""
+    if prompt == "slow":
+        with open(os.environ[STARTED_ENV], "w"):
+            pass
+        time.sleep(1)
+    return f"{os.getpid()} {LOADED_IN}"
+
+
+class ServedProcess:
+    """A ``func-to-gen serve`` master running in a subprocess."""
+
+    def __init__(self, tmp_path, *args):
+        self.log_path = tmp_path / "serve.log"
+        self.started_path = tmp_path / "started"
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "src"), ROOT]),
+            **{STARTED_ENV: str(self.started_path)},
+        )
+        with open(self.log_path, "w") as log:
+            self.process = subprocess.Popen(
+                [sys.executable, "-m", "func_to_gen.cli", "serve", "tests.test_server:pid_answer",
+                 "--port", "0", *args],
+                cwd=ROOT, env=env, stderr=log,
+            )
+        self.port = int(self.wait_for_log(r"Listening on http://127\.0\.0\.1:(\d+)")[-1])
+
+    def log(self) -> str:
+        return self.log_path.read_text()
+
+    def wait_for_log(self, pattern: str, count: int = 1, timeout: float = 10.0) -> list:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            matches = re.findall(pattern, self.log())
+            if len(matches) >= count:
+                return matches
+            time.sleep(0.05)
+        raise AssertionError(f"{pattern!r} not logged:\n{self.log()}")
+
+    def ask(self, prompt: str = "Hello") -> tuple:
+        """Return the (worker pid, loading pid) answering a request."""
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        conn.request(
+            "POST", "/api/generate",
+            body=json.dumps({"prompt": prompt, "stream": False}),
+            headers={"Content-Type": "application/json"},
+        )
+        response = conn.getresponse()
+        assert response.status == 200
+        worker, loaded_in = json.loads(response.read())["response"].split()
+        conn.close()
+        return int(worker), int(loaded_in)
+
+    def stop(self) -> int:
+        if self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+        return self.process.wait(10)
+
+
+@pytest.fixture
+def served(tmp_path):
+    server = ServedProcess(tmp_path, "--workers", "2")
+    server.wait_for_log(r"Booted worker (\d+)", count=2)
+    yield server
+    server.stop()
+
+
+class TestPreforkServer:
+    """Tests for the supervised worker processes."""
+
+    def test_workers_share_master_loaded_function(self, served):
+        """Test that workers answer with the function the master imported."""
+        answers = {served.ask() for _ in range(6)}
+        workers = {int(pid) for pid in served.wait_for_log(r"Booted worker (\d+)", count=2)}
+
+        assert {loaded_in for _, loaded_in in answers} == {served.process.pid}
+        assert {worker for worker, _ in answers} <= workers
+
+    def test_crashed_worker_is_restarted(self, served):
+        """Test that the master replaces a worker that dies."""
+        first, second = (int(pid) for pid in served.wait_for_log(r"Booted worker (\d+)", count=2))
+        os.kill(first, signal.SIGKILL)
+
+        booted = served.wait_for_log(r"Booted worker (\d+)", count=3)
+        assert int(booted[-1]) not in (first, second)
+        assert served.ask()[1] == served.process.pid
+
+    def test_reload_replaces_workers(self, served):
+        """Test that SIGHUP boots new workers and retires the old ones."""
+        old = {int(pid) for pid in served.wait_for_log(r"Booted worker (\d+)", count=2)}
+        served.process.send_signal(signal.SIGHUP)
+        new = {int(pid) for pid in served.wait_for_log(r"Booted worker (\d+)", count=4)[2:]}
+
+        deadline = time.monotonic() + 5
+        while any(_alive(pid) for pid in old) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not any(_alive(pid) for pid in old)
+        assert served.ask()[0] in new
+
+    def test_stop_finishes_in_flight_requests(self, served):
+        """Test that SIGTERM lets running requests complete before exiting."""
+        results = []
+        request = threading.Thread(target=lambda: results.append(served.ask("slow")))
+        request.start()
+        deadline = time.monotonic() + 10
+        while not served.started_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert served.started_path.exists()
+
+        assert served.stop() == 0
+        request.join(5)
+        assert len(results) == 1
+        assert "Stopped" in served.log()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class TestServeCommand:
+    """Tests for the command line entry point."""
+
+    def test_import_object(self):
+        """Test both import path spellings."""
+        assert import_object("tests.test_server:pid_answer") is pid_answer
+        assert import_object("os.path.join") is os.path.join
+        with pytest.raises(ValueError):
+            import_object("answer")
+
+    def test_parse_serve_arguments(self):
+        """Test the serve command options."""
+        args = build_parser().parse_args([
+            "serve", "llm:answer", "--workers", "3", "--config", "MAX_CONCURRENCY=4", "--config", "MODE=fast",
+        ])
+        assert args.target == "llm:answer"
+        assert args.workers == 3
+        assert parse_config(args.config) == {"MAX_CONCURRENCY": 4, "MODE": "fast"}
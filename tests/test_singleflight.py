@@ -0,0 +1,202 @@
+"""Tests for single-flight coalescing of identical requests."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from func_to_gen.deadlines import Deadline, RequestTimeout
+from func_to_gen.routes import get_limiter, get_single_flight
+from func_to_gen.singleflight import SingleFlight
+from tests.conftest import make_client, parse_sse
+
+
+class TestSingleFlight:
+    """Tests for in-flight request coalescing."""
+
+    def test_followers_share_leader_result(self):
+        """Test that concurrent callers with one key run the function once."""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "shared"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("k", slow))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flight.coalesced < 3:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["shared"] * 4
+        assert len(calls) == 1
+
+    def test_key_released_after_completion(self):
+        """Test that a finished call does not capture later requests."""
+        flight = SingleFlight()
+        assert flight.do("k", lambda: "first") == "first"
+        assert flight.do("k", lambda: "second") == "second"
+
+    def test_errors_propagate(self):
+        """Test that the leader's exception is raised and the key released."""
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            flight.do("k", failing)
+        assert flight.do("k", lambda: "ok") == "ok"
+
+    def test_callers_wait_until_their_own_deadline(self):
+        """Test that a caller gives up at its deadline while the computation goes on for others."""
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+            return "shared"
+
+        started = time.monotonic()
+        with pytest.raises(RequestTimeout):
+            flight.do("k", slow, Deadline(0.1))
+        assert time.monotonic() - started < 1
+
+        results = []
+        follower = threading.Thread(target=lambda: results.append(flight.do("k", slow)))
+        follower.start()
+        while flight.coalesced < 1:
+            pass
+        release.set()
+        follower.join()
+        assert results == ["shared"]
+
+    def test_shared_stream(self):
+        """Test that every subscriber sees the full chunk stream."""
+        flight = SingleFlight()
+        produced = []
+
+        def source():
+            for chunk in ("a", "b", "c"):
+                produced.append(chunk)
+                yield chunk
+
+        leader = flight.do("k", source)
+        follower = flight.do("k", lambda: pytest.fail("should be coalesced"))
+
+        assert next(leader) == "a"
+        assert list(follower) == ["a", "b", "c"]
+        assert list(leader) == ["b", "c"]
+        assert produced == ["a", "b", "c"]
+        assert flight.do("k", lambda: "fresh") == "fresh"
+
+    def test_routes_coalesce_identical_requests(self):
+        """Test that identical concurrent HTTP requests share one answer."""
+        release = threading.Event()
+        calls = []
+
+        def slow_answer(prompt):
+            calls.append(prompt)
+            release.wait(5)
+            return iter(["Shared ", "answer"])
+
+        client = make_client(slow_answer, SINGLE_FLIGHT=True)
+        body = json.dumps({"prompt": "Hello", "stream": True})
+        responses = []
+
+        def post():
+            response = client.post("/v1/completions", data=body, content_type="application/json")
+            responses.append(parse_sse(response))
+
+        threads = [threading.Thread(target=post) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while get_single_flight().coalesced < 2:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        for events in responses:
+            assert "".join(e["choices"][0]["text"] for e in events[:-1]) == "Shared answer"
+
+    def test_routes_honour_request_timeouts(self):
+        """Test that coalesced HTTP requests still time out at their own deadline."""
+        release = threading.Event()
+
+        def slow_answer(prompt):
+            release.wait(5)
+            return "late"
+
+        client = make_client(slow_answer, SINGLE_FLIGHT=True)
+        started = time.monotonic()
+        response = client.post("/api/generate", json={"prompt": "Hello", "stream": False, "timeout": 0.2})
+        release.set()
+
+        assert time.monotonic() - started < 2
+        assert response.status_code == 504
+
+    def test_abandoned_stream_is_closed(self):
+        """Test that closing every subscriber early stops the source and releases the key."""
+        flight = SingleFlight()
+        closed = []
+
+        def source():
+            try:
+                yield from ("a", "b", "c")
+            finally:
+                closed.append(True)
+
+        leader = flight.do("k", source)
+        follower = flight.do("k", lambda: pytest.fail("should be coalesced"))
+        assert next(leader) == "a"
+        leader.close()
+        assert not closed
+        assert next(follower) == "a"
+        follower.close()
+
+        assert closed == [True]
+        assert flight.do("k", lambda: "fresh") == "fresh"
+
+    def test_abandoned_streams_free_limiter_slots(self):
+        """Test that abandoned coalesced streams return their model and limiter slots."""
+        def stream_answer(prompt):
+            yield from ("Shared ", "answer")
+
+        client = make_client(
+            stream_answer, SINGLE_FLIGHT=True, ADAPTIVE_CONCURRENCY=True, ADAPTIVE_CONCURRENCY_INITIAL=3,
+        )
+        body = json.dumps({"prompt": "Hello", "stream": True})
+
+        def abandon(started, leave):
+            response = client.post("/v1/completions", data=body, content_type="application/json", buffered=False)
+            next(response.response)
+            started.set()
+            leave.wait(5)
+            response.close()
+
+        for _ in range(3):
+            leave = threading.Event()
+            readers = []
+            for _ in range(2):
+                started = threading.Event()
+                readers.append(threading.Thread(target=abandon, args=(started, leave)))
+                readers[-1].start()
+                assert started.wait(5)
+            leave.set()
+            for reader in readers:
+                reader.join(5)
+
+        assert get_limiter().stats()["in_flight"] == 0
+        assert get_single_flight()._calls == {}
+        response = client.post("/v1/completions", data=body, content_type="application/json")
+        assert response.status_code == 200
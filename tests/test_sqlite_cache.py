@@ -0,0 +1,142 @@
+"""Tests for the SQLite response cache backend."""
+
+import threading
+import time
+
+import pytest
+
+from func_to_gen.cache import CacheBackend, ResponseCache, create_cache
+from func_to_gen.sqlite_cache import SQLiteCache
+from tests.conftest import make_client
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+class TestSQLiteCache:
+    """Tests for SQLiteCache."""
+
+    def test_get_and_set(self, db_path):
+        """Stored answers are returned and hits/misses counted."""
+        cache = SQLiteCache(db_path)
+        cache.set("k", "answer")
+
+        assert cache.get("k") == "answer"
+        assert cache.get("other") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["entries"] == 1
+        cache.close()
+
+    def test_shared_between_instances(self, db_path):
+        """A second cache on the same file (another worker) sees the answers."""
+        writer = SQLiteCache(db_path)
+        reader = SQLiteCache(db_path)
+        writer.set("k", "answer")
+
+        assert reader.get("k") == "answer"
+        writer.close()
+        reader.close()
+
+    def test_ttl(self, db_path):
+        """Expired answers are misses and are deleted by eviction."""
+        cache = SQLiteCache(db_path, ttl=0.01)
+        cache.set("k", "answer")
+        time.sleep(0.02)
+
+        assert cache.get("k") is None
+        cache.evict()
+        assert cache.stats()["entries"] == 0
+        cache.close()
+
+    def test_evicts_oldest_beyond_max_entries(self, db_path):
+        """Eviction keeps the newest max_entries answers."""
+        cache = SQLiteCache(db_path, max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        cache.evict()
+
+        assert cache.get("a") is None
+        assert cache.get("b") == "b"
+        assert cache.get("c") == "c"
+        cache.close()
+
+    def test_evicts_oldest_beyond_max_bytes(self, db_path):
+        """Eviction keeps the newest answers within max_bytes."""
+        cache = SQLiteCache(db_path, max_bytes=400)
+        for key in ("a", "b", "c", "d"):
+            cache.set(key, "x" * 50)
+        cache.evict()
+
+        assert cache.stats()["bytes"] <= 400
+        assert cache.get("d") is not None
+        assert cache.get("a") is None
+        cache.close()
+
+    def test_background_eviction(self, db_path):
+        """The eviction thread enforces limits without explicit calls."""
+        cache = SQLiteCache(db_path, max_entries=1, evict_interval=0.01)
+        cache.set("a", "a")
+        cache.set("b", "b")
+        deadline = time.monotonic() + 2
+        while cache.stats()["entries"] > 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert cache.stats()["entries"] == 1
+        cache.close()
+
+    def test_connections_are_pooled(self, db_path):
+        """Threads share a bounded set of connections instead of one each."""
+        cache = SQLiteCache(db_path, pool_size=2)
+        cache.set("key", "value")
+
+        def read():
+            for _ in range(20):
+                assert cache.get("key") == "value"
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert cache._idle.qsize() <= 2
+        cache.close()
+        assert cache._idle.empty()
+
+
+class TestCacheBackendConfig:
+    """Tests for choosing the cache backend from config."""
+
+    def test_backends(self, db_path):
+        """CACHE_BACKEND selects memory, sqlite or a custom instance."""
+        assert isinstance(create_cache({"CACHE_MAX_ENTRIES": 4}), ResponseCache)
+        assert isinstance(create_cache({"CACHE_BACKEND": "sqlite", "CACHE_PATH": db_path}), SQLiteCache)
+        custom = ResponseCache()
+        assert create_cache({"CACHE_BACKEND": custom}) is custom
+        assert isinstance(custom, CacheBackend)
+
+    def test_invalid_backends(self):
+        """Unknown backends and sqlite without a path are rejected."""
+        with pytest.raises(ValueError):
+            create_cache({"CACHE_BACKEND": "redis"})
+        with pytest.raises(ValueError):
+            create_cache({"CACHE_BACKEND": "sqlite"})
+
+    def test_survives_app_restart(self, db_path):
+        """A new app on the same database serves cached answers."""
+        calls = []
+
+        def answer(prompt):
+            calls.append(prompt)
+            return "cached answer"
+
+        for _ in range(2):
+            client = make_client(answer, CACHE_BACKEND="sqlite", CACHE_PATH=db_path)
+            response = client.post("/v1/completions", json={"prompt": "Hi"})
+            assert response.get_json()["choices"][0]["text"] == "cached answer"
+
+        assert response.headers["X-Cache"] == "HIT"
+        assert calls == ["Hi"]
@@ -0,0 +1,191 @@
+"""Tests for the upstream proxy backend."""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from func_to_gen import CancelToken, Upstream
+from func_to_gen.deadlines import Deadline, RequestTimeout
+from func_to_gen.upstream import UpstreamError
+from tests.conftest import make_client, parse_sse
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stand-in for an OpenAI/Ollama-compatible model server with keep-alive.
+
+    Answers "Hello" and the prompt, word by word when streaming. The prompt
+    "fail" gets a 500, and "hang" streams one chunk, then waits for the
+    server's ``release`` event.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.server.client_ports.append(self.client_address[1])
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        ollama = self.path.endswith("/api/generate")
+        if data["prompt"] == "fail":
+            error = {"error": "model crashed"} if ollama else {"error": {"message": "model crashed"}}
+            return self._send(500, json.dumps(error).encode())
+        words = ["Hello", *(f" {word}" for word in data["prompt"].split())]
+        if not data.get("stream"):
+            text = "".join(words)
+            answer = {"response": text, "done": True} if ollama else {"choices": [{"text": text}]}
+            return self._send(200, json.dumps(answer).encode())
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson" if ollama else "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in words:
+            if ollama:
+                self._chunk(json.dumps({"response": word, "done": False}).encode() + b"\n")
+            else:
+                self._chunk(b"data: " + json.dumps({"choices": [{"text": word}]}).encode() + b"\n\n")
+            if data["prompt"] == "hang":
+                self.server.release.wait(5)
+        self._chunk(json.dumps({"response": "", "done": True}).encode() + b"\n" if ollama else b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.client_ports = []
+    server.release = threading.Event()
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+class TestUpstream:
+    """Tests for forwarding prompts upstream."""
+
+    def test_openai_stream_reuses_connection(self, upstream):
+        """Test that streamed answers pass through chunk by chunk over one keep-alive connection."""
+        answer = Upstream(upstream.url, model="llama")
+        results = [list(answer(f"Hi {n}")) for n in range(3)]
+
+        assert results[0] == ["Hello", " Hi", " 0"]
+        assert answer.pool.stats() == {"idle": 1, "created": 1, "reused": 2}
+        assert len(set(upstream.client_ports)) == 1
+
+    def test_ollama_api(self, upstream):
+        """Test streamed and whole answers from an Ollama upstream."""
+        assert "".join(Upstream(upstream.url, api="ollama")("Hi")) == "Hello Hi"
+        assert Upstream(upstream.url, api="ollama", stream=False)("Hi") == "Hello Hi"
+
+    def test_whole_answer(self, upstream):
+        """Test that a non-streaming upstream returns the answer as a string."""
+        answer = Upstream(upstream.url, stream=False)
+        assert answer("Hi") == "Hello Hi"
+        assert answer("there") == "Hello there"
+        assert answer.pool.stats()["created"] == 1
+
+    def test_upstream_error(self, upstream):
+        """Test that an upstream error status raises with its message."""
+        with pytest.raises(UpstreamError, match="model crashed") as exc_info:
+            Upstream(upstream.url)("fail")
+        assert exc_info.value.status == 500
+
+    def test_unreachable_upstream(self):
+        """Test that a refused connection raises an UpstreamError."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with pytest.raises(UpstreamError) as exc_info:
+            Upstream(f"http://127.0.0.1:{port}")("Hi")
+        assert exc_info.value.status is None
+
+    def test_stale_connection_is_replaced(self, upstream):
+        """Test that a request on a connection closed while idle is sent on a new one."""
+        answer = Upstream(upstream.url, stream=False)
+        answer("Hi")
+        answer.pool._idle[0].sock.shutdown(socket.SHUT_RDWR)
+
+        assert answer("again") == "Hello again"
+        assert answer.pool.stats()["created"] == 2
+
+    def test_abandoned_stream_is_not_reused(self, upstream):
+        """Test that a connection with an unread response body is closed."""
+        answer = Upstream(upstream.url)
+        chunks = answer("Hi there")
+        assert next(chunks) == "Hello"
+        chunks.close()
+
+        assert answer.pool.stats()["idle"] == 0
+
+    def test_cancel_aborts_read(self, upstream):
+        """Test that cancelling the request unblocks a read waiting on the upstream."""
+        cancel = CancelToken()
+        chunks = Upstream(upstream.url)("hang", cancel=cancel)
+        assert next(chunks) == "Hello"
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(chunks))
+        reader.start()
+        time.sleep(0.1)
+
+        cancel.cancel()
+        reader.join(2)
+        assert not reader.is_alive()
+
+    def test_deadline_caps_wait(self, upstream):
+        """Test that an expired deadline while waiting raises RequestTimeout."""
+        chunks = Upstream(upstream.url)("hang", deadline=Deadline(0.2))
+        assert next(chunks) == "Hello"
+        with pytest.raises(RequestTimeout):
+            list(chunks)
+
+
+class TestUpstreamApp:
+    """Tests for serving an upstream through the app."""
+
+    def test_stream_passthrough(self, upstream):
+        """Test that a streamed chat completion carries the upstream's chunks."""
+        client = make_client(Upstream(upstream.url))
+        response = client.post(
+            "/v1/chat/completions",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hi"}], "stream": True}),
+            content_type="application/json",
+        )
+        events = parse_sse(response)
+        content = "".join(event["choices"][0]["delta"].get("content", "") for event in events[:-1])
+
+        assert content.startswith("Hello")
+        assert events[-1] == "[DONE]"
+
+    def test_upstream_error_is_bad_gateway(self, upstream):
+        """Test that upstream failures answer 502 in both APIs."""
+        client = make_client(Upstream(upstream.url, stream=False))
+        openai = client.post("/v1/completions", data=json.dumps({"prompt": "fail"}), content_type="application/json")
+        ollama = client.post(
+            "/api/generate", data=json.dumps({"prompt": "fail", "stream": False}), content_type="application/json",
+        )
+
+        assert openai.status_code == 502
+        assert openai.get_json()["error"]["type"] == "upstream_error"
+        assert ollama.status_code == 502
+        assert "model crashed" in ollama.get_json()["error"]
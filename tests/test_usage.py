@@ -0,0 +1,99 @@
+"""Tests for token usage and timing statistics."""
+
+import json
+import time
+
+from func_to_gen import Answer
+from func_to_gen.tokens import approximate_token_count
+from tests.conftest import make_client, parse_ndjson, parse_sse
+
+
+def slow_answer(prompt: str) -> str:
+    """Answer after a short delay so durations are measurable."""
+    time.sleep(0.01)
+    return "one two three"
+
+
+class TestUsage:
+    """Tests for usage counts and durations in responses."""
+
+    def test_openai_usage(self):
+        """Test that usage reflects the prompt and completion."""
+        client = make_client(slow_answer)
+        response = client.post(
+            "/v1/completions", data=json.dumps({"prompt": "a b"}), content_type="application/json",
+        )
+
+        usage = response.get_json()["usage"]
+        assert usage == {"prompt_tokens": 2, "completion_tokens": 3, "total_tokens": 5}
+        assert int(response.headers["X-Answer-Duration-Ns"]) >= 10_000_000
+
+    def test_ollama_counts_and_durations(self):
+        """Test that Ollama fields carry real counts and nanosecond timings."""
+        client = make_client(slow_answer)
+        response = client.post(
+            "/api/chat",
+            data=json.dumps({"messages": [{"role": "user", "content": "hi"}]}),
+            content_type="application/json",
+        )
+
+        data = response.get_json()
+        assert data["prompt_eval_count"] == approximate_token_count("user: hi")
+        assert data["eval_count"] == 3
+        assert data["eval_duration"] >= 10_000_000
+        assert data["total_duration"] >= data["eval_duration"]
+
+    def test_ollama_stream_counts(self, stream_client):
+        """Test that the final streamed line carries token counts."""
+        response = stream_client.post(
+            "/api/generate", data=json.dumps({"prompt": "Hello"}), content_type="application/json",
+        )
+
+        final = parse_ndjson(response)[-1]
+        assert final["eval_count"] == approximate_token_count("Response to: Hello ")
+        assert final["prompt_eval_count"] == 1
+
+    def test_stream_include_usage(self, stream_client):
+        """Test the OpenAI stream_options.include_usage final chunk."""
+        response = stream_client.post(
+            "/v1/chat/completions",
+            data=json.dumps({
+                "messages": [{"role": "user", "content": "Hello"}],
+                "stream": True,
+                "stream_options": {"include_usage": True},
+            }),
+            content_type="application/json",
+        )
+
+        events = parse_sse(response)
+        assert events[-1] == "[DONE]"
+        assert events[-2]["choices"] == []
+        assert events[-2]["usage"]["completion_tokens"] > 0
+
+    def test_reported_counts_win(self):
+        """Test that counts returned by the answer function are used as-is."""
+        client = make_client(lambda prompt: Answer("hi", prompt_tokens=42, completion_tokens=7))
+        response = client.post(
+            "/v1/chat/completions",
+            data=json.dumps({"messages": [{"role": "user", "content": "Hello"}]}),
+            content_type="application/json",
+        )
+
+        assert response.get_json()["usage"] == {"prompt_tokens": 42, "completion_tokens": 7, "total_tokens": 49}
+
+    def test_custom_tokenizer(self):
+        """Test that a configured tokenizer replaces the approximation."""
+        client = make_client(lambda prompt: "abcdef", TOKENIZER=len)
+        response = client.post(
+            "/api/generate", data=json.dumps({"prompt": "abc"}), content_type="application/json",
+        )
+
+        data = response.get_json()
+        assert data["prompt_eval_count"] == 3
+        assert data["eval_count"] == 6
+
+    def test_approximation(self):
+        """Test the built-in token count approximation."""
+        assert approximate_token_count("") == 0
+        assert approximate_token_count("Hello, world!") == 4
+        assert approximate_token_count("internationalization") > 1